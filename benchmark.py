@@ -0,0 +1,124 @@
+import logging
+import random
+import time
+from argparse import ArgumentParser
+from typing import Callable
+
+from src import ArrayMind, Stynker, kernels
+from src.stynker import StynkerMind
+from parameters import stynker_parameters
+
+
+def time_cycles(run: Callable[[], None], n_cycles: int) -> float:
+    """
+    Args:
+        run: function that runs a cycle
+        n_cycles: number of cycles to run
+    Returns:
+        Number of cycles per second
+    """
+    start = time.perf_counter()
+    for _ in range(n_cycles):
+        run()
+    return n_cycles / (time.perf_counter() - start)
+
+
+def benchmark_mind(backends: list[str], n_nodes: int, n_cycles: int, seed: int) -> dict[str, float]:
+    """
+    Run the nodes of the same mind with every backend
+    Args:
+        backends: backends to compare. "object" runs the `Node`/`Edge` objects
+        n_nodes: number of nodes of the mind
+        n_cycles: number of cycles to run
+        seed: seed of the random generator
+    Returns:
+        Number of cycles per second of each backend
+    """
+    random.seed(seed)
+    mind = StynkerMind(n_nodes=n_nodes, n_input=32, n_output=16)
+    array_mind = ArrayMind.from_mind(mind)
+    results = dict()
+    states = dict()
+    for backend in backends:
+        if backend == "object":
+            results[backend] = time_cycles(mind.run_nodes, n_cycles)
+            states[backend] = ArrayMind.from_mind(mind).level.tolist()
+            continue
+        kernels.set_backend(backend)
+        engine = array_mind.copy()
+        # Compile the kernels before measuring
+        engine.copy().run_nodes()
+        results[backend] = time_cycles(engine.run_nodes, n_cycles)
+        states[backend] = engine.level.tolist()
+    kernels.set_backend()
+    if len({str(state) for state in states.values()}) > 1:
+        raise RuntimeError("The backends gave different results")
+    return results
+
+
+def benchmark_interaction(backends: list[str], n_cycles: int, seed: int) -> dict[str, float]:
+    """
+    Move a Stynker through the environment with every backend
+    Args:
+        backends: backends to compare. "object" is the same as "numpy"
+        n_cycles: number of interactions to run
+        seed: seed of the random generator
+    Returns:
+        Number of interactions per second of each backend
+    """
+    stynker = Stynker(color="black", **{**stynker_parameters, "n_nodes": 48})
+    results = dict()
+    routes = dict()
+    for backend in backends:
+        if backend == "object":
+            continue
+        kernels.set_backend(backend)
+        rng = random.Random(seed)
+        stynker.get_interaction_information()
+        route = list()
+
+        def run() -> None:
+            stynker.position = (rng.uniform(-340, 340), rng.uniform(-340, 340))
+            stynker.velocity_vector = (rng.uniform(-80, 80), rng.uniform(-80, 80))
+            route.extend(stynker.get_interaction_information().route)
+
+        results[backend] = time_cycles(run, n_cycles)
+        routes[backend] = route
+    kernels.set_backend()
+    if len({str(route) for route in routes.values()}) > 1:
+        raise RuntimeError("The backends gave different results")
+    return results
+
+
+def report(title: str, results: dict[str, float]) -> None:
+    """Print the cycles per second of each backend, and the speedup over NumPy"""
+    print(title)
+    reference = results.get("numpy")
+    for backend, cycles_per_second in results.items():
+        speedup = f"{cycles_per_second / reference:8.2f}x" if reference else ""
+        print(f"  {backend:>8}: {cycles_per_second:12.1f} cycles/sec {speedup}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    # Options are not abbreviated, so -n is never taken as the prefix of another one
+    parser = ArgumentParser(description="Compare the speed of the backends of the kernels", allow_abbrev=False)
+    parser.add_argument("-n", "--n-nodes", type=int, default=10000, help="Number of nodes of the mind")
+    parser.add_argument("-c", "--n-cycles", type=int, default=200, help="Number of cycles to run")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the random generator")
+    parser.add_argument(
+        "-b", "--backends", type=str, nargs="+",
+        choices=("object",) + kernels.BACKENDS,
+        help="Backends to compare. By default, the object model, NumPy and, if it is installed, Numba"
+    )
+    args = parser.parse_args()
+
+    backends = args.backends or ["object", "numpy"] + (["numba"] if kernels.numba is not None else [])
+    report(
+        f"Cycles of a mind with {args.n_nodes} nodes",
+        benchmark_mind(backends, args.n_nodes, args.n_cycles, args.seed),
+    )
+    report(
+        "Interactions of a Stynker with the environment",
+        benchmark_interaction(backends, 100 * args.n_cycles, args.seed),
+    )
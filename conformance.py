@@ -0,0 +1,54 @@
+import json
+import logging
+from argparse import ArgumentParser
+
+from src import kernels
+from src.conformance import ENGINES, reproduce, run_stress_test
+
+
+def parse_args():
+    parser = ArgumentParser(description="Check that the engines behave exactly as the Node/Edge objects")
+    parser.add_argument(
+        "-eg", "--engines", type=str, nargs="+", choices=ENGINES,
+        default=["array", "partitioned", "mapped"], help="Engines to check"
+    )
+    parser.add_argument(
+        "-bk", "--backends", type=str, nargs="+", choices=kernels.BACKENDS, required=False,
+        help="Backends of the kernels to check. By default, all the available ones"
+    )
+    parser.add_argument("-t", "--n_trials", type=int, default=20, help="Number of random runs")
+    parser.add_argument("-mn", "--max_nodes", type=int, default=128, help="Maximum number of nodes of the minds")
+    parser.add_argument("-mc", "--max_cycles", type=int, default=500, help="Maximum number of cycles of each period")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the trials")
+    parser.add_argument("-r", "--reproduce", type=str, required=False, help="JSON file with a reproducer to run")
+    parser.add_argument("-o", "--output", type=str, required=False, help="JSON file for the reproducers found")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d %(levelname)s {%(module)s} [%(funcName)s] %(message)s',
+                        datefmt='%Y-%m-%d,%H:%M:%S', level=logging.INFO)
+    args = parse_args()
+
+    if args.reproduce is not None:
+        with open(args.reproduce) as f:
+            content = json.load(f)
+        # The file may have a single reproducer, or the list written by `--output`
+        for reproducer in content if isinstance(content, list) else [content]:
+            divergence = reproduce(reproducer)
+            print(json.dumps({"reproducer": reproducer, "divergence": divergence}))
+    else:
+        backends = args.backends
+        if backends is None:
+            backends = ["numpy", "python"] + (["numba"] if kernels.numba is not None else [])
+        logging.info(f"Checking engines {args.engines} with backends {backends} in {args.n_trials} trials")
+        failures = run_stress_test(
+            args.n_trials, args.engines, backends,
+            max_nodes=args.max_nodes, max_cycles=args.max_cycles, seed=args.seed,
+        )
+        for failure in failures:
+            print(json.dumps(failure))
+        logging.info(f"{len(failures)} of {args.n_trials} trials diverged")
+        if args.output is not None:
+            with open(args.output, "w") as f:
+                json.dump(failures, f, indent=2)
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import logging
+from argparse import ArgumentParser
+
+from src import JobClient, JobServer
+from parameters import job_server_parameters, stynker_parameters
+
+
+def parse_args():
+    parser = ArgumentParser(description="Run Stynkers in a local pool of warm worker processes")
+    parser.add_argument(
+        "command", type=str,
+        choices=("serve", "submit", "status", "get", "shutdown"),
+        help="Start the server, or send it a request"
+    )
+    parser.add_argument(
+        "arguments", type=str, nargs="*",
+        help="JSON files with run specs (submit), or ids of jobs (get)"
+    )
+    parser.add_argument("-w", "--n_workers", type=int, required=False, help="Number of worker processes")
+    parser.add_argument("-sp", "--socket_path", type=str, required=False, help="Unix socket of the server")
+    parser.add_argument("-p", "--port", type=int, required=False, help="Port of the server in localhost")
+    parser.add_argument(
+        "-mb", "--memory_budget", type=float, required=False,
+        help="Memory of the jobs that run at the same time, in MiB"
+    )
+    parser.add_argument(
+        "-ob", "--over_budget", type=str, choices=("refuse", "downsize"), required=False,
+        help="Whether to refuse the runs over the memory budget, or to run them with fewer nodes"
+    )
+    parser.add_argument(
+        "-c", "--cache_path", type=str, required=False,
+        help="SQLite file with the results of the runs, so a run is not simulated twice"
+    )
+    parser.add_argument(
+        "-nf", "--no_follow", dest="follow", action="store_false",
+        help="Only queue the runs, without waiting for their events"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d %(levelname)s {%(module)s} [%(funcName)s] %(message)s',
+                        datefmt='%Y-%m-%d,%H:%M:%S', level=logging.INFO)
+    args = parse_args()
+    for key in ("n_workers", "socket_path", "port", "memory_budget", "over_budget", "cache_path"):
+        if getattr(args, key) is not None:
+            job_server_parameters[key] = getattr(args, key)
+
+    if args.command == "serve":
+        server = JobServer(stynker_parameters, **job_server_parameters)
+        asyncio.run(server.serve())
+    else:
+        client = JobClient(
+            socket_path=job_server_parameters["socket_path"],
+            host=job_server_parameters["host"],
+            port=job_server_parameters["port"],
+        )
+        if args.command == "submit":
+            # Each file has a run spec, or a list of them
+            specs = list()
+            for path in args.arguments:
+                with open(path) as f:
+                    content = json.load(f)
+                specs.extend(content if isinstance(content, list) else [content])
+            for event in client.submit(specs, follow=args.follow):
+                print(json.dumps(event))
+        elif args.command == "status":
+            print(json.dumps(client.status()))
+        elif args.command == "get":
+            for job in client.get([int(job_id) for job_id in args.arguments]):
+                print(json.dumps(job))
+        elif args.command == "shutdown":
+            client.shutdown()
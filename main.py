@@ -1,17 +1,28 @@
 import json
 import logging
+import os
+import random
 import time
-from src import Stynker
-from parameters import cycles, stynker_parameters
-from utils import parse_args
+from src import Arena, ArrayMind, ConvergenceMonitor, Environment, MappedMind, MemoryBudget, MindCheckpoints, PartitionedMind, Renderer, ResultsStore, SpeculativeSleep, SpikeRecorder, Stynker, kernels
+from parameters import (
+    arena_parameters,
+    convergence_parameters,
+    cycles,
+    engine_parameters,
+    memory_parameters,
+    recording_parameters,
+    rendering_parameters,
+    sleep_parameters,
+    stynker_parameters,
+)
+from utils import get_next_phase_index, load_run_state, parse_args, save_run_state
 from datetime import datetime
 
 # Win / Lose logic
 cnt_win = 0
 cnt_lose = 0
 
-# Rendering and results logic
-rendering_rate = 1
+# Results logic
 num_wake_cycles = 0
 results_cycles = 5000
 
@@ -34,6 +45,19 @@ if __name__ == "__main__":
         for key, val in vars(args).items()
         if val is not None
     }
+    # Separate the parameters that are not used by the Stynkers
+    for parameters in (
+        arena_parameters,
+        rendering_parameters,
+        recording_parameters,
+        convergence_parameters,
+        engine_parameters,
+        sleep_parameters,
+        memory_parameters,
+    ):
+        for key in parameters:
+            if key in args_dict:
+                parameters[key] = args_dict.pop(key)
     stynker_parameters.update(args_dict)
 
     # Dropping None values
@@ -44,6 +68,31 @@ if __name__ == "__main__":
     }
     logging.info(f"Running program with the following parameters: {stynker_parameters}")
 
+    # Check the memory of both minds before creating them
+    if memory_parameters["memory_budget"] is not None:
+        budget = MemoryBudget(int(memory_parameters["memory_budget"] * 2 ** 20), memory_parameters["over_budget"])
+        stynker_parameters["n_nodes"] = budget.fit(
+            stynker_parameters["n_nodes"],
+            stynker_parameters["n_input"],
+            stynker_parameters["n_output"],
+            engine=engine_parameters["engine"],
+            n_minds=2,
+        )
+
+    # State of the run saved with the checkpoints, if it is being continued
+    run_state = None
+    if recording_parameters["checkpoint_directory"] is not None:
+        if engine_parameters["engine"] == "object":
+            raise ValueError("Checkpoints need an array engine")
+        run_state_path = os.path.join(recording_parameters["checkpoint_directory"], "run.json")
+        run_state = load_run_state(run_state_path)
+        if run_state is not None:
+            # Keep the goals of the run, as the minds learned them
+            Environment.get_environment(
+                stynker_parameters["environment"],
+                tuple(tuple(point) for point in run_state["winning_segment"]),
+            )
+
     # Initialize Stynkers
     stynker_1 = Stynker(
         color="blue",
@@ -56,17 +105,158 @@ if __name__ == "__main__":
    )
 
     environment = stynker_1.environment
+    # The arena draws its own random values. Its seed is saved with the
+    # state of the run, so a continued run keeps the same one
+    if run_state is not None and run_state.get("arena_seed") is not None:
+        arena_parameters["seed"] = run_state["arena_seed"]
+    elif arena_parameters["seed"] is None:
+        arena_parameters["seed"] = random.getrandbits(32)
+    logging.info(f"Seed of the arena: {arena_parameters['seed']}")
+    # Both Stynkers move in the same maze, and bounce on each other
+    arena = Arena(environment, [stynker_1, stynker_2], **arena_parameters)
+
+    kernels.set_backend(engine_parameters["backend"])
+
+    # Run the nodes with the array engines
+    for stynker in (stynker_1, stynker_2):
+        if engine_parameters["engine"] == "array":
+            stynker.attach_engine(ArrayMind.from_mind(stynker))
+        elif engine_parameters["engine"] == "partitioned":
+            stynker.attach_engine(PartitionedMind(
+                ArrayMind.from_mind(stynker),
+                n_workers=engine_parameters["n_workers"],
+            ))
+        elif engine_parameters["engine"] == "mapped":
+            os.makedirs(engine_parameters["mind_directory"], exist_ok=True)
+            path = os.path.join(engine_parameters["mind_directory"], f"mind_{stynker.color}.bin")
+            if os.path.isfile(path):
+                logging.info(f"Continuing with the mind in {path}")
+                mind = MappedMind.open(path)
+                if mind.n_nodes != stynker.n_nodes:
+                    raise ValueError(f"The mind in {path} has {mind.n_nodes} nodes, not {stynker.n_nodes}")
+                stynker.attach_engine(mind)
+            else:
+                stynker.attach_engine(MappedMind.from_mind(stynker, path))
+
+    # Continue from the checkpoints of the minds, and keep writing them
+    checkpoints = list()
+    saved_cycles = list()
+    if recording_parameters["checkpoint_directory"] is not None:
+        for stynker in (stynker_1, stynker_2):
+            stynker_checkpoints = MindCheckpoints(
+                os.path.join(recording_parameters["checkpoint_directory"], stynker.color)
+            )
+            if stynker_checkpoints.exists():
+                mind, checkpoint_cycle = stynker_checkpoints.load()
+                if mind.n_nodes != stynker.n_nodes:
+                    raise ValueError(
+                        f"The checkpoint of {stynker.color} has {mind.n_nodes} nodes, not {stynker.n_nodes}"
+                    )
+                stynker.engine.copy_from(mind)
+                saved_cycles.append(checkpoint_cycle)
+                logging.info(f"Continuing with the mind of {stynker.color} saved at cycle {checkpoint_cycle}")
+            checkpoints.append((stynker, stynker_checkpoints))
+
+    # Continue the run where the checkpoints were saved. If the state of the
+    # run is not from the same cycle as both minds, only the minds are kept
+    i_period = 0
+    start_cycle = 0
+    if run_state is not None and saved_cycles != [run_state["cycle"]] * 2:
+        logging.warning(
+            f"The state of the run is from cycle {run_state['cycle']}, and the minds from cycles "
+            f"{saved_cycles}. Starting a new run with the minds"
+        )
+        run_state = None
+    elif run_state is None and saved_cycles:
+        logging.warning("There is no state of the run. Starting a new run with the minds")
+    if run_state is not None:
+        num_run_cycles = run_state["cycle"]
+        # The wake period is counted again when it is continued
+        num_wake_cycles = run_state["num_wake_cycles"] - 1
+        cnt_win = run_state["cnt_win"]
+        cnt_lose = run_state["cnt_lose"]
+        results = {int(cycle): row for cycle, row in run_state["results"].items()}
+        i_period = run_state["i_period"]
+        start_cycle = run_state["period_cycle"]
+        for stynker, (position, velocity_vector) in zip((stynker_1, stynker_2), run_state["bodies"]):
+            stynker.position = tuple(position)
+            stynker.velocity_vector = tuple(velocity_vector)
+        if run_state.get("arena_random_state") is not None:
+            version, internal_state, gauss_next = run_state["arena_random_state"]
+            arena.random.setstate((version, tuple(internal_state), gauss_next))
+        logging.info(f"Continuing the run {run_state['run_id']} from cycle {num_run_cycles}")
+
+    # Try several remakes in each sleep cycle
+    if sleep_parameters["n_candidates"] is not None:
+        for stynker in (stynker_1, stynker_2):
+            stynker.speculative_sleep = SpeculativeSleep(
+                sleep_parameters["n_candidates"],
+                sleep_parameters["candidate_cycles"],
+                n_workers=sleep_parameters["candidate_workers"],
+                # The `Renderer` runs in a thread of this process
+                use_fork=rendering_parameters["headless"],
+            )
+
+    # Record the spikes of both minds
+    if recording_parameters["record_spikes"]:
+        run_timestamp = int(time.time())
+        for i, stynker in enumerate((stynker_1, stynker_2), start=1):
+            stynker.spike_recorder = SpikeRecorder(
+                f"spikes_{run_timestamp}_{i}.bin",
+                n_nodes=stynker.n_nodes,
+            )
+
+    # Add the results to the store shared by all the runs
+    results_store = ResultsStore(recording_parameters["results_store"])
+    if run_state is not None:
+        run_id = results_store.continue_run(run_state["run_id"], stynker_parameters)
+    else:
+        run_id = results_store.start_run(stynker_parameters)
+    last_results_time = time.perf_counter()
 
-    for period, n_cycles in cycles:
+    # Draw in a separate thread, so the simulation never waits for Tk
+    renderer = None
+    if not rendering_parameters["headless"]:
+        renderer = Renderer(
+            environment,
+            [stynker_1, stynker_2],
+            fps=rendering_parameters["fps"],
+        )
+        renderer.start()
+
+    # Stop the run, or jump to the next phase, once the results converge
+    early_stopping = convergence_parameters.pop("early_stopping")
+    monitor = None
+    if early_stopping is not None:
+        monitor = ConvergenceMonitor(**convergence_parameters)
+        # Two windows of samples are needed to see that the win rate stopped changing
+        n_wake_periods = sum(period == "wake" for period, _ in cycles[:get_next_phase_index(cycles, 0)])
+        if early_stopping == "next_phase" and n_wake_periods <= 2 * monitor.window:
+            logging.warning(
+                f"The first phase has {n_wake_periods} wake periods, and the monitor needs "
+                f"{2 * monitor.window + 1} to converge. Use a smaller window"
+            )
+    stop_reasons = list()
+    if run_state is not None:
+        stop_reasons = run_state["stop_reasons"]
+        if monitor is not None:
+            monitor.samples.extend(tuple(sample) for sample in run_state["monitor_samples"])
+
+    while i_period < len(cycles):
+        # Index of the period being run. `i_period` is the next one
+        current_period = i_period
+        period, n_cycles = cycles[current_period]
+        i_period += 1
         stynker_1.assign_period(period)
         stynker_2.assign_period(period)
 
         if period == "wake":
             num_wake_cycles += 1
-            for _ in range(n_cycles):
+            # Only the first wake period of a continued run starts after 0
+            first_cycle, start_cycle = start_cycle, 0
+            for i_cycle in range(first_cycle, n_cycles):
                 num_run_cycles += 1
-                info_1 = stynker_1.run_cycle()
-                info_2 = stynker_2.run_cycle()
+                info_1, info_2 = arena.run_cycle()
 
                 # Win / Lose logic
                 # There is a tiny possibility where two of these events happen at the same
@@ -96,8 +286,8 @@ if __name__ == "__main__":
                     stynker_1.reset_vector()
                     stynker_2.reset_vector()
 
-                if (num_wake_cycles + 1) % rendering_rate == 0:
-                    environment.window.update()
+                if renderer is not None:
+                    renderer.publish_stats(num_run_cycles, cnt_win, cnt_lose)
 
                 if num_run_cycles % results_cycles == 0:
                     try:
@@ -105,21 +295,83 @@ if __name__ == "__main__":
                     except ZeroDivisionError:
                         ratio = -1
                     results[num_run_cycles] = (cnt_win, cnt_lose, ratio)
+                    results_time = time.perf_counter()
+                    results_store.append(
+                        run_id,
+                        num_run_cycles,
+                        cnt_win,
+                        cnt_lose,
+                        ratio,
+                        results_cycles / (results_time - last_results_time),
+                    )
+                    last_results_time = results_time
                     logging.info(f"{num_run_cycles} Wins: {cnt_win} Losses: {cnt_lose} Ratio: {ratio}")
+
                     # Print current time
 #                    print("Time:", datetime.now())
 
+                if checkpoints and num_run_cycles % recording_parameters["checkpoint_cycles"] == 0:
+                    for stynker, stynker_checkpoints in checkpoints:
+                        stynker_checkpoints.save(stynker.engine, num_run_cycles)
+                    # The rows until the checkpoint are not written again
+                    # when the run is continued
+                    results_store.flush()
+                    save_run_state(run_state_path, {
+                        "cycle": num_run_cycles,
+                        "run_id": run_id,
+                        "i_period": current_period,
+                        "period_cycle": i_cycle + 1,
+                        "num_wake_cycles": num_wake_cycles,
+                        "cnt_win": cnt_win,
+                        "cnt_lose": cnt_lose,
+                        "results": results,
+                        "stop_reasons": stop_reasons,
+                        "monitor_samples": list(monitor.samples) if monitor is not None else [],
+                        "winning_segment": environment.winning_segment,
+                        "bodies": [
+                            (stynker.position, stynker.velocity_vector)
+                            for stynker in (stynker_1, stynker_2)
+                        ],
+                        "arena_seed": arena_parameters["seed"],
+                        "arena_random_state": arena.random.getstate(),
+                    })
+
+            # The monitor takes a sample at the end of each wake period
+            if monitor is not None and monitor.update(num_run_cycles, cnt_win, cnt_lose):
+                stop_reason = {**monitor.stop_reason, "action": early_stopping}
+                stop_reasons.append(stop_reason)
+                logging.info(f"Early stopping: {stop_reason}")
+                if early_stopping == "stop":
+                    i_period = len(cycles)
+                else:
+                    i_period = get_next_phase_index(cycles, current_period)
+                    monitor.reset()
+
         else:
             for _ in range(n_cycles):
-                stynker_1.run_cycle()
-                stynker_2.run_cycle()
+                arena.run_cycle()
 
     # Final timestamp
 #    print("Time: ", datetime.now())
 
+    if renderer is not None:
+        renderer.stop()
+        renderer.join()
+
+    if stop_reasons:
+        results["stop_reasons"] = stop_reasons
+
     # Saving the results with the current timestamp
     with open(f"results_{int(time.time())}.json", "w") as f:
         json.dump(results, f)
+    results_store.close()
+
+    for stynker in (stynker_1, stynker_2):
+        if stynker.rest_threshold:
+            logging.info(f"The {stynker.color} Stynker rested in {stynker.n_resting_cycles} wake cycles")
+        stynker.detach_engine()
+        if stynker.spike_recorder is not None:
+            stynker.spike_recorder.close()
 
     # Saving Stynkers state
     stynker_1.to_pkl("latest_stynker_1.pkl")
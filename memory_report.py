@@ -0,0 +1,127 @@
+import random
+import tracemalloc
+from argparse import ArgumentParser
+from typing import Any, Callable
+
+from src import ArrayMind, Edge, Node, Stynker
+from src.memory import COMPONENTS, estimate_run_bytes, get_deep_size, measure_mind, trace_peak
+from src.stynker import StynkerMind
+from parameters import mind_parameters, stynker_parameters
+
+
+def get_bytes_per_object(factory: Callable[[int], Any], n: int) -> float:
+    """
+    Measure the memory allocated by a kind of object
+    Args:
+        factory: function that creates the i-th object
+        n: number of objects to create
+    Returns:
+        Number of bytes per object, without the list that holds them
+    """
+    objects = [None] * n
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    for i in range(n):
+        objects[i] = factory(i)
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (end - start) / n
+
+
+def get_bytes_per_edge_of_mind(n_minds: int) -> tuple[float, float]:
+    """
+    Measure the memory of complete minds created with `mind_parameters`
+    Args:
+        n_minds: number of minds to create
+    Returns:
+        Number of bytes per mind, and per edge of the minds
+    """
+    mind_keys = ("n_nodes", "n_input", "n_output", "random_sleep")
+    parameters = {key: val for key, val in mind_parameters.items() if key in mind_keys}
+    # Leave out what is allocated only once, e.g. by NumPy
+    StynkerMind(**parameters)
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    minds = [StynkerMind(**parameters) for _ in range(n_minds)]
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n_edges = sum(len(edges) for mind in minds for edges in mind.graph.values())
+    return (end - start) / n_minds, (end - start) / max(n_edges, 1)
+
+
+def report_configuration(n_nodes: int, engine: str) -> dict[str, dict[str, int]]:
+    """
+    Compare the estimate of a Stynker with the memory it uses
+    Args:
+        n_nodes: number of nodes of the mind
+        engine: "object" or "array"
+    Returns:
+        Bytes of each component estimated, and measured, and bytes traced
+        when the Stynker is created and when it is cloned
+    """
+    parameters = {**stynker_parameters, "n_nodes": n_nodes}
+
+    def create() -> Stynker:
+        stynker = Stynker(color="black", **parameters)
+        if engine != "object":
+            stynker.attach_engine(ArrayMind.from_mind(stynker))
+        return stynker
+
+    random.seed(0)
+    # Leave out what is allocated only once, e.g. the environment
+    create()
+    stynker, created, created_peak = trace_peak(create)
+    other = create()
+    _, _, clone_peak = trace_peak(other.clone_from, stynker)
+    measure = measure_mind(stynker)
+    measure["environment"] = get_deep_size(stynker.environment)
+    return {
+        "estimate": estimate_run_bytes(n_nodes, engine),
+        "measure": measure,
+        "traced": {"created": created, "created_peak": created_peak, "clone_peak": clone_peak},
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Report the memory used by nodes, edges and minds")
+    parser.add_argument("-n", "--n_objects", type=int, default=100000, help="Number of objects to measure")
+    parser.add_argument(
+        "-nn", "--n_nodes", type=int, default=mind_parameters["n_nodes"],
+        help="Number of nodes of the mind whose estimate is checked"
+    )
+    parser.add_argument(
+        "-eg", "--engine", type=str, choices=("object", "array"), default="object",
+        help="Engine of the mind whose estimate is checked"
+    )
+    args = parser.parse_args()
+
+    shared_node = Node(name=0, size=450, endo=2, duration=150)
+    report = {
+        "node": get_bytes_per_object(
+            lambda i: Node(name=i, size=450, endo=2, duration=150, node_type="input"),
+            args.n_objects,
+        ),
+        "idle edge": get_bytes_per_object(
+            lambda i: Edge(node=shared_node, weight=3, length=2),
+            args.n_objects,
+        ),
+        "edge with a trickle": get_bytes_per_object(
+            lambda i: Edge(node=shared_node, weight=3, length=2, next_steps=[2]),
+            args.n_objects,
+        ),
+    }
+    bytes_per_mind, bytes_per_edge = get_bytes_per_edge_of_mind(max(1, args.n_objects // 10000))
+    for name, n_bytes in report.items():
+        print(f"Bytes per {name}: {n_bytes:.1f}")
+    print(f"Bytes per mind with {mind_parameters['n_nodes']} nodes: {bytes_per_mind:.0f}")
+    print(f"Bytes per edge of a mind, with its share of the containers: {bytes_per_edge:.1f}")
+
+    configuration = report_configuration(args.n_nodes, args.engine)
+    print(f"Mind with {args.n_nodes} nodes and the {args.engine} engine, in bytes:")
+    print(f"{'component':>14} {'estimate':>12} {'measure':>12}")
+    for key in COMPONENTS + ("clone", "environment", "total"):
+        estimate = configuration["estimate"].get(key, "")
+        measure = configuration["measure"].get(key, "")
+        print(f"{key:>14} {estimate:>12} {measure:>12}")
+    for key, n_bytes in configuration["traced"].items():
+        print(f"Traced {key.replace('_', ' ')}: {n_bytes}")
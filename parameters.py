@@ -18,15 +18,128 @@ mind_parameters = {
     "random_sleep": False,
 }
 
-# Information about the environment
+# Information about the environment.
+# Stynkers slower than `rest_threshold` that are not kicked rest: they
+# stop and skip the interaction with the environment until the next kick
 environment_parameters = {
     "environment": "simple_maze",
     "initial_position": (0, 0),
     "show_route": False,
-    "friction_coefficient": 1.0
+    "friction_coefficient": 1.0,
+    "rest_threshold": 0.0,
 }
 
 stynker_parameters = {
     **mind_parameters,
     **environment_parameters,
 }
+
+# Information about the live visualization
+rendering_parameters = {
+    "headless": False,
+    "fps": 30,
+}
+
+# Information about what to record during the run.
+# The results are also added to the store in `results_store` (see results.py).
+# If `checkpoint_directory` is set, the minds and the state of the run (counters,
+# point of the schedule, results, winning segment, bodies and arena) are saved every
+# `checkpoint_cycles` wake cycles, and the run continues from them if they exist.
+# If only the minds can be restored, e.g. the state is from another cycle, the run
+# starts from the beginning of the schedule with those minds.
+# Checkpoints need an array engine ("array", "partitioned" or "mapped")
+recording_parameters = {
+    "record_spikes": False,
+    "results_store": "results",
+    "checkpoint_directory": None,
+    "checkpoint_cycles": 5000,
+}
+
+# Information about when to stop the run before the end of `cycles`.
+# `early_stopping` can be None, "stop" or "next_phase". The monitor takes
+# a sample at the end of each wake period, so `window` and `stall_samples`
+# are numbers of wake periods. Convergence compares two consecutive windows,
+# so a phase needs more than 2 * `window` wake periods to jump to the next one
+convergence_parameters = {
+    "early_stopping": None,
+    "window": 10,
+    "tolerance": 0.05,
+    "min_events": 100,
+    "stall_samples": 20,
+}
+
+# Information about the engine that runs the nodes.
+# `engine` can be "object", "array", "partitioned" or "mapped".
+# The "mapped" engine keeps each mind in a file of `mind_directory`,
+# and continues from it if it exists.
+# `backend` is the backend of the kernels (see src/kernels.py):
+# "numba", "numpy" or "python". If None, Numba when it is installed
+engine_parameters = {
+    "engine": "object",
+    "n_workers": None,
+    "mind_directory": "minds",
+    "backend": None,
+}
+
+# Information about the speculative sleep (see src/speculative_sleep.py).
+# If `n_candidates` is set, each sleep cycle tries that many remakes, runs
+# each of them for `candidate_cycles` wake cycles in `candidate_workers`
+# forked processes (by default, one per CPU) and keeps the best one.
+# Processes are only forked in headless runs; otherwise, and with a
+# single worker, the remakes run one after the other
+sleep_parameters = {
+    "n_candidates": None,
+    "candidate_cycles": 100,
+    "candidate_workers": None,
+}
+
+# Information about the memory of the run (see src/memory.py). If
+# `memory_budget` (in MiB) is set, runs estimated over it are refused
+# or, if `over_budget` is "downsize", run with fewer nodes
+memory_parameters = {
+    "memory_budget": None,
+    "over_budget": "refuse",
+}
+
+# Information about the interaction between the Stynkers.
+# With `batch_physics`, the Stynkers are moved against the walls all at
+# once (see src/batch_physics.py). The result is the same; it is faster
+# with many Stynkers or walls, and slower with a few of them.
+# `seed` is the seed of the random values of the arena. If None, a random
+# one; it is saved with the checkpoints, and kept when the run is continued
+arena_parameters = {
+    "body_collisions": True,
+    "batch_physics": False,
+    "seed": None,
+}
+
+# Information about the evolutionary tournament (see tournament.py)
+tournament_parameters = {
+    "population_size": 16,
+    "n_generations": 100,
+    "selection": "tournament",
+    "tournament_size": 3,
+    "n_elites": 2,
+    "n_workers": None,
+    "seed": 0,
+    "schedule": [("wake", 100), ("sleep", 1)] * 10,
+}
+
+# Information about the local job server (see job_server.py). It listens
+# on `socket_path` if it is given, and on `host`:`port` otherwise
+job_server_parameters = {
+    "n_workers": None,
+    "socket_path": None,
+    "host": "127.0.0.1",
+    "port": 8765,
+    # Used by the runs that do not give their own
+    "schedule": [("wake", 100), ("sleep", 1)] * 10,
+    "progress_every": 100,
+    # Budget in MiB shared by the jobs that run at the same time,
+    # see `memory_parameters`
+    "memory_budget": None,
+    "over_budget": "refuse",
+    # SQLite file of the results of the runs (see `EvaluationCache`). A run
+    # already in it is not simulated again. If None, every run is simulated
+    "cache_path": None,
+}
@@ -0,0 +1,60 @@
+import json
+from argparse import ArgumentParser
+
+from src import ResultsStore
+from parameters import recording_parameters
+
+
+def parse_filters(filters: list[str]) -> dict:
+    """
+    Args:
+        filters: list of `name=value`. Values are read as JSON when possible
+    Returns:
+        Dictionary from the name of each parameter to its value
+    """
+    parameters = dict()
+    for item in filters:
+        key, _, value = item.partition("=")
+        try:
+            parameters[key] = json.loads(value)
+        except ValueError:
+            parameters[key] = value
+    return parameters
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Add results to the store, and aggregate them")
+    parser.add_argument(
+        "command", type=str,
+        choices=("import", "runs", "aggregate"),
+        help="Add results_<timestamp>.json files, list the runs, or aggregate a column by cycle"
+    )
+    parser.add_argument("files", type=str, nargs="*", help="Files to import")
+    parser.add_argument(
+        "-s", "--store", type=str, default=recording_parameters["results_store"],
+        help="Directory of the store"
+    )
+    parser.add_argument(
+        "-f", "--filters", type=str, nargs="+", default=list(),
+        help="Parameters of the runs, as name=value, e.g. n_nodes=48"
+    )
+    parser.add_argument("-c", "--column", type=str, default="win_rate", help="Column to aggregate")
+    parser.add_argument("-b", "--bin_size", type=int, default=5000, help="Number of cycles in each bin")
+    parser.add_argument("-w", "--window", type=int, default=1, help="Number of bins of the rolling mean")
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store)
+    parameters = parse_filters(args.filters)
+    if args.command == "import":
+        # Imported files are given the parameters of the filters
+        for path in args.files:
+            run_id = store.import_json(path, parameters)
+            print(f"{path}: run {run_id}")
+    elif args.command == "runs":
+        for run in store.get_runs(**parameters):
+            print(json.dumps(run))
+    elif args.command == "aggregate":
+        aggregate = store.aggregate_by_cycle(args.column, args.bin_size, args.window, **parameters)
+        print(f"{'cycle':>12} {'count':>8} {'mean':>10} {'std':>10}")
+        for cycle, count, mean, std in zip(*(aggregate[key].tolist() for key in ("cycle", "count", "mean", "std"))):
+            print(f"{cycle:>12} {count:>8} {mean:>10.4f} {std:>10.4f}")
@@ -2,3 +2,22 @@ from .edge import Edge
 from .node import Node
 from .stynker import Stynker
 from .environment import Environment
+from .renderer import Renderer
+from .recorder import SpikeRecorder, SpikeRaster
+from .results_store import ResultsStore
+from .convergence import ConvergenceMonitor
+from .cache import EvaluationCache
+from .evaluation import Evaluator
+from .array_mind import ArrayMind
+from .checkpoint import MindCheckpoints
+from .speculative_sleep import SpeculativeSleep
+from .memory import MemoryBudget
+from .partitioned_mind import PartitionedMind
+from .mapped_mind import MappedMind
+from .population import PopulationStore
+from .tournament import Tournament
+from .job_queue import JobClient, JobServer
+from .conformance import ConformanceHarness
+from .batch_physics import BatchPhysics
+from .arena import Arena, SpatialHash
+from .interaction import InteractionInfo
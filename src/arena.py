@@ -0,0 +1,204 @@
+from __future__ import annotations
+import math
+import random
+from collections import defaultdict
+from typing import Any, Iterable
+
+from .batch_physics import BatchPhysics
+from .environment import Environment
+
+
+class SpatialHash:
+    """
+    Grid of square cells used to find the bodies that are close
+    to each other without comparing every pair
+    """
+
+    def __init__(self, cell_size: float) -> None:
+        """
+
+        Args:
+            cell_size: side of the cells. Bodies closer than this
+                distance are always in the same or in neighbour cells
+        """
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+
+    def get_cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def build(self, positions: Iterable[tuple[float, float]]) -> None:
+        """
+        Put the bodies in the cells
+        Args:
+            positions: position of each body
+        """
+        self.cells.clear()
+        for i, (x, y) in enumerate(positions):
+            self.cells[self.get_cell(x, y)].append(i)
+
+    def get_candidate_pairs(self) -> Iterable[tuple[int, int]]:
+        """
+        Get the pairs of bodies that are in the same or in neighbour cells
+        Returns:
+            Iterable of (i, j) with i < j
+        """
+        for (cx, cy), bodies in self.cells.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbours = self.cells.get((cx + dx, cy + dy))
+                    if neighbours is None:
+                        continue
+                    for i in bodies:
+                        for j in neighbours:
+                            if i < j:
+                                yield i, j
+
+
+class Arena:
+    """
+    Several Stynkers moving in the same environment.
+
+    After each Stynker runs its cycle (bouncing on the walls), the
+    Stynkers that overlap are separated and bounce on each other as
+    two circles of equal mass with an elastic collision. A spatial
+    hash is used to find the overlapping pairs, so the cost grows
+    almost linearly with the number of Stynkers. Optionally, they are
+    moved against the walls all at once with `BatchPhysics`
+    """
+
+    def __init__(
+        self,
+        environment: Environment,
+        stynkers: Iterable,
+        body_collisions: bool = True,
+        seed: int = None,
+        batch_physics: bool = False,
+    ) -> None:
+        """
+
+        Args:
+            environment: environment where the Stynkers move
+            stynkers: Stynkers in the arena
+            body_collisions: whether the Stynkers bounce on each other
+            seed: seed of the directions used to separate Stynkers in the
+                same position. They have their own generator, so the minds
+                draw the same values with and without body collisions
+            batch_physics: whether to move the Stynkers against the walls
+                all at once, with `BatchPhysics`. The result is the same,
+                but it only pays off with many Stynkers or many walls
+        """
+        self.environment = environment
+        self.stynkers = list(stynkers)
+        self.body_collisions = body_collisions
+        max_radius = max(stk.radius for stk in self.stynkers)
+        self.spatial_hash = SpatialHash(2 * max_radius)
+        self.n_body_collisions = 0
+        self.random = random.Random(seed)
+        self.physics = BatchPhysics(environment) if batch_physics else None
+
+    def run_cycle(self) -> list[Any]:
+        """
+        Run a cycle of every Stynker, and handle the collisions between them
+        Returns:
+            List with the result of `run_cycle` of each Stynker. In the wake
+            cycles, `touch_stynker` tells whether it bounced with other Stynker
+        """
+        if self.physics is not None and self.stynkers[0].period == "wake":
+            infos = self.run_batch_wake_cycle()
+        else:
+            infos = [stk.run_cycle() for stk in self.stynkers]
+        if self.stynkers[0].period == "wake":
+            for info in infos:
+                info["touch_stynker"] = False
+            if self.body_collisions:
+                for i in self.resolve_body_collisions():
+                    infos[i]["touch_stynker"] = True
+        return infos
+
+    def run_batch_wake_cycle(self) -> list[Any]:
+        """
+        Run a wake cycle of every Stynker, moving the ones that do not
+        rest against the walls with a single `BatchPhysics.step`
+        Returns:
+            List with the `InteractionInfo` of each Stynker
+        """
+        infos = [stk.begin_wake_cycle() for stk in self.stynkers]
+        moving = [i for i, info in enumerate(infos) if info is None]
+        if moving:
+            stynkers = [self.stynkers[i] for i in moving]
+            step = self.physics.to_lists(self.physics.step(
+                [stk.position for stk in stynkers],
+                [stk.velocity_vector for stk in stynkers],
+                [stk.radius for stk in stynkers],
+            ))
+            for k, (i, stk) in enumerate(zip(moving, stynkers)):
+                stk.interaction_info.load_batch(step, k)
+                infos[i] = stk.end_wake_cycle(stk.interaction_info)
+        return infos
+
+    def resolve_body_collisions(self) -> set[int]:
+        """
+        Separate the Stynkers that overlap, and update their
+        velocity vectors with an elastic bounce
+        Returns:
+            Indices of the Stynkers that collided
+        """
+        stynkers = self.stynkers
+        self.spatial_hash.build(stk.position for stk in stynkers)
+        n_collisions = 0
+        collided = set()
+        for i, j in self.spatial_hash.get_candidate_pairs():
+            stk_1, stk_2 = stynkers[i], stynkers[j]
+            (x1, y1), (x2, y2) = stk_1.position, stk_2.position
+            dx, dy = x2 - x1, y2 - y1
+            distance = Environment.get_norm((dx, dy))
+            min_distance = stk_1.radius + stk_2.radius
+            if distance >= min_distance:
+                continue
+            n_collisions += 1
+            collided.update((i, j))
+            if distance == 0:
+                # Same position, e.g. both reset to the initial position:
+                # separate them in a random direction, so neither side is favoured
+                angle = self.random.uniform(0, 2 * math.pi)
+                nx, ny = math.cos(angle), math.sin(angle)
+            else:
+                nx, ny = dx / distance, dy / distance
+
+            # Elastic bounce: exchange the velocity components along the normal
+            (vx1, vy1), (vx2, vy2) = stk_1.velocity_vector, stk_2.velocity_vector
+            approach_speed = (vx1 - vx2) * nx + (vy1 - vy2) * ny
+            if approach_speed > 0:
+                stk_1.velocity_vector = (vx1 - approach_speed * nx, vy1 - approach_speed * ny)
+                stk_2.velocity_vector = (vx2 + approach_speed * nx, vy2 + approach_speed * ny)
+
+            # Separate them, half each. If one of them is against a wall,
+            # the other one moves the whole overlap
+            overlap = (min_distance - distance) / 2
+            moved_1 = self._push(stk_1, -overlap * nx, -overlap * ny)
+            moved_2 = self._push(stk_2, overlap * nx, overlap * ny)
+            if moved_2 and not moved_1:
+                self._push(stk_2, overlap * nx, overlap * ny)
+            elif moved_1 and not moved_2:
+                self._push(stk_1, -overlap * nx, -overlap * ny)
+
+        self.n_body_collisions += n_collisions
+        return collided
+
+    def _push(self, stk, dx: float, dy: float) -> bool:
+        """
+        Move a Stynker, unless its body touches a wall in the movement
+        Args:
+            stk: Stynker to move
+            dx: displacement in the x-axis
+            dy: displacement in the y-axis
+        Returns:
+            Whether the Stynker moved
+        """
+        x, y = stk.position
+        contact = stk.interaction_info.contact
+        if self.environment.find_first_contact(x, y, x + dx, y + dy, stk.radius, contact) >= 0:
+            return False
+        stk.update_position(x + dx, y + dy)
+        return True
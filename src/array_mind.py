@@ -0,0 +1,1047 @@
+from __future__ import annotations
+from bisect import bisect_right, insort
+from collections import defaultdict
+from random import randint, randrange, sample
+from typing import Any, Optional, Union
+
+import numpy as np
+
+from constants import edge_constants, node_constants
+from . import kernels
+from .edge import Edge
+from .graph_statistics import GraphStatistics
+from .node import INPUT, NODE_TYPES, REGULAR, Node
+
+# Arrays with one element per node. Nodes are indexed by their name
+NODE_FIELDS = (
+    ("size", np.int64),
+    ("endo", np.int64),
+    ("duration", np.int64),
+    ("node_type", np.int8),
+    ("level", np.int64),
+    ("damage", np.int64),
+    ("is_active", np.bool_),
+    ("num_sleep_cycles", np.int64),
+    ("spilled", np.bool_),
+    # Names of the nodes in the order of the graph, and the
+    # position of each node in that order
+    ("order", np.int64),
+    ("rank", np.int64),
+)
+
+# Arrays with one element per edge slot. Removed edges leave
+# a dead slot that is reused after compacting the table
+EDGE_FIELDS = (
+    ("source", np.int64),
+    ("destination", np.int64),
+    ("weight", np.int64),
+    ("length", np.int64),
+    # Trickles on their way: bit `i` is set if a trickle arrives
+    # in `i + 1` cycles
+    ("pending", np.uint8),
+    # Whether the source is in the reverse graph of the destination,
+    # so the edge is removed when the destination is remade
+    ("tracked", np.bool_),
+    ("alive", np.bool_),
+)
+
+# Counters stored with the arrays
+N_EDGES_USED, STRUCTURE_VERSION = range(2)
+N_COUNTERS = 2
+
+MAX_LENGTH = 8 * np.dtype(np.uint8).itemsize
+
+
+def get_layout(n_nodes: int, edge_capacity: int) -> list[tuple[str, np.dtype, int, int]]:
+    """
+    Get how the arrays of a mind are placed in a single buffer
+    Args:
+        n_nodes: number of nodes of the mind
+        edge_capacity: number of edge slots
+    Returns:
+        List of (name, type, number of elements, offset in bytes)
+    """
+    layout = list()
+    offset = 0
+    fields = (
+        [("counters", np.int64, N_COUNTERS)]
+        + [(name, dtype, n_nodes) for name, dtype in NODE_FIELDS]
+        + [(name, dtype, edge_capacity) for name, dtype in EDGE_FIELDS]
+    )
+    for name, dtype, n_elements in fields:
+        dtype = np.dtype(dtype)
+        layout.append((name, dtype, n_elements, offset))
+        # Keep every array aligned to 8 bytes
+        offset += -(-n_elements * dtype.itemsize // 8) * 8
+    return layout
+
+
+def get_nbytes(n_nodes: int, edge_capacity: int) -> int:
+    """
+    Get the size of the buffer needed by a mind
+    Args:
+        n_nodes: number of nodes of the mind
+        edge_capacity: number of edge slots
+    Returns:
+        Number of bytes
+    """
+    name, dtype, n_elements, offset = get_layout(n_nodes, edge_capacity)[-1]
+    return offset + -(-n_elements * dtype.itemsize // 8) * 8
+
+
+def get_default_edge_capacity(n_nodes: int, n_edges: int) -> int:
+    """
+    Get a number of edge slots with room for the edges made in
+    the sleep cycles
+    Args:
+        n_nodes: number of nodes of the mind
+        n_edges: number of edges of the mind
+    Returns:
+        Number of edge slots
+    """
+    return 2 * max(n_edges, n_nodes * edge_constants["n_edges_range"][1])
+
+
+class _PendingOrder:
+    """
+    Order of the nodes of an `ArrayMind` while some of them are moved to
+    the end, one after the other, as in `ArrayMind.remake_nodes`. The
+    arrays are only rewritten by `apply`, once, instead of in every move
+    """
+
+    def __init__(self, order: np.ndarray, rank: np.ndarray) -> None:
+        """
+
+        Args:
+            order: names of the nodes in the order of the graph
+            rank: position of each node in `order`
+        """
+        self.order = order
+        self.rank = rank
+        # Nodes moved to the end, in their new order
+        self.moved = dict()
+        # Positions in `order` of the moved nodes, sorted
+        self.moved_ranks = list()
+
+    def move_to_end(self, name: int) -> None:
+        """
+        Args:
+            name: name of the node to move to the end
+        """
+        if name in self.moved:
+            del self.moved[name]
+        else:
+            insort(self.moved_ranks, int(self.rank[name]))
+        self.moved[name] = None
+
+    def __getitem__(self, i: int) -> int:
+        """
+        Args:
+            i: position in the current order
+        Returns:
+            Name of the node in that position
+        """
+        moved_ranks = self.moved_ranks
+        n_kept = len(self.order) - len(moved_ranks)
+        if i >= n_kept:
+            return list(self.moved)[i - n_kept]
+        # Position in `order` of the i-th node that was not moved: the
+        # first one with `i` kept nodes before it
+        k = bisect_right(moved_ranks, i)
+        while True:
+            position = i + k
+            k_next = bisect_right(moved_ranks, position)
+            if k_next == k:
+                return int(self.order[position])
+            k = k_next
+
+    def apply(self) -> None:
+        """Write the current order in the arrays"""
+        if not self.moved:
+            return
+        first = self.moved_ranks[0]
+        kept = np.ones(len(self.order) - first, dtype=bool)
+        kept[np.array(self.moved_ranks) - first] = False
+        tail = np.concatenate([self.order[first:][kept], np.fromiter(self.moved, dtype=np.int64)])
+        self.order[first:] = tail
+        self.rank[tail] = np.arange(first, len(self.order))
+
+
+class ArrayMind:
+    """
+    Array version of the nodes and edges of a `StynkerMind`.
+
+    Nodes are stored as arrays indexed by their name, and edges as a
+    table of slots with their source and destination. The cycles are
+    computed with NumPy over the whole arrays, reproducing exactly the
+    results of the `Node`/`Edge` objects: the trickles that arrive to
+    a node from nodes placed before it in the order of the graph are
+    added before its `endo` (and its minimum level of 0), and the ones
+    from nodes placed after it are added at the end of the cycle.
+
+    The sleep cycle makes the same calls to `random` as
+    `StynkerMind`, so both versions stay identical for a given seed.
+
+    It can be attached to a `StynkerMind` (see
+    `StynkerMind.attach_engine`) to run its cycles
+    """
+
+    def __init__(
+        self,
+        arrays: dict[str, np.ndarray],
+        n_nodes: int,
+        owns_memory: bool = True,
+    ) -> None:
+        """
+
+        Args:
+            arrays: arrays of the mind, see `NODE_FIELDS` and `EDGE_FIELDS`
+            n_nodes: number of nodes of the mind
+            owns_memory: whether the arrays can be replaced by bigger
+                ones when there are no free edge slots. False when they
+                are views of a buffer shared with other processes
+        """
+        self.arrays = arrays
+        self.n_nodes = n_nodes
+        self.owns_memory = owns_memory
+        # Juice arriving to each node, used by `kernels.run_nodes`
+        self._before = np.zeros(n_nodes, dtype=np.int64)
+        self._after = np.zeros(n_nodes, dtype=np.int64)
+        # Nodes remade, and keys (see `get_edge_keys`) of the edges added,
+        # removed or changed, since the last call to `pop_changes`. None
+        # if any node or edge may have changed
+        self._changes = None
+        # Hash of the outcoming edges of each node, used to compare minds
+        # (see `get_edge_hashes`). Built when it is needed, updated with
+        # the edges, and rebuilt if the structure is changed through
+        # another view of the arrays
+        self._edge_hashes = None
+        self._edge_hashes_version = None
+        # `GraphStatistics` of the alive edges. Built the first time they
+        # are needed, and then updated with the edges. See `get_statistics`
+        self._statistics = None
+        self._set_attributes()
+
+    def _set_attributes(self) -> None:
+        """Expose the arrays as attributes"""
+        for name, array in self.arrays.items():
+            setattr(self, name, array)
+
+    @property
+    def edge_capacity(self) -> int:
+        return len(self.source)
+
+    @property
+    def n_edges_used(self) -> int:
+        """Number of edge slots used, including the dead ones"""
+        return int(self.counters[N_EDGES_USED])
+
+    @classmethod
+    def allocate(cls, n_nodes: int, edge_capacity: int) -> ArrayMind:
+        """
+        Create an empty mind
+        Args:
+            n_nodes: number of nodes of the mind
+            edge_capacity: number of edge slots
+        Returns:
+            New instance with its own memory
+        """
+        buffer = bytearray(get_nbytes(n_nodes, edge_capacity))
+        return cls.from_buffer(buffer, n_nodes, edge_capacity, owns_memory=True)
+
+    @classmethod
+    def from_buffer(
+        cls,
+        buffer: Any,
+        n_nodes: int,
+        edge_capacity: int,
+        offset: int = 0,
+        owns_memory: bool = False,
+    ) -> ArrayMind:
+        """
+        Create a mind whose arrays are views of an existing buffer,
+        e.g. a `multiprocessing.shared_memory.SharedMemory` or a
+        memory-mapped file
+        Args:
+            buffer: object that supports the buffer protocol
+            n_nodes: number of nodes of the mind
+            edge_capacity: number of edge slots
+            offset: position of the mind in the buffer, in bytes
+            owns_memory: see `__init__`
+        Returns:
+            New instance that reads and writes `buffer`
+        """
+        arrays = {
+            name: np.ndarray((n_elements,), dtype=dtype, buffer=buffer, offset=offset + field_offset)
+            for name, dtype, n_elements, field_offset in get_layout(n_nodes, edge_capacity)
+        }
+        return cls(arrays, n_nodes, owns_memory=owns_memory)
+
+    @classmethod
+    def from_mind(cls, mind, edge_capacity: int = None) -> ArrayMind:
+        """
+        Create the array version of a `StynkerMind`
+        Args:
+            mind: instance of `StynkerMind`. Its nodes must be
+                named from 0 to `n_nodes` - 1
+            edge_capacity: number of edge slots. By default, see
+                `get_default_edge_capacity`
+        Returns:
+            New instance with the same nodes, edges and state as `mind`
+        """
+        n_nodes = len(mind.graph)
+        n_edges = sum(len(edges) for edges in mind.graph.values())
+        if edge_capacity is None:
+            edge_capacity = get_default_edge_capacity(n_nodes, n_edges)
+        array_mind = cls.allocate(n_nodes, edge_capacity)
+        array_mind.load_graph(mind.graph, mind.reverse_graph)
+        return array_mind
+
+    def load_graph(self, graph: dict[Node, set[Edge]], reverse_graph: dict[Node, set[Node]]) -> None:
+        """
+        Overwrite the mind with the nodes and edges of a graph
+        Args:
+            graph: Node -> set of outcoming Edges
+            reverse_graph: Node -> set of Nodes with edges to it
+        """
+        n_edges = sum(len(edges) for edges in graph.values())
+        if len(graph) != self.n_nodes or n_edges > self.edge_capacity:
+            raise ValueError("The graph does not fit in the arrays of the mind")
+
+        names = sorted(node.name for node in graph)
+        if names != list(range(self.n_nodes)):
+            raise ValueError("The nodes must be named from 0 to n_nodes - 1")
+
+        for field_name, _ in EDGE_FIELDS:
+            self.arrays[field_name][:] = 0
+        slot = 0
+        for rank, (node, edges) in enumerate(graph.items()):
+            name = node.name
+            self.size[name] = node.size
+            self.endo[name] = node.endo
+            self.duration[name] = node.duration
+            self.node_type[name] = node.type_code
+            self.level[name] = node.level
+            self.damage[name] = node.damage
+            self.is_active[name] = node.is_active
+            self.num_sleep_cycles[name] = node.num_sleep_cycles
+            self.order[rank] = name
+            self.rank[name] = rank
+            for edge in edges:
+                if edge.length > MAX_LENGTH:
+                    raise ValueError(f"Edges longer than {MAX_LENGTH} are not supported")
+                self.source[slot] = name
+                self.destination[slot] = edge.node.name
+                self.weight[slot] = edge.weight
+                self.length[slot] = edge.length
+                self.pending[slot] = sum(1 << (step - 1) for step in edge.next_steps)
+                self.alive[slot] = True
+                slot += 1
+        self.spilled[:] = False
+        self._load_tracked(reverse_graph, n_edges)
+        self.counters[N_EDGES_USED] = n_edges
+        self._edge_hashes = None
+        self._changes = None
+        self._statistics = None
+        self._structure_changed()
+
+    def _load_tracked(self, reverse_graph: dict[Node, set[Node]], n_edges: int) -> None:
+        """
+        Mark the edges whose source is in the reverse graph of their destination
+        Args:
+            reverse_graph: Node -> set of Nodes with edges to it
+            n_edges: number of edges loaded
+        """
+        sources = {
+            destination.name: {node.name for node in nodes}
+            for destination, nodes in reverse_graph.items()
+        }
+        for slot in range(n_edges):
+            destination = int(self.destination[slot])
+            self.tracked[slot] = int(self.source[slot]) in sources.get(destination, ())
+
+    def to_graph(self) -> tuple[defaultdict, defaultdict, dict[int, Node]]:
+        """
+        Create the `Node`/`Edge` version of the mind
+        Returns:
+            Graph (Node -> set of Edges), reverse graph (Node -> set of
+            Nodes) and dictionary of nodes by name, as used by `StynkerMind`
+        """
+        nodes_dict = dict()
+        graph = defaultdict(set)
+        for name in self.order.tolist():
+            node = Node(
+                name=name,
+                size=int(self.size[name]),
+                endo=int(self.endo[name]),
+                duration=int(self.duration[name]),
+                node_type=NODE_TYPES[self.node_type[name]],
+                level=int(self.level[name]),
+                damage=int(self.damage[name]),
+                is_active=bool(self.is_active[name]),
+                num_sleep_cycles=int(self.num_sleep_cycles[name]),
+            )
+            nodes_dict[name] = node
+            graph[node] = set()
+
+        reverse_graph = defaultdict(set)
+        for slot in np.flatnonzero(self.alive[:self.n_edges_used]).tolist():
+            source = nodes_dict[int(self.source[slot])]
+            destination = nodes_dict[int(self.destination[slot])]
+            pending = int(self.pending[slot])
+            next_steps = [step + 1 for step in range(MAX_LENGTH) if pending >> step & 1]
+            graph[source].add(Edge(
+                destination,
+                weight=int(self.weight[slot]),
+                length=int(self.length[slot]),
+                next_steps=next_steps,
+            ))
+            if self.tracked[slot]:
+                reverse_graph[destination].add(source)
+        return graph, reverse_graph, nodes_dict
+
+    def copy(self) -> ArrayMind:
+        """
+        Returns:
+            Copy of the mind with its own memory
+        """
+        new_mind = ArrayMind.allocate(self.n_nodes, self.edge_capacity)
+        new_mind.copy_from(self)
+        return new_mind
+
+    def copy_from(self, other: Union[ArrayMind, Any]) -> None:
+        """
+        Overwrite the mind with the state of another one
+        Args:
+            other: mind with the same number of nodes. Engines that wrap an
+                `ArrayMind` (with a `mind` attribute) are also accepted
+        """
+        other = getattr(other, "mind", other)
+        if other.n_nodes != self.n_nodes:
+            raise ValueError("Minds must have the same number of nodes")
+        if self._changes is not None:
+            self._add_differences(other)
+        if other.n_edges_used > self.edge_capacity:
+            if not self.owns_memory:
+                raise MemoryError("Not enough edge slots to copy the mind")
+            self._resize_edges(other.edge_capacity)
+        n_edges_used = other.n_edges_used
+        for name, _ in NODE_FIELDS:
+            self.arrays[name][:] = other.arrays[name]
+        for name, _ in EDGE_FIELDS:
+            self.arrays[name][:n_edges_used] = other.arrays[name][:n_edges_used]
+            self.arrays[name][n_edges_used:] = 0
+        self.counters[N_EDGES_USED] = n_edges_used
+        self._statistics = other._statistics.copy() if other._statistics is not None else None
+        self._edge_hashes = None
+        if other._edge_hashes_in_sync():
+            self._edge_hashes = other._edge_hashes.copy()
+            self._edge_hashes_version = int(self.counters[STRUCTURE_VERSION])
+        self._structure_changed()
+
+    def _add_differences(self, other: ArrayMind) -> None:
+        """
+        Add to the changes (see `pop_changes`) the nodes and the edges
+        that are different in another mind
+        Args:
+            other: mind with the same number of nodes
+        """
+        remade, keys = self._changes
+        different = np.zeros(self.n_nodes, dtype=bool)
+        for name in ("size", "endo", "duration"):
+            different |= self.arrays[name] != other.arrays[name]
+        remade.update(np.flatnonzero(different).tolist())
+
+        # Edges of the nodes whose outcoming edges are different, in any of the minds
+        is_source = self.get_edge_hashes() != other.get_edge_hashes()
+        for mind in (self, other):
+            used = slice(0, mind.n_edges_used)
+            slots = np.flatnonzero(mind.alive[used] & is_source[mind.source[used]])
+            keys.update(mind.get_edge_keys(slots).tolist())
+
+    def pop_changes(self) -> Optional[tuple[set[int], set[int]]]:
+        """
+        Get the changes of the structure since the last call, and
+        start recording them again
+        Returns:
+            Names of the nodes remade, and keys (see `get_edge_keys`) of the
+            edges added, removed or changed. None if any node or edge may
+            have changed, e.g. after `load_graph`, or in the first call
+        """
+        changes = self._changes
+        self._changes = (set(), set())
+        return changes
+
+    def get_edge_keys(self, slots: np.ndarray) -> np.ndarray:
+        """
+        Get the keys of some edges: `source * n_nodes + destination`, which
+        identify them, as there is at most one edge between two nodes
+        Args:
+            slots: slots of the edges
+        Returns:
+            Array with the key of each edge
+        """
+        return self.source[slots] * self.n_nodes + self.destination[slots]
+
+    def replace_edges(
+        self,
+        keys: np.ndarray,
+        source: np.ndarray,
+        destination: np.ndarray,
+        weight: np.ndarray,
+        length: np.ndarray,
+        tracked: np.ndarray,
+    ) -> None:
+        """
+        Replace some edges: the ones with some keys are removed, and
+        the new ones are added. The new edges have no trickles on their way
+        Args:
+            keys: keys of the edges to remove, see `get_edge_keys`
+            source: source of each new edge. Its key must be one of `keys`
+            destination: destination of each new edge
+            weight: weight of each new edge
+            length: length of each new edge
+            tracked: whether the source of each new edge is in the
+                reverse graph of its destination
+        """
+        slots = np.flatnonzero(self.alive[:self.n_edges_used])
+        self._remove_edges(slots[np.isin(self.get_edge_keys(slots), keys)])
+        self._append_edges(source, destination, weight, length, tracked)
+        if self._statistics is not None:
+            self._statistics.add_edges(source, destination, weight, length)
+        if self._changes is not None:
+            self._changes[1].update(np.asarray(keys).tolist())
+        self._structure_changed()
+
+    def get_statistics(self) -> dict[str, Any]:
+        """
+        Get statistics of the structure of the mind. See `StynkerMind.get_statistics`
+        Returns:
+            Dictionary with the statistics, see `GraphStatistics.snapshot`
+        """
+        if self._statistics is None:
+            slots = np.flatnonzero(self.alive[:self.n_edges_used])
+            self._statistics = GraphStatistics()
+            self._statistics.add_nodes(np.arange(self.n_nodes), self.size, self.endo)
+            self._statistics.add_edges(
+                self.source[slots], self.destination[slots], self.weight[slots], self.length[slots],
+            )
+        return self._statistics.snapshot()
+
+    def reset_state(self) -> None:
+        """Set levels and damage to 0, deactivate nodes and remove the trickles"""
+        self.level[:] = 0
+        self.damage[:] = 0
+        self.is_active[:] = False
+        self.spilled[:] = False
+        self.pending[:] = 0
+
+    def activate_node(self, n: int) -> None:
+        """
+        Mark a given node as active. See `Node.activate`
+        Args:
+            n: name of the node to activate
+        """
+        if self.node_type[n] == REGULAR:
+            raise ValueError("Attempting to activate a 'regular' node")
+        self.is_active[n] = True
+
+    def run_nodes(self) -> list[int]:
+        """
+        Load the nodes, and spill the ones that are full.
+        Equivalent to `StynkerMind.load_nodes` followed by
+        `StynkerMind.spill_nodes`
+        Returns:
+            Names of the nodes that spilled, in the order of the graph
+        """
+        if kernels.get_backend() != "numpy":
+            kernels.get_kernel(kernels.run_nodes)(
+                self.n_edges_used,
+                self.source,
+                self.destination,
+                self.weight,
+                self.length,
+                self.pending,
+                self.alive,
+                self.rank,
+                self.size,
+                self.endo,
+                self.node_type,
+                self.level,
+                self.damage,
+                self.is_active,
+                self.spilled,
+                self._before,
+                self._after,
+                INPUT,
+            )
+            return self.get_spilled_names()
+
+        edges = slice(0, self.n_edges_used)
+        before, after = self.deliver_trickles(edges)
+        self.update_levels(0, self.n_nodes, before, after)
+        self.spill(0, self.n_nodes, edges)
+        return self.get_spilled_names()
+
+    def deliver_trickles(self, edges: Union[slice, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Move the trickles of some edges one step forward, and
+        sum the ones that arrive to each node
+        Args:
+            edges: slots of the edges to run
+        Returns:
+            Juice arriving to each node from nodes before it in the order
+            of the graph, and from nodes after it
+        """
+        destinations, weights, is_before = self.collect_trickles(edges)
+        return self.sum_trickles(destinations, weights, is_before)
+
+    def collect_trickles(self, edges: Union[slice, np.ndarray]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Move the trickles of some edges one step forward, and
+        get the ones that arrive in this cycle
+        Args:
+            edges: slots of the edges to run
+        Returns:
+            Destination and weight of the edges whose trickles arrive, and
+            whether their source is before the destination in the order of the graph
+        """
+        pending = self.pending[edges]
+        arriving = (pending & 1).astype(bool)
+        self.pending[edges] = pending >> 1
+
+        sources = self.source[edges][arriving]
+        destinations = self.destination[edges][arriving]
+        weights = self.weight[edges][arriving]
+        is_before = self.rank[sources] < self.rank[destinations]
+        return destinations, weights, is_before
+
+    def sum_trickles(
+        self,
+        destinations: np.ndarray,
+        weights: np.ndarray,
+        is_before: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Sum the trickles that arrive to each node. See `collect_trickles`
+        Args:
+            destinations: destination of each trickle
+            weights: weight of each trickle
+            is_before: whether each trickle comes from a node before its destination
+        Returns:
+            Juice arriving to each node from nodes before it in the order
+            of the graph, and from nodes after it
+        """
+        is_after = ~is_before
+        before = np.bincount(destinations[is_before], weights[is_before], minlength=self.n_nodes)
+        after = np.bincount(destinations[is_after], weights[is_after], minlength=self.n_nodes)
+        # The sums of integer weights are exact as floats
+        return before.astype(np.int64), after.astype(np.int64)
+
+    def update_levels(self, lo: int, hi: int, before: np.ndarray, after: np.ndarray) -> None:
+        """
+        Update the levels of a range of nodes with their `endo`,
+        the arriving trickles and the input activations
+        Args:
+            lo: first node of the range
+            hi: node after the last one of the range
+            before: juice arriving to each node of the range before its `endo`
+            after: juice arriving to each node of the range after its `endo`
+        """
+        level = self.level[lo:hi]
+        level += before
+        np.maximum(level + self.endo[lo:hi], 0, out=level)
+
+        is_active = self.is_active[lo:hi]
+        inputs = is_active & (self.node_type[lo:hi] == INPUT)
+        level[inputs] = np.maximum(level[inputs] + self.size[lo:hi][inputs], 0)
+        is_active[inputs] = False
+
+        level += after
+
+    def spill(self, lo: int, hi: int, edges: Union[slice, np.ndarray]) -> None:
+        """
+        Spill the full nodes of a range, and load their outcoming edges
+        Args:
+            lo: first node of the range
+            hi: node after the last one of the range
+            edges: slots of the outcoming edges of the nodes of the range
+        """
+        self.spill_nodes(lo, hi)
+        self.load_edges(edges)
+
+    def spill_nodes(self, lo: int, hi: int) -> None:
+        """
+        Spill the full nodes of a range
+        Args:
+            lo: first node of the range
+            hi: node after the last one of the range
+        """
+        level = self.level[lo:hi]
+        full = level >= self.size[lo:hi]
+        level[full] = 0
+        self.damage[lo:hi][full] += 1
+        self.spilled[lo:hi] = full
+
+    def load_edges(self, edges: Union[slice, np.ndarray]) -> None:
+        """
+        Load with a trickle the edges whose source spilled
+        Args:
+            edges: slots of the edges to check
+        """
+        loading = self.spilled[self.source[edges]] & self.alive[edges]
+        if isinstance(edges, slice):
+            slots = np.flatnonzero(loading) + edges.start
+        else:
+            slots = edges[loading]
+        self.pending[slots] |= (1 << (self.length[slots] - 1)).astype(np.uint8)
+
+    def get_spilled_names(self) -> list[int]:
+        """
+        Returns:
+            Names of the nodes that spilled in the last cycle, in the order of the graph
+        """
+        return self.order[self.spilled[self.order]].tolist()
+
+    def get_partition_edges(self, lo: int, hi: int) -> np.ndarray:
+        """
+        Get the slots of the alive edges whose source is in a range of nodes
+        Args:
+            lo: first node of the range
+            hi: node after the last one of the range
+        Returns:
+            Array of slots
+        """
+        sources = self.source[:self.n_edges_used]
+        return np.flatnonzero(self.alive[:self.n_edges_used] & (sources >= lo) & (sources < hi))
+
+    def sleep(self, n_remakes: int, random_sleep: bool = False) -> None:
+        """
+        Run the sleep cycle. See `Stynker._run_sleep_cycle`
+        Args:
+            n_remakes: number of nodes to remake
+            random_sleep: if True, remake random nodes. If False,
+                remake those with less damage
+        """
+        self.num_sleep_cycles += 1
+        expired = self.num_sleep_cycles[self.order] == self.duration[self.order]
+        expired_nodes = self.order[expired].tolist()
+
+        if random_sleep:
+            nodes_to_remake = sample(self.order.tolist(), n_remakes)
+        else:
+            # Sort by damage, and then by name
+            names = np.arange(self.n_nodes)
+            nodes_to_remake = np.lexsort((names, self.damage))[:n_remakes].tolist()
+
+        nodes_to_remake += expired_nodes
+        self.remake_nodes(nodes_to_remake)
+
+        self.damage[:] = 0
+
+    def remake_nodes(self, names: list[int]) -> None:
+        """
+        Remake some nodes, one after the other, and their incoming and
+        outcoming edges. See `Node.remake` and `StynkerMind.remake_edges`.
+
+        The random values are drawn as if each node was remade on its own,
+        but the edge table is read once, to find the edges from or to the
+        nodes (see `get_node_edges`), and written once at the end. The
+        remakes only look up and remove edges of the nodes being remade,
+        so they run on those edges alone
+        Args:
+            names: names of the nodes, in the order they are remade.
+                A node can be remade more than once
+        """
+        if not names:
+            return
+        n_nodes = self.n_nodes
+        remade_names = set(names)
+        is_remade = np.zeros(n_nodes, dtype=bool)
+        is_remade[names] = True
+
+        # Key (`source * n_nodes + destination`) -> [slot, weight, length, tracked]
+        # of the alive edges from or to the nodes. New edges have no slot yet
+        edges = dict()
+        # Name of each node -> keys of its edges
+        node_edges = defaultdict(set)
+        slots = self.get_node_edges(is_remade)
+        for slot, source, destination, weight, length, tracked in zip(
+            slots.tolist(),
+            self.source[slots].tolist(),
+            self.destination[slots].tolist(),
+            self.weight[slots].tolist(),
+            self.length[slots].tolist(),
+            self.tracked[slots].tolist(),
+        ):
+            key = source * n_nodes + destination
+            edges[key] = [slot, weight, length, tracked]
+            for name in (source, destination):
+                if name in remade_names:
+                    node_edges[name].add(key)
+
+        changes = self._changes
+        statistics = self._statistics
+        removed_slots = list()
+
+        def add_edge(source: int, destination: int, weight: int, length: int) -> None:
+            # As in a set of `Edge`, nothing changes if there is already an
+            # edge between the nodes, apart from being added to the reverse graph
+            key = source * n_nodes + destination
+            edge = edges.get(key)
+            if edge is not None:
+                if changes is not None and not edge[3]:
+                    changes[1].add(key)
+                edge[3] = True
+                return
+            edges[key] = [None, weight, length, True]
+            if changes is not None:
+                changes[1].add(key)
+            for name in (source, destination):
+                if name in remade_names:
+                    node_edges[name].add(key)
+            if statistics is not None:
+                statistics.add_edge(source, destination, weight, length)
+
+        def remove_edge(key: int) -> None:
+            source, destination = divmod(key, n_nodes)
+            slot, weight, length, _ = edges.pop(key)
+            for name in (source, destination):
+                if name in remade_names:
+                    node_edges[name].discard(key)
+            if slot is not None:
+                # Removed from the statistics by `_remove_edges`
+                removed_slots.append(slot)
+            elif statistics is not None:
+                statistics.remove_edge(source, destination, weight, length)
+            if changes is not None:
+                changes[1].add(key)
+
+        order = _PendingOrder(self.order, self.rank)
+        for name in names:
+            old_size, old_endo = int(self.size[name]), int(self.endo[name])
+            self.size[name] = randint(*node_constants["size_range"])
+            self.endo[name] = randint(*node_constants["endo_range"])
+            if statistics is not None:
+                statistics.update_node(old_size, old_endo, int(self.size[name]), int(self.endo[name]))
+            self.duration[name] = randint(*node_constants["duration_range"])
+            self.num_sleep_cycles[name] = 0
+
+            # Delete the outcoming edges, and the incoming edges in the reverse graph
+            if changes is not None:
+                changes[0].add(name)
+            for key in list(node_edges[name]):
+                if key // n_nodes == name or edges[key][3]:
+                    remove_edge(key)
+
+            # The node is deleted from the graph and added again, so it
+            # moves to the end of the order
+            order.move_to_end(name)
+
+            # Add random edges from and to the node. The node is the last one
+            # of the order, so `StynkerMind.get_random_node` draws one of the
+            # positions before it. `randrange(n)` draws the same number as
+            # `choice` over a list of size `n`, so the list is not created
+            n_edges = randint(*edge_constants["n_edges_range"])
+            for _ in range(n_edges):
+                add_edge(
+                    name,
+                    order[randrange(n_nodes - 1)],
+                    weight=randint(*edge_constants["weight_range"]),
+                    length=randint(*edge_constants["length_range"]),
+                )
+            n_edges = randint(*edge_constants["n_edges_range"])
+            for _ in range(n_edges):
+                source = order[randrange(n_nodes - 1)]
+                add_edge(
+                    source,
+                    name,
+                    weight=randint(*edge_constants["weight_range"]),
+                    length=randint(*edge_constants["length_range"]),
+                )
+
+        # Write the changes. The order first, as adding the edges
+        # can replace the arrays by bigger ones
+        order.apply()
+        self._remove_edges(np.array(removed_slots, dtype=np.int64))
+        tracked_slots = np.array(
+            [slot for slot, _, _, tracked in edges.values() if slot is not None and tracked],
+            dtype=np.int64,
+        )
+        tracked_slots = tracked_slots[~self.tracked[tracked_slots]]
+        self._add_edge_hashes(tracked_slots, sign=-1)
+        self.tracked[tracked_slots] = True
+        self._add_edge_hashes(tracked_slots)
+        new_edges = np.array(
+            [(key // n_nodes, key % n_nodes, weight, length) for key, (slot, weight, length, _) in edges.items()
+             if slot is None],
+            dtype=np.int64,
+        ).reshape(-1, 4)
+        self._append_edges(*new_edges.T, tracked=np.ones(len(new_edges), dtype=bool))
+        self._structure_changed()
+
+    def get_node_edges(self, is_node: np.ndarray) -> np.ndarray:
+        """
+        Get the slots of the alive edges from or to some nodes,
+        reading the edges one chunk at a time (see `get_chunks`)
+        Args:
+            is_node: whether each node is one of the nodes
+        Returns:
+            Array of slots
+        """
+        slots = [
+            np.flatnonzero(
+                self.alive[chunk] & (is_node[self.source[chunk]] | is_node[self.destination[chunk]])
+            ) + chunk.start
+            for chunk in self.get_chunks()
+        ]
+        return np.concatenate(slots) if slots else np.zeros(0, dtype=np.int64)
+
+    def get_chunks(self) -> list[slice]:
+        """
+        Returns:
+            Slices that cover the used edge slots. A single one, as the
+            arrays are in memory
+        """
+        return [slice(0, self.n_edges_used)]
+
+    def _append_edges(
+        self,
+        source: np.ndarray,
+        destination: np.ndarray,
+        weight: np.ndarray,
+        length: np.ndarray,
+        tracked: np.ndarray,
+    ) -> None:
+        """
+        Add edges that are not in the mind, without trickles on their way
+        Args:
+            source: source of each edge
+            destination: destination of each edge
+            weight: weight of each edge
+            length: length of each edge
+            tracked: whether the source of each edge is in the
+                reverse graph of its destination
+        """
+        n = len(source)
+        if self.n_edges_used + n > self.edge_capacity:
+            self._make_room(n)
+        slots = slice(self.n_edges_used, self.n_edges_used + n)
+        self.source[slots] = source
+        self.destination[slots] = destination
+        self.weight[slots] = weight
+        self.length[slots] = length
+        self.pending[slots] = 0
+        self.tracked[slots] = tracked
+        self.alive[slots] = True
+        self.counters[N_EDGES_USED] += n
+        self._add_edge_hashes(np.arange(slots.start, slots.stop))
+
+    def _remove_edges(self, slots: np.ndarray) -> None:
+        """
+        Mark edges as dead
+        Args:
+            slots: slots of the edges to remove
+        """
+        self._add_edge_hashes(slots, sign=-1)
+        if self._statistics is not None:
+            self._statistics.remove_edges(
+                self.source[slots], self.destination[slots], self.weight[slots], self.length[slots],
+            )
+        self.alive[slots] = False
+        self.pending[slots] = 0
+        self.tracked[slots] = False
+
+    def _make_room(self, n_edges: int = 1) -> None:
+        """
+        Compact the edge table, and make it bigger if it has
+        still no room for some edges
+        Args:
+            n_edges: number of edges to add
+        """
+        self.compact()
+        n_alive = self.n_edges_used
+        if n_alive + n_edges > self.edge_capacity:
+            if not self.owns_memory:
+                raise MemoryError("There are no free edge slots in the mind")
+            self._resize_edges(max(2 * self.edge_capacity, n_alive + n_edges))
+
+    def compact(self) -> None:
+        """Move the alive edges to the first slots, keeping their order"""
+        n_edges_used = self.n_edges_used
+        alive = np.flatnonzero(self.alive[:n_edges_used])
+        n_alive = len(alive)
+        for name, _ in EDGE_FIELDS:
+            array = self.arrays[name]
+            array[:n_alive] = array[alive]
+            array[n_alive:n_edges_used] = 0
+        self.counters[N_EDGES_USED] = n_alive
+        self._structure_changed()
+
+    def _resize_edges(self, edge_capacity: int) -> None:
+        """
+        Replace the arrays by new ones with a different number of edge slots
+        Args:
+            edge_capacity: new number of edge slots
+        """
+        new_mind = ArrayMind.allocate(self.n_nodes, edge_capacity)
+        n_edges_used = min(self.n_edges_used, edge_capacity)
+        for name, array in self.arrays.items():
+            if name in dict(EDGE_FIELDS):
+                new_mind.arrays[name][:n_edges_used] = array[:n_edges_used]
+            else:
+                new_mind.arrays[name][:] = array
+        self.arrays = new_mind.arrays
+        self._set_attributes()
+
+    def get_edge_hashes(self) -> np.ndarray:
+        """
+        Get a hash of the outcoming edges of each node: the sum of a hash
+        of the destination, weight, length and `tracked` of each edge, so
+        it does not depend on the order of the slots
+        Returns:
+            Array with the hash of each node
+        """
+        if not self._edge_hashes_in_sync():
+            self._edge_hashes = np.zeros(self.n_nodes, dtype=np.uint64)
+            self._edge_hashes_version = int(self.counters[STRUCTURE_VERSION])
+            for chunk in self.get_chunks():
+                self._add_edge_hashes(np.flatnonzero(self.alive[chunk]) + chunk.start)
+        return self._edge_hashes
+
+    def _edge_hashes_in_sync(self) -> bool:
+        return self._edge_hashes is not None and self._edge_hashes_version == self.counters[STRUCTURE_VERSION]
+
+    def _add_edge_hashes(self, slots: np.ndarray, sign: int = 1) -> None:
+        """
+        Add the hashes of some edges to the hashes of their sources,
+        if they are being kept. See `get_edge_hashes`
+        Args:
+            slots: slots of the edges
+            sign: 1 to add the edges, -1 to remove them
+        """
+        if not self._edge_hashes_in_sync():
+            return
+        x = (
+            self.destination[slots].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+            + self.weight[slots].astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+            + self.length[slots].astype(np.uint64) * np.uint64(0x165667B19E3779F9)
+            + self.tracked[slots].astype(np.uint64)
+        )
+        # Mix the bits, as the finalizer of SplitMix64
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+        if sign > 0:
+            np.add.at(self._edge_hashes, self.source[slots], x)
+        else:
+            np.subtract.at(self._edge_hashes, self.source[slots], x)
+
+    def _structure_changed(self) -> None:
+        """Let other views of the arrays know that the edges changed"""
+        in_sync = self._edge_hashes_in_sync()
+        self.counters[STRUCTURE_VERSION] += 1
+        if in_sync:
+            self._edge_hashes_version = int(self.counters[STRUCTURE_VERSION])
@@ -0,0 +1,256 @@
+from __future__ import annotations
+from typing import Any, Union
+
+import numpy as np
+
+from .environment import MAX_BOUNCES, Environment
+
+
+class BatchPhysics:
+    """
+    Move many bodies at once against the walls of an environment.
+
+    It follows the same steps as `Stynker.get_interaction_information`
+    (first contact of the swept circle with the walls, reflection of
+    the position and of the velocity, until there are no more contacts,
+    the winning/losing segment is touched, or `MAX_BOUNCES` is reached),
+    with the same floating point operations, but every step is computed
+    with NumPy for all the bodies that are still bouncing, against all
+    the walls at once
+    """
+
+    def __init__(self, environment: Environment) -> None:
+        """
+
+        Args:
+            environment: environment whose walls are used
+        """
+        self.environment = environment
+        # Walls as arrays of shape (number of walls,)
+        table = environment.segment_table
+        self.p1x, self.p1y, self.p2x, self.p2y = table[:, 0], table[:, 1], table[:, 2], table[:, 3]
+        self.a, self.b, self.c, self.norm = table[:, 4], table[:, 5], table[:, 6], table[:, 7]
+        self.is_winning = environment.is_winning_array
+        self.is_losing = environment.is_losing_array
+
+    def step(self, positions: np.ndarray, velocities: np.ndarray, radius: Union[float, np.ndarray] = 10) -> dict[str, Any]:
+        """
+        Move every body one cycle with its velocity, bouncing on the walls
+        Args:
+            positions: array of shape (N, 2) with the positions of the bodies
+            velocities: array of shape (N, 2) with their velocities
+            radius: radius of the bodies, the same for all of them or
+                an array of shape (N,)
+        Returns:
+            Dictionary with arrays for all the bodies, with the same
+            information as `Stynker.get_interaction_information`:
+            `new_position` and `final_velocity_vector` (N, 2), `touch_border`,
+            `won` and `lost` (N,), and `route` (N, M, 2) with the points where
+            each body has been, where only the first `route_length` (N,)
+            points of each body are used
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        velocities = np.asarray(velocities, dtype=np.float64)
+        n_bodies = len(positions)
+        radii = np.broadcast_to(np.asarray(radius, dtype=np.float64), (n_bodies,))
+
+        new_positions = positions + velocities
+        final_velocities = velocities.copy()
+        touch_border = np.zeros(n_bodies, dtype=bool)
+        won = np.zeros(n_bodies, dtype=bool)
+        lost = np.zeros(n_bodies, dtype=bool)
+        route = np.empty((n_bodies, MAX_BOUNCES + 2, 2))
+        route[:, 0] = positions
+        route[:, 1] = new_positions
+        route_length = np.full(n_bodies, 2)
+
+        # Bodies that may still bounce, and their last point on the route.
+        # All of them have bounced the same number of times
+        active = np.arange(n_bodies)
+        last_positions = positions.copy()
+        for n_bounces in range(MAX_BOUNCES + 1):
+            hits, walls, points, normals = self.get_first_contacts(
+                last_positions[active], new_positions[active], radii[active]
+            )
+            active = active[hits]
+            walls = walls[hits]
+            points = points[hits]
+            normals = normals[hits]
+            if not len(active):
+                break
+
+            touch_border[active] = True
+            won[active] |= self.is_winning[walls]
+            lost[active] |= self.is_losing[walls]
+            # The last point of the route was outside the environment
+            route[active, route_length[active] - 1] = points
+            last_positions[active] = points
+
+            # No further calculation is required for the bodies that won or lost
+            bouncing = ~(won[active] | lost[active])
+            active = active[bouncing]
+            points = points[bouncing]
+            # Bounce on the line tangent to the circle at the contact
+            a, b = normals[bouncing, 0], normals[bouncing, 1]
+            c = -a * points[:, 0] - b * points[:, 1]
+            norm = np.sqrt(a * a + b * b)
+            final_velocities[active] = self.calculate_velocity_vectors(final_velocities[active], a, b, norm)
+            if n_bounces == MAX_BOUNCES:
+                # Stop at the contact
+                new_positions[active] = points
+                break
+            new_positions[active] = self.reflect_points_over_lines(new_positions[active], a, b, c)
+            route[active, route_length[active]] = new_positions[active]
+            route_length[active] += 1
+
+        return {
+            "previous_position": positions,
+            "new_position": new_positions,
+            "initial_velocity_vector": velocities,
+            "final_velocity_vector": final_velocities,
+            "touch_border": touch_border,
+            "won": won,
+            "lost": lost,
+            "route": route,
+            "route_length": route_length,
+        }
+
+    @staticmethod
+    def to_lists(step: dict[str, Any]) -> dict[str, list]:
+        """
+        Convert the arrays of a step to lists of Python values, which
+        are faster to read one body at a time
+        Args:
+            step: result of `step`
+        Returns:
+            Dictionary with the same keys, and the arrays as nested lists.
+            The `route` of the bodies that did not touch a wall is None,
+            as it only has the previous and the new position
+        """
+        lists = {key: value.tolist() for key, value in step.items() if key != "route"}
+        touched = np.flatnonzero(step["touch_border"])
+        route = [None] * len(step["route"])
+        for i, points in zip(touched.tolist(), step["route"][touched].tolist()):
+            route[i] = points
+        lists["route"] = route
+        return lists
+
+    def get_first_contacts(
+        self,
+        initial_positions: np.ndarray,
+        final_positions: np.ndarray,
+        radii: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        For the movement of each body from an initial to a final position,
+        find the first wall it touches. See `Environment.find_first_contact`
+        Args:
+            initial_positions: array of shape (N, 2)
+            final_positions: array of shape (N, 2)
+            radii: array of shape (N,)
+        Returns:
+            Whether each body touches a wall (N,), index of the first wall
+            touched (N,), position of the center (N, 2) and normal (N, 2)
+            of the contact
+        """
+        # Bodies along the first axis, walls along the second
+        x0, y0 = initial_positions[:, 0:1], initial_positions[:, 1:2]
+        dx = final_positions[:, 0:1] - x0
+        dy = final_positions[:, 1:2] - y0
+        squared_length = dx * dx + dy * dy
+        radius = radii[:, None]
+        a, b, c, norm = self.a, self.b, self.c, self.norm
+
+        # Contacts with the walls, from the side of the center
+        nx = a / norm
+        ny = b / norm
+        distance = (a * x0 + b * y0 + c) / norm
+        speed = nx * dx + ny * dy
+        side = np.where(distance < 0, -1.0, 1.0)
+        distance = distance * side
+        speed = speed * side
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_wall = np.maximum((distance - radius) / -speed, 0.0)
+            t_wall = np.where(speed < 0, t_wall, np.inf)
+            u = ((x0 + t_wall * dx - self.p1x) * b - (y0 + t_wall * dy - self.p1y) * a) / (norm * norm)
+        t_wall = np.where((u >= 0.0) & (u <= 1.0), t_wall, np.inf)
+
+        # Contacts with the ends of the walls
+        t_p1 = self.get_times_to_points(x0, y0, dx, dy, squared_length, self.p1x, self.p1y, radius)
+        t_p2 = self.get_times_to_points(x0, y0, dx, dy, squared_length, self.p2x, self.p2y, radius)
+
+        # The same order as `Environment.find_first_contact`, so `argmin`
+        # breaks ties in the same way
+        t = np.stack([t_wall, t_p1, t_p2], axis=2)
+        t[distance + np.minimum(speed, 0.0) > radius] = np.inf
+        t = t.reshape(len(x0), -1)
+        t = np.where(t < 1.0, t, np.inf)
+        first = np.argmin(t, axis=1)
+        bodies = np.arange(len(x0))
+        first_t = t[bodies, first]
+        hits = np.isfinite(first_t)
+        first_t = np.where(hits, first_t, 0.0)
+        walls, kind = np.divmod(first, 3)
+
+        x0, y0, dx, dy = x0[:, 0], y0[:, 0], dx[:, 0], dy[:, 0]
+        cx = x0 + first_t * dx
+        cy = y0 + first_t * dy
+        points = np.stack([cx, cy], axis=1)
+        # Normal of the contacts with the walls
+        normal_x = nx[walls] * side[bodies, walls]
+        normal_y = ny[walls] * side[bodies, walls]
+        # Normal of the contacts with the ends
+        ex = np.where(kind == 1, self.p1x[walls], self.p2x[walls])
+        ey = np.where(kind == 1, self.p1y[walls], self.p2y[walls])
+        end_x = cx - ex
+        end_y = cy - ey
+        d = np.sqrt(end_x * end_x + end_y * end_y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            length = np.sqrt(dx * dx + dy * dy)
+            end_x, end_y = (
+                np.where(d > 0, end_x / d, -dx / length),
+                np.where(d > 0, end_y / d, -dy / length),
+            )
+        is_end = kind > 0
+        normals = np.stack([np.where(is_end, end_x, normal_x), np.where(is_end, end_y, normal_y)], axis=1)
+        return hits, walls, points, normals
+
+    @staticmethod
+    def get_times_to_points(x0, y0, dx, dy, squared_length, px, py, radius) -> np.ndarray:
+        """
+        Vectorized version of `Environment.get_time_to_point`, where
+        the contacts that do not happen are `np.inf`
+        """
+        mx = x0 - px
+        my = y0 - py
+        projection = mx * dx + my * dy
+        c = mx * mx + my * my - radius * radius
+        discriminant = projection * projection - squared_length * c
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = c / (-projection + np.sqrt(discriminant))
+        t = np.where(c <= 0, 0.0, np.where(discriminant < 0, np.inf, t))
+        return np.where(projection >= 0, np.inf, t)
+
+    @staticmethod
+    def reflect_points_over_lines(points: np.ndarray, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+        """Vectorized version of `Environment.reflect_point_over_line`"""
+        x0, y0 = points[:, 0], points[:, 1]
+        z = a * a + b * b
+        x = x0 * (b * b - a * a) - 2 * a * (b * y0 + c)
+        y = y0 * (a * a - b * b) - 2 * b * (a * x0 + c)
+        return np.stack([x / z, y / z], axis=1)
+
+    @staticmethod
+    def calculate_velocity_vectors(
+        velocities: np.ndarray,
+        a: np.ndarray,
+        b: np.ndarray,
+        norm: np.ndarray,
+    ) -> np.ndarray:
+        """Vectorized version of `Environment.calculate_velocity_vector`"""
+        nx, ny = a / norm, b / norm
+        dot_product = nx * velocities[:, 0] + ny * velocities[:, 1]
+        return np.stack([
+            velocities[:, 0] - 2 * dot_product * nx,
+            velocities[:, 1] - 2 * dot_product * ny,
+        ], axis=1)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import sqlite3
+from typing import Optional, Union
+
+
+class EvaluationCache:
+    """
+    Persistent cache of evaluation results, stored in a SQLite file.
+
+    Results are identified by the structural hash of the mind, the
+    environment, the seed and the number of cycles, or the schedule,
+    of the evaluation.
+    When the cache holds more than `max_entries` results, the least
+    recently used ones are evicted
+    """
+
+    def __init__(self, path: str = "evaluations.sqlite", max_entries: int = 100000) -> None:
+        """
+
+        Args:
+            path: SQLite file to use. ":memory:" keeps the cache in memory
+            max_entries: maximum number of results to keep
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Several processes can share the file, e.g. the workers of a `JobServer`
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS evaluations ("
+            "key TEXT PRIMARY KEY, "
+            "wins INTEGER NOT NULL, "
+            "losses INTEGER NOT NULL, "
+            "last_access INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS evaluations_last_access "
+            "ON evaluations (last_access)"
+        )
+        self.connection.commit()
+        # Logical clock used to know which results were used last
+        row = self.connection.execute("SELECT MAX(last_access) FROM evaluations").fetchone()
+        self._clock = row[0] or 0
+
+    @staticmethod
+    def get_key(mind_hash: str, environment: str, seed: int, n_cycles: Union[int, list[tuple[str, int]]]) -> str:
+        """
+        Get the key that identifies an evaluation
+        Args:
+            mind_hash: structural hash of the mind
+            environment: key of the environment
+            seed: seed of the random generator used in the evaluation
+            n_cycles: number of wake cycles of the evaluation, or its
+                schedule as a list of (period, number of cycles)
+        Returns:
+            Key of the evaluation
+        """
+        if not isinstance(n_cycles, int):
+            n_cycles = ",".join(f"{period}:{n}" for period, n in n_cycles)
+        return f"{mind_hash}|{environment}|{seed}|{n_cycles}"
+
+    def get(self, key: str) -> Optional[tuple[int, int]]:
+        """
+        Get the result of an evaluation
+        Args:
+            key: key of the evaluation, see `get_key`
+        Returns:
+            Number of wins and losses, or None if it is not cached
+        """
+        row = self.connection.execute(
+            "SELECT wins, losses FROM evaluations WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._clock += 1
+        self.connection.execute(
+            "UPDATE evaluations SET last_access = ? WHERE key = ?", (self._clock, key)
+        )
+        self.connection.commit()
+        return row
+
+    def put(self, key: str, wins: int, losses: int) -> None:
+        """
+        Save the result of an evaluation
+        Args:
+            key: key of the evaluation, see `get_key`
+            wins: number of wins in the evaluation
+            losses: number of losses in the evaluation
+        """
+        self._clock += 1
+        self.connection.execute(
+            "INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?)",
+            (key, wins, losses, self._clock),
+        )
+        # Evict the least recently used results
+        self.connection.execute(
+            "DELETE FROM evaluations WHERE key IN ("
+            "SELECT key FROM evaluations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
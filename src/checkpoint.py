@@ -0,0 +1,342 @@
+from __future__ import annotations
+import os
+import re
+from typing import Any
+
+import numpy as np
+
+from .array_mind import EDGE_FIELDS, ArrayMind, get_layout, get_nbytes
+from .results_store import append_to_file
+
+# Header of the base snapshots: magic string, version, number of nodes,
+# number of edge slots and cycle of the snapshot. The arrays of the mind
+# follow, as in `get_layout`
+MAGIC = b"STKCHKPT"
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("padding", "<u4"),
+    ("n_nodes", "<i8"),
+    ("edge_capacity", "<i8"),
+    ("cycle", "<i8"),
+])
+VERSION = 2
+
+# Header of each record of the delta files, followed by the arrays of
+# `get_delta_layout`. `nbytes` is the size of the arrays
+DELTA_MAGIC = b"STKDELTA"
+DELTA_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("cycle", "<i8"),
+    ("n_remade", "<i8"),
+    ("n_keys", "<i8"),
+    ("n_edges", "<i8"),
+    ("n_pending", "<i8"),
+    ("nbytes", "<i8"),
+])
+
+# Arrays of the state that changes in every cycle, written in every delta
+STATE_FIELDS = ("order", "level", "damage", "num_sleep_cycles", "is_active", "spilled")
+
+# Files of each generation: a base snapshot, and the deltas written after it
+BASE_PATTERN = re.compile(r"base_(\d+)\.bin")
+
+
+def get_delta_layout(
+    n_nodes: int,
+    n_remade: int,
+    n_keys: int,
+    n_edges: int,
+    n_pending: int,
+) -> list[tuple[str, np.dtype, int]]:
+    """
+    Get the arrays of a delta, in the order they are written. The arrays
+    of 8 bytes go first, so all of them are aligned
+    Args:
+        n_nodes: number of nodes of the mind
+        n_remade: number of nodes remade
+        n_keys: number of edges added, removed or changed
+        n_edges: number of those edges that are in the mind
+        n_pending: number of edges with trickles on their way
+    Returns:
+        List of (name, type, number of elements)
+    """
+    return [
+        ("remade", np.int64, n_remade),
+        ("size", np.int64, n_remade),
+        ("endo", np.int64, n_remade),
+        ("duration", np.int64, n_remade),
+        ("keys", np.int64, n_keys),
+        ("source", np.int64, n_edges),
+        ("destination", np.int64, n_edges),
+        ("weight", np.int64, n_edges),
+        ("length", np.int64, n_edges),
+        ("order", np.int64, n_nodes),
+        ("level", np.int64, n_nodes),
+        ("damage", np.int64, n_nodes),
+        ("num_sleep_cycles", np.int64, n_nodes),
+        ("pending_key", np.int64, n_pending),
+        ("tracked", np.bool_, n_edges),
+        ("is_active", np.bool_, n_nodes),
+        ("spilled", np.bool_, n_nodes),
+        ("pending", np.uint8, n_pending),
+    ]
+
+
+class MindCheckpoints:
+    """
+    Checkpoints of a mind run by an `ArrayMind` (or an engine that wraps
+    one), written as a full base snapshot followed by compact deltas.
+
+    Between sleep cycles only the levels, the damage, the activations and
+    the trickles change, and each sleep cycle remakes a few nodes. So
+    each delta has the nodes remade, the edges added, removed or changed
+    (see `ArrayMind.pop_changes`), the state of the nodes and the edges
+    with trickles on their way. The size of the deltas depends on how
+    much the mind changes, not on its size.
+
+    A new base is written when the structure of the mind changed in an
+    unknown way (e.g. after `load_graph`), after `max_deltas` deltas, or
+    when the deltas are bigger than the base. Each base starts a new
+    generation, `base_<n>.bin` and `deltas_<n>.bin`, and the files of the
+    previous one are removed once it is written, so there is always a
+    complete checkpoint on disk. Deltas are appended with a single write,
+    and a delta cut by a crash is ignored. The mind loaded has no dead
+    edge slots, so replaying many remakes does not make it bigger
+    """
+
+    def __init__(self, directory: str, max_deltas: int = 100) -> None:
+        """
+
+        Args:
+            directory: directory of the checkpoints of a single mind
+            max_deltas: maximum number of deltas after a base
+        """
+        self.directory = directory
+        self.max_deltas = max_deltas
+        os.makedirs(directory, exist_ok=True)
+        self.generation = self.get_generation()
+        self.base_nbytes = 0
+        self.deltas_nbytes = 0
+        self.n_deltas = 0
+        # Whether the next delta can be written after the files on disk.
+        # Only known for the checkpoints written by this instance
+        self._continues = False
+
+    def get_generation(self) -> int:
+        """
+        Returns:
+            Number of the last base in the directory, or -1 if there is none
+        """
+        generations = [
+            int(match.group(1))
+            for match in map(BASE_PATTERN.fullmatch, os.listdir(self.directory))
+            if match is not None
+        ]
+        return max(generations, default=-1)
+
+    def get_base_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"base_{generation}.bin")
+
+    def get_deltas_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"deltas_{generation}.bin")
+
+    def exists(self) -> bool:
+        return self.generation >= 0
+
+    def save(self, engine: Any, cycle: int) -> int:
+        """
+        Write a checkpoint of a mind: a delta if possible, or a new base
+        Args:
+            engine: `ArrayMind`, or an engine that wraps one (with a `mind` attribute)
+            cycle: cycle of the checkpoint
+        Returns:
+            Number of bytes written
+        """
+        mind = getattr(engine, "mind", engine)
+        changes = mind.pop_changes()
+        if changes is None or not self._continues or self.n_deltas >= self.max_deltas:
+            return self.write_base(mind, cycle)
+        data = self.get_delta(mind, cycle, *changes)
+        if self.deltas_nbytes + len(data) > self.base_nbytes:
+            return self.write_base(mind, cycle)
+        append_to_file(self.get_deltas_path(self.generation), data)
+        self.deltas_nbytes += len(data)
+        self.n_deltas += 1
+        return len(data)
+
+    def write_base(self, mind: ArrayMind, cycle: int) -> int:
+        """
+        Start a new generation with a full snapshot of a mind
+        Args:
+            mind: mind to write
+            cycle: cycle of the snapshot
+        Returns:
+            Number of bytes written
+        """
+        generation = self.generation + 1
+        path = self.get_base_path(generation)
+        header = np.array([(MAGIC, VERSION, 0, mind.n_nodes, mind.edge_capacity, cycle)], dtype=HEADER_DTYPE)
+        n_edges_used = mind.n_edges_used
+        nbytes = HEADER_DTYPE.itemsize
+        # Write to a temporary file first, so the last base is never lost
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(header.tobytes())
+            for name, dtype, n_elements, offset in get_layout(mind.n_nodes, mind.edge_capacity):
+                array = mind.arrays[name]
+                if name in dict(EDGE_FIELDS):
+                    # The free slots are zeros, and are not written
+                    array = array[:n_edges_used]
+                f.seek(HEADER_DTYPE.itemsize + offset)
+                f.write(array.tobytes())
+                nbytes += array.nbytes
+            f.truncate(HEADER_DTYPE.itemsize + get_nbytes(mind.n_nodes, mind.edge_capacity))
+        os.replace(temporary_path, path)
+
+        # The previous generation is not needed anymore
+        for old_path in (self.get_base_path(self.generation), self.get_deltas_path(self.generation)):
+            if os.path.isfile(old_path):
+                os.remove(old_path)
+        self.generation = generation
+        self.base_nbytes = nbytes
+        self.deltas_nbytes = 0
+        self.n_deltas = 0
+        self._continues = True
+        return nbytes
+
+    @staticmethod
+    def get_delta(mind: ArrayMind, cycle: int, remade: set[int], keys: set[int]) -> bytes:
+        """
+        Get the record of a delta
+        Args:
+            mind: mind to write
+            cycle: cycle of the checkpoint
+            remade: nodes remade since the last checkpoint
+            keys: keys of the edges added, removed or changed since the
+                last checkpoint, see `ArrayMind.get_edge_keys`
+        Returns:
+            Header and arrays of the delta
+        """
+        remade = np.array(sorted(remade), dtype=np.int64)
+        keys = np.array(sorted(keys), dtype=np.int64)
+        used = slice(0, mind.n_edges_used)
+        alive = mind.alive[used]
+        slots = np.flatnonzero(alive)
+        edges = slots[np.isin(mind.get_edge_keys(slots), keys)]
+        pending = np.flatnonzero(alive & (mind.pending[used] != 0))
+        values = {
+            "remade": remade,
+            "size": mind.size[remade],
+            "endo": mind.endo[remade],
+            "duration": mind.duration[remade],
+            "keys": keys,
+            "source": mind.source[edges],
+            "destination": mind.destination[edges],
+            "weight": mind.weight[edges],
+            "length": mind.length[edges],
+            "tracked": mind.tracked[edges],
+            "pending_key": mind.get_edge_keys(pending),
+            "pending": mind.pending[pending],
+            **{name: mind.arrays[name] for name in STATE_FIELDS},
+        }
+        layout = get_delta_layout(mind.n_nodes, len(remade), len(keys), len(edges), len(pending))
+        arrays = [np.ascontiguousarray(values[name], dtype=dtype).tobytes() for name, dtype, _ in layout]
+        header = np.array(
+            [(DELTA_MAGIC, cycle, len(remade), len(keys), len(edges), len(pending), sum(map(len, arrays)))],
+            dtype=DELTA_HEADER_DTYPE,
+        )
+        return b"".join([header.tobytes()] + arrays)
+
+    def read_deltas(self, n_nodes: int) -> list[tuple[int, dict[str, np.ndarray]]]:
+        """
+        Read the deltas of the last generation
+        Args:
+            n_nodes: number of nodes of the mind
+        Returns:
+            List of (cycle, arrays of the delta), in the order they were written
+        """
+        path = self.get_deltas_path(self.generation)
+        if not os.path.isfile(path):
+            return list()
+        with open(path, "rb") as f:
+            data = f.read()
+        deltas = list()
+        position = 0
+        while position + DELTA_HEADER_DTYPE.itemsize <= len(data):
+            header = np.frombuffer(data, dtype=DELTA_HEADER_DTYPE, count=1, offset=position)[0]
+            position += DELTA_HEADER_DTYPE.itemsize
+            if header["magic"] != DELTA_MAGIC or position + int(header["nbytes"]) > len(data):
+                # Cut by a crash
+                break
+            arrays = dict()
+            layout = get_delta_layout(
+                n_nodes,
+                *(int(header[name]) for name in ("n_remade", "n_keys", "n_edges", "n_pending")),
+            )
+            for name, dtype, n_elements in layout:
+                arrays[name] = np.frombuffer(data, dtype=dtype, count=n_elements, offset=position)
+                position += n_elements * np.dtype(dtype).itemsize
+            deltas.append((int(header["cycle"]), arrays))
+        return deltas
+
+    def load(self) -> tuple[ArrayMind, int]:
+        """
+        Read the last checkpoint: the base, with its deltas replayed
+        and its edge table compacted
+        Returns:
+            Mind with its own memory, and cycle of the checkpoint
+        """
+        if not self.exists():
+            raise FileNotFoundError(f"There are no checkpoints in {self.directory}")
+        path = self.get_base_path(self.generation)
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]["magic"] != MAGIC or header[0]["version"] != VERSION:
+            raise ValueError(f"{path} is not a checkpoint of version {VERSION}")
+        n_nodes = int(header[0]["n_nodes"])
+        edge_capacity = int(header[0]["edge_capacity"])
+        cycle = int(header[0]["cycle"])
+        with open(path, "rb") as f:
+            f.seek(HEADER_DTYPE.itemsize)
+            buffer = bytearray(f.read())
+        mind = ArrayMind.from_buffer(buffer, n_nodes, edge_capacity, owns_memory=True)
+        mind._structure_changed()
+
+        deltas = self.read_deltas(n_nodes)
+        for cycle, delta in deltas:
+            self.apply_delta(mind, delta)
+        # Remove the slots of the edges replaced by the deltas
+        mind.compact()
+        self.base_nbytes = len(buffer) + HEADER_DTYPE.itemsize
+        self.n_deltas = len(deltas)
+        # Deltas written later must start from the state of the mind loaded
+        self._continues = False
+        return mind, cycle
+
+    @staticmethod
+    def apply_delta(mind: ArrayMind, delta: dict[str, np.ndarray]) -> None:
+        """
+        Replay a delta on a mind
+        Args:
+            mind: mind in the state of the previous checkpoint
+            delta: arrays of the delta, see `get_delta_layout`
+        """
+        remade = delta["remade"]
+        for name in ("size", "endo", "duration"):
+            mind.arrays[name][remade] = delta[name]
+        mind.replace_edges(
+            delta["keys"],
+            *(delta[name] for name in ("source", "destination", "weight", "length", "tracked")),
+        )
+        for name in STATE_FIELDS:
+            mind.arrays[name][:] = delta[name]
+        mind.rank[mind.order] = np.arange(mind.n_nodes)
+
+        # Trickles on their way
+        n_edges_used = mind.n_edges_used
+        mind.pending[:n_edges_used] = 0
+        slots = np.flatnonzero(mind.alive[:n_edges_used])
+        keys = mind.get_edge_keys(slots)
+        sorted_keys = np.argsort(keys)
+        positions = np.searchsorted(keys, delta["pending_key"], sorter=sorted_keys)
+        mind.pending[slots[sorted_keys[positions]]] = delta["pending"]
@@ -0,0 +1,508 @@
+from __future__ import annotations
+import os
+import random
+import tempfile
+from typing import Any
+
+import numpy as np
+
+from . import kernels
+from .array_mind import ArrayMind
+from .environment import Environment
+from .mapped_mind import MappedMind
+from .partitioned_mind import PartitionedMind
+from .stynker import Stynker, StynkerMind
+
+# Engines that can be checked. "object" runs the `Node`/`Edge` objects,
+# which is useful to check the backends of the kernels alone
+ENGINES = ("object", "array", "partitioned", "mapped")
+
+# Fields of the state of the mind, in the order they are compared
+NODE_STATE_FIELDS = ("size", "endo", "duration", "level", "damage", "is_active", "num_sleep_cycles")
+EDGE_STATE_FIELDS = ("weight", "length", "pending")
+
+
+def get_mind_state(mind: StynkerMind) -> dict[str, np.ndarray]:
+    """
+    Get the state of a mind in a form that does not depend on the engine
+    Args:
+        mind: mind, with or without an engine attached
+    Returns:
+        Dictionary with the order of the graph, one array per node field
+        (indexed by name), the edges as `source * n_nodes + destination`
+        (sorted) with one array per edge field, and the edges that are
+        in the reverse graph
+    """
+    engine = getattr(mind.engine, "mind", mind.engine)
+    if engine is not None:
+        n_nodes = engine.n_nodes
+        state = {"order": engine.order.copy()}
+        for field in NODE_STATE_FIELDS:
+            state[field] = engine.arrays[field].astype(np.int64)
+        slots = np.flatnonzero(engine.alive[:engine.n_edges_used])
+        keys = engine.source[slots] * n_nodes + engine.destination[slots]
+        order = np.argsort(keys)
+        state["edge"] = keys[order]
+        for field in EDGE_STATE_FIELDS:
+            state[field] = engine.arrays[field][slots][order].astype(np.int64)
+        state["tracked"] = np.sort(keys[engine.tracked[slots]])
+        return state
+
+    n_nodes = len(mind.graph)
+    state = {"order": np.array([node.name for node in mind.graph], dtype=np.int64)}
+    nodes = sorted(mind.graph, key=lambda node: node.name)
+    for field in NODE_STATE_FIELDS:
+        state[field] = np.array([int(getattr(node, field)) for node in nodes], dtype=np.int64)
+    edges = sorted(
+        (
+            node.name * n_nodes + edge.node.name,
+            edge.weight,
+            edge.length,
+            sum(1 << (step - 1) for step in edge.next_steps),
+        )
+        for node, node_edges in mind.graph.items()
+        for edge in node_edges
+    )
+    columns = np.array(edges, dtype=np.int64).reshape(-1, 4)
+    state["edge"] = columns[:, 0]
+    for k, field in enumerate(EDGE_STATE_FIELDS, start=1):
+        state[field] = columns[:, k]
+    # `remake_edges` leaves the remade node in the reverse graph of its
+    # old destinations. Those entries have no effect, as there is no edge
+    # to remove, so only the ones of existing edges are compared
+    edge_keys = set(state["edge"].tolist())
+    state["tracked"] = np.array(sorted(
+        key
+        for destination, sources in mind.reverse_graph.items()
+        for key in (source.name * n_nodes + destination.name for source in sources)
+        if key in edge_keys
+    ), dtype=np.int64)
+    return state
+
+
+def get_body_state(stynker: Stynker, info: Any) -> dict[str, Any]:
+    """
+    Get the state of the body of a Stynker after a cycle
+    Args:
+        stynker: Stynker
+        info: result of the cycle. Only used in the wake cycles
+    Returns:
+        Dictionary with the position, the velocity and, in the wake
+        cycles, the route and the contact with the border
+    """
+    state = {
+        "position": tuple(stynker.position),
+        "velocity_vector": tuple(stynker.velocity_vector),
+    }
+    if info is not None:
+        state["route"] = info.route
+        state["touch_border"] = bool(info.touch_border)
+        state["won"] = bool(info.won)
+        state["lost"] = bool(info.lost)
+    return state
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert NumPy values so they can be written as JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def find_difference(
+    reference: dict[str, Any],
+    candidate: dict[str, Any],
+    n_nodes: int,
+) -> tuple[str, Any, Any, Any]:
+    """
+    Find the first field where two states differ
+    Args:
+        reference: state of the reference
+        candidate: state of the candidate
+        n_nodes: number of nodes of the minds
+    Returns:
+        Field, index in the field (the name of the node, (source, destination)
+        of the edge, or the position in the array), value of the reference
+        and value of the candidate. None if the states are equal
+    """
+    for field, reference_value in reference.items():
+        candidate_value = candidate[field]
+        if not isinstance(reference_value, np.ndarray):
+            if reference_value != candidate_value:
+                return field, None, reference_value, candidate_value
+            continue
+        if reference_value.shape != candidate_value.shape:
+            # Different number of edges
+            return field, None, len(reference_value), len(candidate_value)
+        different = np.flatnonzero(reference_value != candidate_value)
+        if len(different) == 0:
+            continue
+        i = int(different[0])
+        index = i
+        if field in EDGE_STATE_FIELDS:
+            key = int(reference["edge"][i])
+            index = (key // n_nodes, key % n_nodes)
+        return field, index, to_json_value(reference_value[i]), to_json_value(candidate_value[i])
+    return None
+
+
+class ConformanceHarness:
+    """
+    Check that an engine reproduces exactly the `Node`/`Edge` objects
+    and the physics of the `Environment`.
+
+    Two Stynkers are made from the same seed: the reference, which
+    runs the objects with the "numpy" backend of the kernels (the
+    interpreted wake cycle), and the candidate, with the engine and the
+    backend to check. They run the same schedule in lockstep, with the
+    same state of `random` in every cycle, and after each cycle their
+    minds (levels, damage, activations, sizes, edges and pending
+    trickles), their bodies (position, velocity and route) and the
+    draws of `random` are compared. Wins and losses move both Stynkers
+    back to the initial position, as in `Evaluator`.
+
+    The first difference is reported with a reproducer: the smallest
+    run found that still shows a difference
+    """
+
+    def __init__(
+        self,
+        engine: str = "array",
+        backend: str = "numpy",
+        n_nodes: int = 48,
+        n_input: int = 32,
+        n_output: int = 16,
+        n_remakes: int = 4,
+        random_sleep: bool = False,
+        environment: str = "simple_maze",
+        friction_coefficient: float = 1.0,
+        winning_segment: list = None,
+    ) -> None:
+        """
+
+        Args:
+            engine: engine of the candidate, one of `ENGINES`
+            backend: backend of the kernels of the candidate, see `kernels.set_backend`
+            n_nodes: number of nodes of the minds
+            n_input: number of input nodes
+            n_output: number of output nodes
+            n_remakes: number of nodes remade in each sleep cycle
+            random_sleep: whether the nodes to remake are chosen randomly
+            environment: name of the maze
+            friction_coefficient: friction of the Stynkers
+            winning_segment: winning segment of the maze. By default,
+                the one chosen by this process (see `Environment.get_environment`)
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Engine must be one of the following: {', '.join(ENGINES)}")
+        self.engine = engine
+        self.backend = backend
+        self.n_nodes = n_nodes
+        self.n_input = n_input
+        self.n_output = n_output
+        self.n_remakes = n_remakes
+        self.random_sleep = random_sleep
+        self.environment_name = environment
+        self.friction_coefficient = friction_coefficient
+        self.environment = self.get_environment(environment, winning_segment)
+
+    @staticmethod
+    def get_environment(env_name: str, winning_segment: list = None) -> Environment:
+        """
+        Get an environment with a given winning segment
+        Args:
+            env_name: name of the maze
+            winning_segment: winning segment. If None, the one of the
+                shared environment
+        Returns:
+            The shared environment, or a copy with the goals swapped
+        """
+        environment = Environment.get_environment(env_name)
+        if winning_segment is None:
+            return environment
+        winning_segment = tuple(tuple(point) for point in winning_segment)
+        if winning_segment == environment.winning_segment:
+            return environment
+        if winning_segment != environment.losing_segment:
+            raise ValueError(f"{winning_segment} is not a goal of {env_name}")
+        return Environment(
+            border_coordinates=environment.border_coordinates,
+            winning_segment=environment.losing_segment,
+            losing_segment=environment.winning_segment,
+            name=environment.name,
+            geometry=environment.geometry,
+        )
+
+    def get_parameters(self) -> dict[str, Any]:
+        """
+        Returns:
+            Arguments to create the same harness, as JSON values
+        """
+        return {
+            "engine": self.engine,
+            "backend": self.backend,
+            "n_nodes": self.n_nodes,
+            "n_input": self.n_input,
+            "n_output": self.n_output,
+            "n_remakes": self.n_remakes,
+            "random_sleep": self.random_sleep,
+            "environment": self.environment_name,
+            "friction_coefficient": self.friction_coefficient,
+            "winning_segment": [list(point) for point in self.environment.winning_segment],
+        }
+
+    def make_stynker(self, seed: int) -> Stynker:
+        """
+        Args:
+            seed: seed of the random generator
+        Returns:
+            New Stynker, whose mind only depends on the seed
+        """
+        random.seed(seed)
+        return Stynker(
+            environment=self.environment,
+            color="black",
+            n_nodes=self.n_nodes,
+            n_input=self.n_input,
+            n_output=self.n_output,
+            n_remakes=self.n_remakes,
+            random_sleep=self.random_sleep,
+            friction_coefficient=self.friction_coefficient,
+        )
+
+    def attach_engine(self, stynker: Stynker, directory: str) -> None:
+        """
+        Attach the engine of the candidate
+        Args:
+            stynker: candidate Stynker
+            directory: directory for the files of the engine
+        """
+        if self.engine == "array":
+            stynker.attach_engine(ArrayMind.from_mind(stynker))
+        elif self.engine == "partitioned":
+            stynker.attach_engine(PartitionedMind(ArrayMind.from_mind(stynker), n_workers=2))
+        elif self.engine == "mapped":
+            stynker.attach_engine(MappedMind.from_mind(stynker, os.path.join(directory, "mind.bin")))
+
+    def check(self, schedule: list[tuple[str, int]], seed: int = 0) -> dict[str, Any]:
+        """
+        Run the reference and the candidate in lockstep
+        Args:
+            schedule: list of (period, number of cycles)
+            seed: seed of the random generator
+        Returns:
+            The first difference, or None if there is none. See `find_difference`.
+            It also has the `cycle` (counted from 0, -1 before the first
+            cycle) and the `period` where it was found
+        """
+        previous_backend = kernels.get_backend()
+        reference = self.make_stynker(seed)
+        candidate = self.make_stynker(seed)
+        with tempfile.TemporaryDirectory() as directory:
+            self.attach_engine(candidate, directory)
+            try:
+                return self._run_lockstep(reference, candidate, schedule)
+            finally:
+                candidate.detach_engine()
+                kernels.set_backend(previous_backend)
+
+    def _run_lockstep(
+        self,
+        reference: Stynker,
+        candidate: Stynker,
+        schedule: list[tuple[str, int]],
+    ) -> dict[str, Any]:
+        """
+        Run the cycles of `check`
+        Args:
+            reference: Stynker that runs the objects
+            candidate: Stynker with the engine to check
+            schedule: list of (period, number of cycles)
+        Returns:
+            See `check`
+        """
+        difference = find_difference(get_mind_state(reference), get_mind_state(candidate), self.n_nodes)
+        if difference is not None:
+            return self._get_divergence(difference, -1, None)
+
+        cycle = 0
+        for period, n_cycles in schedule:
+            reference.assign_period(period)
+            candidate.assign_period(period)
+            for _ in range(n_cycles):
+                random_state = random.getstate()
+                kernels.set_backend("numpy")
+                reference_info = reference.run_cycle()
+                reference_random_state = random.getstate()
+                reference_body = get_body_state(reference, reference_info)
+
+                random.setstate(random_state)
+                kernels.set_backend(self.backend)
+                candidate_info = candidate.run_cycle()
+                candidate_random_state = random.getstate()
+                candidate_body = get_body_state(candidate, candidate_info)
+
+                difference = (
+                    find_difference(reference_body, candidate_body, self.n_nodes)
+                    or find_difference(get_mind_state(reference), get_mind_state(candidate), self.n_nodes)
+                )
+                if difference is None and reference_random_state != candidate_random_state:
+                    difference = ("random_state", None, None, None)
+                if difference is not None:
+                    return self._get_divergence(difference, cycle, period)
+
+                random.setstate(reference_random_state)
+                if period == "wake" and (reference_info.won or reference_info.lost):
+                    for stynker in (reference, candidate):
+                        stynker.reset_position()
+                        stynker.reset_vector()
+                cycle += 1
+        return None
+
+    @staticmethod
+    def _get_divergence(difference: tuple[str, Any, Any, Any], cycle: int, period: str) -> dict[str, Any]:
+        field, index, reference_value, candidate_value = difference
+        return {
+            "cycle": cycle,
+            "period": period,
+            "field": field,
+            "index": index,
+            "reference": to_json_value(reference_value),
+            "candidate": to_json_value(candidate_value),
+        }
+
+    def find_reproducer(
+        self,
+        schedule: list[tuple[str, int]],
+        seed: int,
+        divergence: dict[str, Any],
+    ) -> dict[str, Any]:
+        """
+        Make a run that diverges as small as possible: the schedule is
+        cut at the divergence, smaller minds are tried, and then each
+        period of the schedule is removed if it is not needed
+        Args:
+            schedule: schedule of the run that diverged
+            seed: seed of the run that diverged
+            divergence: result of `check` for the run
+        Returns:
+            Dictionary with the `parameters` of the harness, the `seed`,
+            the `schedule` and the `divergence` it produces. See `reproduce`
+        """
+        harness = self
+        # Smaller minds, from the smallest one. They may diverge later, so
+        # they run the whole schedule
+        smallest = self.n_input + self.n_output
+        sizes = sorted({max(smallest, self.n_nodes // 2 ** k) for k in range(1, 8)} - {self.n_nodes})
+        for n_nodes in sizes:
+            parameters = {**self.get_parameters(), "n_nodes": n_nodes}
+            parameters["n_remakes"] = min(self.n_remakes, n_nodes)
+            smaller = ConformanceHarness(**parameters)
+            smaller_divergence = smaller.check(schedule, seed)
+            if smaller_divergence is not None:
+                harness = smaller
+                divergence = smaller_divergence
+                break
+        schedule = get_schedule_until(schedule, divergence["cycle"])
+
+        # Remove the periods that are not needed, except the last one
+        i = 0
+        while i < len(schedule) - 1:
+            shorter = schedule[:i] + schedule[i + 1:]
+            shorter_divergence = harness.check(shorter, seed)
+            if shorter_divergence is not None:
+                schedule = get_schedule_until(shorter, shorter_divergence["cycle"])
+                divergence = shorter_divergence
+            else:
+                i += 1
+
+        return {
+            "parameters": harness.get_parameters(),
+            "seed": seed,
+            "schedule": [list(block) for block in schedule],
+            "divergence": divergence,
+        }
+
+
+def get_schedule_until(schedule: list[tuple[str, int]], cycle: int) -> list[tuple[str, int]]:
+    """
+    Cut a schedule after a cycle
+    Args:
+        schedule: list of (period, number of cycles)
+        cycle: last cycle to keep, counted from 0
+    Returns:
+        The schedule with the cycles until `cycle`, included
+    """
+    result = list()
+    n_left = cycle + 1
+    for period, n_cycles in schedule:
+        if n_left <= 0:
+            break
+        result.append((period, min(n_cycles, n_left)))
+        n_left -= n_cycles
+    return result
+
+
+def reproduce(reproducer: dict[str, Any]) -> dict[str, Any]:
+    """
+    Run a reproducer made by `ConformanceHarness.find_reproducer`
+    Args:
+        reproducer: dictionary with the `parameters`, `seed` and `schedule`
+    Returns:
+        The first difference, or None if there is none
+    """
+    harness = ConformanceHarness(**reproducer["parameters"])
+    schedule = [tuple(block) for block in reproducer["schedule"]]
+    return harness.check(schedule, reproducer["seed"])
+
+
+def run_stress_test(
+    n_trials: int,
+    engines: list[str],
+    backends: list[str],
+    max_nodes: int = 128,
+    max_cycles: int = 500,
+    seed: int = 0,
+) -> list[dict[str, Any]]:
+    """
+    Check the engines with random minds and schedules
+    Args:
+        n_trials: number of random runs
+        engines: engines to check, see `ENGINES`
+        backends: backends of the kernels to check
+        max_nodes: maximum number of nodes of the minds
+        max_cycles: maximum number of cycles of each period
+        seed: seed of the trials
+    Returns:
+        Reproducers of the runs that diverged (see `find_reproducer`),
+        with the `trial` where they were found
+    """
+    rng = random.Random(seed)
+    failures = list()
+    for trial in range(n_trials):
+        n_input = rng.choice((8, 16, 32))
+        n_output = rng.choice((8, 16))
+        n_nodes = rng.randint(n_input + n_output, max(n_input + n_output, max_nodes))
+        parameters = {
+            "engine": rng.choice(engines),
+            "backend": rng.choice(backends),
+            "n_nodes": n_nodes,
+            "n_input": n_input,
+            "n_output": n_output,
+            "n_remakes": rng.randint(0, min(8, n_nodes)),
+            "random_sleep": rng.random() < 0.5,
+        }
+        schedule = list()
+        for _ in range(rng.randint(1, 6)):
+            period = rng.choice(("wake", "wake", "dream", "sleep"))
+            schedule.append((period, 1 if period == "sleep" else rng.randint(1, max_cycles)))
+        trial_seed = rng.randrange(2 ** 32)
+
+        harness = ConformanceHarness(**parameters)
+        divergence = harness.check(schedule, trial_seed)
+        if divergence is not None:
+            reproducer = harness.find_reproducer(schedule, trial_seed, divergence)
+            failures.append({"trial": trial, **reproducer})
+    return failures
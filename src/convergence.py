@@ -0,0 +1,140 @@
+from __future__ import annotations
+import math
+from collections import deque
+from typing import Any, Optional
+
+
+class ConvergenceMonitor:
+    """
+    Watch the periodic (cycle, wins, losses) samples of a run and
+    decide when running more cycles is not worth it.
+
+    The win rate is measured over a rolling window of samples, with
+    a Wilson score interval. The run is considered:
+        - converged: when the interval is narrower than `tolerance`,
+          and the win rate of the window before it is inside the
+          interval, so the win rate is precise and it stopped changing
+        - stalled: when there is no win nor loss in the last
+          `stall_samples` samples
+    """
+
+    def __init__(
+        self,
+        window: int = 10,
+        tolerance: float = 0.05,
+        min_events: int = 100,
+        stall_samples: int = 20,
+        z: float = 1.96,
+    ) -> None:
+        """
+
+        Args:
+            window: number of samples used to compute the win rate
+            tolerance: maximum width of the confidence interval of the
+                win rate to consider the run converged
+            min_events: minimum number of wins plus losses in each of
+                the two windows before checking convergence
+            stall_samples: number of samples without wins or losses
+                to consider the run stalled
+            z: z-score of the confidence interval (1.96 for 95%)
+        """
+        self.window = window
+        self.tolerance = tolerance
+        self.min_events = min_events
+        self.stall_samples = stall_samples
+        self.z = z
+        self.samples = deque(maxlen=max(2 * window, stall_samples) + 1)
+        # Information about why the run should stop. None while it
+        # should keep running
+        self.stop_reason: Optional[dict[str, Any]] = None
+
+    def reset(self) -> None:
+        """Forget the samples, e.g. after jumping to another phase"""
+        self.samples.clear()
+        self.stop_reason = None
+
+    def get_win_rate(self) -> tuple[float, float, float]:
+        """
+        Get the win rate over the rolling window
+        Returns:
+            Win rate, lower bound and upper bound of its confidence
+            interval. (nan, 0, 1) if there are no wins nor losses
+        """
+        wins, losses = self._get_window_counts(self.window)
+        return self.wilson_interval(wins, wins + losses, self.z)
+
+    def update(self, num_run_cycles: int, cnt_win: int, cnt_lose: int) -> bool:
+        """
+        Add a sample of the run
+        Args:
+            num_run_cycles: number of cycles run so far
+            cnt_win: total number of wins so far
+            cnt_lose: total number of losses so far
+        Returns:
+            Whether the run should stop. The reason is saved in
+            `stop_reason`
+        """
+        self.samples.append((num_run_cycles, cnt_win, cnt_lose))
+
+        if len(self.samples) > self.stall_samples:
+            wins, losses = self._get_window_counts(self.stall_samples)
+            if wins + losses == 0:
+                self.stop_reason = {
+                    "reason": "stalled",
+                    "cycle": num_run_cycles,
+                    "samples_without_events": self.stall_samples,
+                }
+                return True
+
+        # The last window, and the one before it
+        if len(self.samples) > 2 * self.window:
+            wins, losses = self._get_window_counts(self.window)
+            previous_wins, previous_losses = self._get_window_counts(self.window, offset=self.window)
+            if min(wins + losses, previous_wins + previous_losses) >= self.min_events:
+                rate, low, high = self.wilson_interval(wins, wins + losses, self.z)
+                previous_rate = previous_wins / (previous_wins + previous_losses)
+                if high - low < self.tolerance and low <= previous_rate <= high:
+                    self.stop_reason = {
+                        "reason": "converged",
+                        "cycle": num_run_cycles,
+                        "win_rate": rate,
+                        "previous_win_rate": previous_rate,
+                        "bounds": (low, high),
+                    }
+                    return True
+        return False
+
+    def _get_window_counts(self, n_samples: int, offset: int = 0) -> tuple[int, int]:
+        """
+        Get the number of wins and losses in the last `n_samples` samples
+        Args:
+            n_samples: number of samples to look back
+            offset: number of samples to skip at the end, e.g. `window`
+                to get the window before the last one
+        Returns:
+            Wins and losses in the window
+        """
+        if len(self.samples) < offset + 2:
+            return 0, 0
+        _, last_win, last_lose = self.samples[-offset - 1]
+        _, first_win, first_lose = self.samples[-offset - min(n_samples, len(self.samples) - offset - 1) - 1]
+        return last_win - first_win, last_lose - first_lose
+
+    @staticmethod
+    def wilson_interval(successes: int, n: int, z: float = 1.96) -> tuple[float, float, float]:
+        """
+        Get the Wilson score interval of a proportion
+        Args:
+            successes: number of successes
+            n: number of trials
+            z: z-score of the confidence interval
+        Returns:
+            Proportion of successes, lower bound and upper bound
+        """
+        if n == 0:
+            return float("nan"), 0.0, 1.0
+        p = successes / n
+        denominator = 1 + z * z / n
+        center = (p + z * z / (2 * n)) / denominator
+        margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+        return p, center - margin, center + margin
@@ -1,18 +1,27 @@
 from __future__ import annotations
 import json
-from typing import Any
+from typing import Any, Iterable
 
 from .node import Node
 
 
 class Edge:
-    """Edge object that represents a connection to a node (neurone)"""
+    """
+    Edge object that represents a connection to a node (neurone).
+
+    The attributes are kept in `__slots__`, without a `__dict__`, and
+    `next_steps` is a tuple, which is the shared empty tuple while no
+    trickle is on its way
+    """
+
+    __slots__ = ("node", "weight", "length", "next_steps")
+
     def __init__(
         self,
         node: Node,
         weight: int = None,
         length: int = None,
-        next_steps: list[int] = None,
+        next_steps: Iterable[int] = None,
     ) -> None:
         """
 
@@ -21,6 +30,7 @@ class Edge:
             weight: how much juice it carries each time it trickles
             length: how many cycles it takes for a trickle of juice to
                 travel down this `Edge` and arrive at destination `Node`
+            next_steps: number of cycles left for each trickle on its way
         """
         self.node = node
         self.weight = weight
@@ -28,14 +38,16 @@ class Edge:
 
         # Variable to store when to increment the `level` of `node`
         # based on `weight` and `length`
-        self.next_steps = next_steps or list()
+        self.next_steps = tuple(next_steps) if next_steps else ()
 
     def run_cycle(self) -> None:
         """Handles the dream/wake cycles"""
+        if not self.next_steps:
+            return
         trickles_arriving = 1 in self.next_steps
         if trickles_arriving:
             self.node.level += self.weight
-        self.next_steps = [el - 1 for el in self.next_steps if el != 1]
+        self.next_steps = tuple(el - 1 for el in self.next_steps if el != 1)
 
     def load(self) -> None:
         """
@@ -43,7 +55,7 @@ class Edge:
         Updates the `next_steps` variable to represent the
         desired behavior
         """
-        self.next_steps.append(self.length)
+        self.next_steps += (self.length,)
 
     def to_keys(self) -> tuple[Any, ...]:
         """
@@ -58,7 +70,7 @@ class Edge:
             ("node", self.node.to_keys()),
             ("weight", self.weight),
             ("length", self.length),
-            ("next_steps", self.next_steps),
+            ("next_steps", list(self.next_steps)),
         )
         return parameters
 
@@ -127,6 +139,6 @@ class Edge:
             "to_node": self.node.name,
             "weight": self.weight,
             "length": self.length,
-            "next_steps": self.next_steps,
+            "next_steps": list(self.next_steps),
         }
         return json.dumps(repr_, indent=2)
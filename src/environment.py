@@ -1,8 +1,26 @@
 from __future__ import annotations
+import math
+import os
 import turtle
 from typing import Any
 
+import numpy as np
+
 from utils import get_environment_inputs
+from .maze import MazeGeometry, get_maze_path, get_unique_walls
+
+# Minimum number of walls to look for contacts in the grid of the
+# geometry, instead of testing every wall
+GRID_MIN_SEGMENTS = 32
+
+# Maximum number of bounces of a body in a cycle. A body that would bounce
+# more times stops at the last contact, with the velocity of the bounce,
+# so the cost of a cycle is bounded even in the corners
+MAX_BOUNCES = 8
+
+# Environments already built in this process, by maze file. See
+# `Environment.get_environment`
+_environments = dict()
 
 
 class Environment:
@@ -11,10 +29,8 @@ class Environment:
         border_coordinates: list[tuple[float, float]],
         winning_segment: tuple[tuple[float, float], tuple[float, float]],
         losing_segment: tuple[tuple[float, float], tuple[float, float]],
-        inner_segments: tuple[tuple[float, float], ...],
-        winning_inner_segment: tuple[tuple[float, float], tuple[float, float]],
-        losing_inner_segment: tuple[tuple[float, float], tuple[float, float]],
         name: str = None,
+        geometry: MazeGeometry = None,
     ):
         """
         Initialize an environment with the coordinates specified
@@ -40,33 +56,47 @@ class Environment:
                 used to define the color of the segment (green)
             losing_segment: tuple with the two pair of points
                 used to define the color of the segment (red)
-            inner_segments: inner borders used to make the Stynker
-                bounces. Assumes that its radius is 10
-            winning_inner_segment: tuple with the two pair of points
-                that define the winning segment
-            losing_inner_segment: tuple with the two pair of points
-                that define the losing segment
             name: name of the environment
+            geometry: compiled geometry of the walls. See `MazeGeometry`
         """
-        # Initialize window
-        width = 960
-        height = 960
-        self.window = turtle.Screen()
-        self.window.setup(width, height)
-        self.window.tracer(0)
-
-        # Information about the environment
-        self.border_coordinates = border_coordinates
+        # Information about the environment. It is shared by every Stynker
+        # that moves in it, so it is kept in immutable containers
+        self.border_coordinates = tuple(border_coordinates)
         self.winning_segment = winning_segment
         self.losing_segment = losing_segment
         self.name = name
-        self.inner_segments = inner_segments
-        self.winning_inner_segment = winning_inner_segment
-        self.losing_inner_segment = losing_inner_segment
-        self.outer_segments = self.get_segments()
+        self.outer_segments = tuple(self.get_segments())
+        # Walls where the bodies bounce: the segments of the border, each
+        # one once, in the same order as in the geometry
+        if geometry is not None:
+            self.walls = tuple(geometry.walls)
+        else:
+            self.walls = tuple(get_unique_walls(border_coordinates))
+        # Coordinates of the segments as flat tuples of floats, with the
+        # general form and the norm of the walls, so the hot loops of the
+        # wake cycle do not need to build any tuple
+        self.wall_values = tuple(
+            (*p1, *p2, *self.get_general_form(p1, p2), self.get_norm(self.get_general_form(p1, p2)[:2]))
+            for p1, p2 in self.walls
+        )
+        self.outer_segment_values = tuple((*p1, *p2) for p1, p2 in self.outer_segments)
+        self.is_winning = tuple(wall in (winning_segment, winning_segment[::-1]) for wall in self.walls)
+        self.is_losing = tuple(wall in (losing_segment, losing_segment[::-1]) for wall in self.walls)
+        # Same tables as arrays, for the kernels (see `kernels.interact`)
+        self.segment_table = np.array(self.wall_values, dtype=np.float64).reshape(-1, 8)
+        self.is_winning_array = np.array(self.is_winning, dtype=bool)
+        self.is_losing_array = np.array(self.is_losing, dtype=bool)
+        for array in (self.segment_table, self.is_winning_array, self.is_losing_array):
+            array.flags.writeable = False
+        self.geometry = geometry
+        self.use_grid = geometry is not None and len(self.walls) >= GRID_MIN_SEGMENTS
 
     def draw_borders(self) -> turtle.Turtle:
-        """Draw the borders of the environment"""
+        """
+        Draw the borders of the environment. The window is not
+        created by the environment itself, so this must be called
+        from the thread that owns the turtle screen (see `Renderer`)
+        """
         border = turtle.Turtle()
         border.speed(0)
         border.penup()
@@ -90,7 +120,7 @@ class Environment:
             border.setposition(*coord)
             border.pendown()
             previous_coord = coord
-        self.window.update()
+        border.getscreen().update()
         return border
 
     def get_segments(self) -> list[tuple[tuple[float, float], tuple[float, float]]]:
@@ -120,9 +150,9 @@ class Environment:
         final_position: tuple[float, float],
     ) -> dict[str, Any]:
         """
-        Given two points (positions of the ball) in the environment,
-        return useful information about its first interaction with
-        the environment border
+        Given two points in the environment, return useful information
+        about the first wall crossed by the segment between them. See
+        `find_first_contact` for the movement of a body
 
         Args:
             initial_position: initial position of the ball
@@ -139,26 +169,206 @@ class Environment:
             "segment": None,
             "segment_parameters": None,
         }
-        min_distance = 1e8
-        for (p1, p2) in self.inner_segments:
-            if self.intersect(p1, p2, initial_position, final_position):
-                # Ignore a segment if the point relies on it
-                if self.distance_to_segment(*initial_position, p1, p2) < 1e-12:
-                    continue
-                intersection = self.get_segment_intersection(p1, p2, initial_position, final_position)
-                d = self.distance_to_point(*initial_position, *intersection)
-                if d < min_distance:
-                    first_intersection = intersection
-                    min_distance = d
-
-                    # Save info
-                    intersection_info["intersection_point"] = first_intersection
-                    intersection_info["distance"] = min_distance
-                    intersection_info["segment"] = (p1, p2)
-                    intersection_info["segment_parameters"] = self.get_general_form(p1, p2)
+        point = [0.0, 0.0]
+        k = self.find_first_intersection(*initial_position, *final_position, point)
+        if k >= 0:
+            p1, p2 = self.walls[k]
+            x0, y0 = initial_position
+            intersection_info["intersection_point"] = tuple(point)
+            intersection_info["distance"] = self.distance_to_point(x0, y0, *point)
+            intersection_info["segment"] = (p1, p2)
+            intersection_info["segment_parameters"] = self.get_general_form(p1, p2)
 
         return intersection_info
 
+    def find_first_intersection(self, x0: float, y0: float, x1: float, y1: float, point: list[float]) -> int:
+        """
+        Find the first wall crossed by a point that moves from (x0, y0)
+        to (x1, y1). Same as `get_first_intersection_info`, with the
+        same floating point operations, but nothing is allocated
+        Args:
+            x0: x coordinate of the initial position
+            y0: y coordinate of the initial position
+            x1: x coordinate of the final position
+            y1: y coordinate of the final position
+            point: list of two elements where the intersection point is written
+        Returns:
+            Index of the wall in `walls`, or -1 if no wall is crossed
+        """
+        if self.use_grid:
+            # Only the segments in the cells crossed by the movement,
+            # in the same order, so ties are broken in the same way
+            candidates = self.geometry.get_candidate_segments((x0, y0), (x1, y1))
+        else:
+            candidates = range(len(self.wall_values))
+        values = self.wall_values
+        intersect_coordinates = self.intersect_coordinates
+        sqrt = math.sqrt
+        # General form of the movement
+        a2 = y0 - y1
+        b2 = x1 - x0
+        c2 = -a2 * x0 - b2 * y0
+
+        first = -1
+        min_distance = 1e8
+        for k in candidates:
+            p1x, p1y, p2x, p2y, a, b, c, norm = values[k]
+            if not intersect_coordinates(p1x, p1y, p2x, p2y, x0, y0, x1, y1):
+                continue
+            # Ignore a segment if the point relies on it (`distance_to_segment`)
+            d_signed = (a * x0 + b * y0 + c) / norm
+            px = x0 - a * d_signed / norm
+            py = y0 - b * d_signed / norm
+            if (p1x <= px <= p2x or p2x <= px <= p1x) and (p1y <= py <= p2y or p2y <= py <= p1y):
+                d_segment = abs(d_signed)
+            else:
+                dx1, dy1, dx2, dy2 = x0 - p1x, y0 - p1y, x0 - p2x, y0 - p2y
+                d_segment = min(sqrt(dx1 * dx1 + dy1 * dy1), sqrt(dx2 * dx2 + dy2 * dy2))
+            if d_segment < 1e-12:
+                continue
+            # Intersection point (`get_segment_intersection`)
+            determinant = a * b2 - a2 * b
+            x = (b * c2 - b2 * c) / determinant
+            y = (c * a2 - c2 * a) / determinant
+            dx, dy = x0 - x, y0 - y
+            d = sqrt(dx * dx + dy * dy)
+            if d < min_distance:
+                min_distance = d
+                first = k
+                point[0] = x
+                point[1] = y
+        return first
+
+    def find_first_contact(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        radius: float,
+        contact: list[float],
+    ) -> int:
+        """
+        Find the first wall touched by a circle whose center moves from
+        (x0, y0) to (x1, y1). The circle is swept along the movement,
+        against every wall and the ends of the wall, so the time of impact
+        is exact for any radius. A wall that the circle already touches
+        only counts if the circle moves towards it, so a body that has
+        just bounced does not bounce again on the same wall. Nothing is
+        allocated
+        Args:
+            x0: x coordinate of the initial position of the center
+            y0: y coordinate of the initial position of the center
+            x1: x coordinate of the final position of the center
+            y1: y coordinate of the final position of the center
+            radius: radius of the circle
+            contact: list of five elements where the time of impact (as a
+                fraction of the movement), the position of the center and
+                the normal of the contact (a unit vector that points to the
+                center) are written
+        Returns:
+            Index of the wall in `walls`, or -1 if no wall is touched
+        """
+        if self.use_grid:
+            candidates = self.geometry.get_candidate_segments((x0, y0), (x1, y1), radius)
+        else:
+            candidates = range(len(self.wall_values))
+        values = self.wall_values
+        get_time_to_point = self.get_time_to_point
+        sqrt = math.sqrt
+        dx = x1 - x0
+        dy = y1 - y0
+        squared_length = dx * dx + dy * dy
+
+        # A contact at the end of the movement is found in the next one
+        first = -1
+        first_t = 1.0
+        for k in candidates:
+            p1x, p1y, p2x, p2y, a, b, c, norm = values[k]
+            # Distance to the line of the wall, and speed towards it,
+            # from the side of the center
+            nx = a / norm
+            ny = b / norm
+            distance = (a * x0 + b * y0 + c) / norm
+            speed = nx * dx + ny * dy
+            if distance < 0:
+                nx, ny, distance, speed = -nx, -ny, -distance, -speed
+            # Neither the wall nor its ends are reached if the center is
+            # always farther than the radius from the line
+            if distance + min(speed, 0.0) > radius:
+                continue
+            if speed < 0:
+                t = max((distance - radius) / -speed, 0.0)
+                if t < first_t:
+                    cx = x0 + t * dx
+                    cy = y0 + t * dy
+                    # The contact is in the wall, not in the line beyond its ends
+                    u = ((cx - p1x) * b - (cy - p1y) * a) / (norm * norm)
+                    if 0.0 <= u <= 1.0:
+                        first, first_t = k, t
+                        contact[0], contact[1], contact[2], contact[3], contact[4] = t, cx, cy, nx, ny
+            # Ends of the wall
+            for ex, ey in ((p1x, p1y), (p2x, p2y)):
+                t = get_time_to_point(x0, y0, dx, dy, squared_length, ex, ey, radius)
+                if t < first_t:
+                    cx = x0 + t * dx
+                    cy = y0 + t * dy
+                    nx = cx - ex
+                    ny = cy - ey
+                    d = sqrt(nx * nx + ny * ny)
+                    if d > 0:
+                        nx, ny = nx / d, ny / d
+                    else:
+                        # The center is in the end: against the movement
+                        d = sqrt(squared_length)
+                        nx, ny = -dx / d, -dy / d
+                    first, first_t = k, t
+                    contact[0], contact[1], contact[2], contact[3], contact[4] = t, cx, cy, nx, ny
+        return first
+
+    @staticmethod
+    def get_time_to_point(
+        x0: float,
+        y0: float,
+        dx: float,
+        dy: float,
+        squared_length: float,
+        px: float,
+        py: float,
+        radius: float,
+    ) -> float:
+        """
+        Get when a circle that moves from (x0, y0) by (dx, dy) touches
+        a point. See `find_first_contact`
+        Args:
+            x0: x coordinate of the initial position of the center
+            y0: y coordinate of the initial position of the center
+            dx: movement along the x-axis
+            dy: movement along the y-axis
+            squared_length: dx ** 2 + dy ** 2
+            px: x coordinate of the point
+            py: y coordinate of the point
+            radius: radius of the circle
+        Returns:
+            Time of impact, as a fraction of the movement, or 2.0 if
+            the circle does not move towards the point
+        """
+        mx = x0 - px
+        my = y0 - py
+        projection = mx * dx + my * dy
+        if projection >= 0:
+            return 2.0
+        c = mx * mx + my * my - radius * radius
+        if c <= 0:
+            # Already touching it
+            return 0.0
+        discriminant = projection * projection - squared_length * c
+        if discriminant < 0:
+            return 2.0
+        # Smallest root of `squared_length * t ** 2 + 2 * projection * t + c`,
+        # in a form that does not cancel
+        return c / (-projection + math.sqrt(discriminant))
+
     @staticmethod
     def calculate_velocity_vector(
         velocity_vector: tuple[float, float],
@@ -357,8 +567,8 @@ class Environment:
             Position of the point reflected over the line
         """
         z = a*a + b*b
-        x = x0 * (b ** 2 - a ** 2) - 2 * a * (b * y0 + c)
-        y = y0 * (a ** 2 - b ** 2) - 2 * b * (a * x0 + c)
+        x = x0 * (b * b - a * a) - 2 * a * (b * y0 + c)
+        y = y0 * (a * a - b * b) - 2 * b * (a * x0 + c)
         return x / z, y / z
 
     @staticmethod
@@ -371,7 +581,8 @@ class Environment:
             Euclidean norm of the (x, y) vector
         """
         x, y = vector
-        return (x * x + y * y) ** 0.5
+        # `math.sqrt` is correctly rounded, as `np.sqrt` in `BatchPhysics`
+        return math.sqrt(x * x + y * y)
 
     @staticmethod
     def are_ccw(
@@ -420,8 +631,35 @@ class Environment:
         Returns:
             True if they intersect, False otherwise
         """
-        cond1 = Environment.are_ccw(p1, q1, q2) != Environment.are_ccw(p2, q1, q2)
-        cond2 = Environment.are_ccw(p1, p2, q1) != Environment.are_ccw(p1, p2, q2)
+        return Environment.intersect_coordinates(*p1, *p2, *q1, *q2)
+
+    @staticmethod
+    def intersect_coordinates(
+        p1x: float,
+        p1y: float,
+        p2x: float,
+        p2y: float,
+        q1x: float,
+        q1y: float,
+        q2x: float,
+        q2y: float,
+    ) -> bool:
+        """
+        Same as `intersect`, with the coordinates of the points,
+        so no tuples are needed
+        Returns:
+            True if the segments intersect, False otherwise
+        """
+        # are_ccw(p1, q1, q2) != are_ccw(p2, q1, q2)
+        cond1 = (
+            ((q2y - p1y) * (q1x - p1x) > (q1y - p1y) * (q2x - p1x))
+            != ((q2y - p2y) * (q1x - p2x) > (q1y - p2y) * (q2x - p2x))
+        )
+        # are_ccw(p1, p2, q1) != are_ccw(p1, p2, q2)
+        cond2 = (
+            ((q1y - p1y) * (p2x - p1x) > (p2y - p1y) * (q1x - p1x))
+            != ((q2y - p1y) * (p2x - p1x) > (p2y - p1y) * (q2x - p1x))
+        )
         return cond1 and cond2
 
     @staticmethod
@@ -513,13 +751,57 @@ class Environment:
         return m
 
     @classmethod
-    def get_environment(cls, env_name: str) -> Environment:
+    def get_environment(cls, env_name: str, winning_segment: Any = None) -> Environment:
         """
-        Get the environment to use
+        Get the environment to use. Each environment is built once per
+        process, and the same instance is given to every Stynker, so all
+        of them agree on the winning segment. The state of each Stynker
+        (position, velocity and radius) is kept in the Stynker
         Args:
-            env_name: name of the environment to get
+            env_name: name of a maze in the `mazes` directory, or path
+                to a maze file
+            winning_segment: winning segment the environment must have,
+                e.g. the one drawn by another process. If the environment
+                has the other one, it is built again with this one
         Returns:
             Instance of the Environment identified by `env_name`
         """
-        parameters = get_environment_inputs(env_name=env_name)
-        return cls(**parameters)
+        maze_path = os.path.abspath(get_maze_path(env_name))
+        environment = _environments.get(maze_path)
+        if environment is None or (winning_segment is not None and environment.winning_segment != winning_segment):
+            environment = _environments[maze_path] = cls.build(maze_path, winning_segment)
+        return environment
+
+    @classmethod
+    def clear_registry(cls) -> None:
+        """Forget the environments built, so they are built again from the maze files"""
+        _environments.clear()
+
+    @classmethod
+    def build(cls, maze_path: str, winning_segment: Any = None) -> Environment:
+        """
+        Build an environment from a maze file. The geometry of the walls
+        is compiled once per maze file
+        Args:
+            maze_path: maze file
+            winning_segment: one of the goal segments of the maze. By
+                default, it is drawn, see `get_environment_inputs`
+        Returns:
+            New instance of the Environment
+        """
+        parameters = get_environment_inputs(maze_path)
+        if winning_segment is not None:
+            winning_segment = tuple(tuple(point) for point in winning_segment)
+            goals = (parameters["winning_segment"], parameters["losing_segment"])
+            if winning_segment not in goals:
+                raise ValueError(f"{winning_segment} is not a goal segment of {parameters['name']}")
+            parameters["winning_segment"], parameters["losing_segment"] = (
+                goals if winning_segment == goals[0] else goals[::-1]
+            )
+        walls = get_unique_walls(parameters["border_coordinates"])
+        for goal in ("winning", "losing"):
+            segment = parameters[f"{goal}_segment"]
+            if segment not in walls and segment[::-1] not in walls:
+                raise ValueError(f"The {goal} segment {segment} is not in the border of {parameters['name']}")
+        geometry = MazeGeometry.from_file(maze_path, parameters["border_coordinates"])
+        return cls(geometry=geometry, **parameters)
@@ -0,0 +1,143 @@
+from __future__ import annotations
+import random
+from typing import Any, Union
+
+from .cache import EvaluationCache
+from .environment import Environment
+from .stynker import Stynker, StynkerMind
+
+
+def get_setup_key(environment: Environment, stynker: Stynker) -> str:
+    """
+    Get the part of the cache key that describes everything but the
+    mind: the environment and the parameters of the Stynker
+    Args:
+        environment: environment of the evaluation
+        stynker: Stynker used to run the evaluation
+    Returns:
+        String that identifies the setup
+    """
+    return (
+        f"{environment.name}:{environment.winning_segment}:"
+        f"{stynker.friction_coefficient}:{stynker.rest_threshold}:{stynker.radius}:"
+        f"{tuple(stynker.initial_position)}:{stynker.n_remakes}:{stynker.random_sleep}"
+    )
+
+
+class Evaluator:
+    """
+    Evaluate minds by running them for a number of wake cycles
+    and counting wins and losses.
+
+    Every evaluation starts from an empty mind (see
+    `StynkerMind.reset_state`) at the initial position, so the result
+    only depends on the structure of the mind, the environment and
+    the seed. Results are saved in an `EvaluationCache`, so a mind
+    that was already evaluated is not simulated again
+    """
+
+    def __init__(
+        self,
+        environment: Union[str, Environment],
+        n_cycles: int,
+        cache: EvaluationCache = None,
+        **stynker_parameters,
+    ) -> None:
+        """
+
+        Args:
+            environment: Instance of Environment or string with its name
+            n_cycles: number of wake cycles of each evaluation
+            cache: cache with the results already computed. If None,
+                every evaluation is simulated
+            **stynker_parameters: additional keyword arguments used to
+                create the Stynker that runs the evaluations
+        """
+        if isinstance(environment, str):
+            environment = Environment.get_environment(environment)
+        self.environment = environment
+        self.n_cycles = n_cycles
+        self.cache = cache
+        self.stynker_parameters = stynker_parameters
+        self.n_evaluations = 0
+        self.n_simulations = 0
+        # Stynkers used to run the evaluations, by number of nodes
+        self._stynkers = dict()
+
+    def get_setup_key(self, stynker: Stynker) -> str:
+        """
+        Get the part of the cache key that describes everything
+        but the mind. See `get_setup_key`
+        Args:
+            stynker: Stynker used to run the evaluation
+        Returns:
+            String that identifies the setup
+        """
+        return get_setup_key(self.environment, stynker)
+
+    def evaluate(self, mind: StynkerMind, seed: int = 0) -> dict[str, Any]:
+        """
+        Get the number of wins and losses of a mind
+        Args:
+            mind: mind to evaluate. It is not modified
+            seed: seed of the random generator used in the evaluation
+        Returns:
+            Dictionary with the number of `wins` and `losses`, and
+            whether the result comes from the cache
+        """
+        self.n_evaluations += 1
+        stynker = self._get_stynker(mind)
+        key = None
+        if self.cache is not None:
+            key = self.cache.get_key(
+                mind.structural_hash(),
+                self.get_setup_key(stynker),
+                seed,
+                self.n_cycles,
+            )
+            cached_result = self.cache.get(key)
+            if cached_result is not None:
+                wins, losses = cached_result
+                return {"wins": wins, "losses": losses, "cached": True}
+
+        wins, losses = self._simulate(stynker, mind, seed)
+        if self.cache is not None:
+            self.cache.put(key, wins, losses)
+        return {"wins": wins, "losses": losses, "cached": False}
+
+    def _simulate(self, stynker: Stynker, mind: StynkerMind, seed: int) -> tuple[int, int]:
+        """
+        Run the wake cycles of an evaluation
+        Args:
+            stynker: Stynker used to run the evaluation
+            mind: mind to evaluate
+            seed: seed of the random generator
+        Returns:
+            Number of wins and losses
+        """
+        self.n_simulations += 1
+        stynker.clone_from(mind)
+        stynker.reset_state()
+        stynker.reset_vector()
+        random.seed(seed)
+        return stynker.run_schedule([("wake", self.n_cycles)])
+
+    def _get_stynker(self, mind: StynkerMind) -> Stynker:
+        """
+        Get the Stynker used to evaluate minds like `mind`
+        Args:
+            mind: mind to evaluate
+        Returns:
+            Stynker with the same number of input and output nodes
+        """
+        key = (mind.n_nodes, mind.n_input, mind.n_output)
+        if key not in self._stynkers:
+            self._stynkers[key] = Stynker(
+                environment=self.environment,
+                color="black",
+                n_nodes=mind.n_nodes,
+                n_input=mind.n_input,
+                n_output=mind.n_output,
+                **self.stynker_parameters,
+            )
+        return self._stynkers[key]
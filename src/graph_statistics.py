@@ -0,0 +1,223 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Any, Hashable
+
+import numpy as np
+
+
+def add_count(counter: Counter, key: Hashable, n: int) -> None:
+    """
+    Add to the count of a key, removing it when it gets to 0
+    Args:
+        counter: counter to update
+        key: key to update
+        n: number to add, can be negative
+    """
+    value = counter[key] + n
+    if value:
+        counter[key] = value
+    else:
+        del counter[key]
+
+
+def add_counts(counter: Counter, values: np.ndarray, sign: int = 1) -> None:
+    """
+    Add the number of times each value appears to a counter
+    Args:
+        counter: counter to update
+        values: array of values
+        sign: 1 to add the values, -1 to remove them
+    """
+    keys, counts = np.unique(values, return_counts=True)
+    for key, n in zip(keys.tolist(), counts.tolist()):
+        add_count(counter, key, sign * n)
+
+
+class GraphStatistics:
+    """
+    Running aggregates of the structure of a mind: number of edges,
+    weights, lengths, in and out degrees, and sizes and `endo` of the
+    nodes.
+
+    They are updated as the nodes and the edges change (see
+    `StynkerMind.add_edge` and `ArrayMind.remake_nodes`), so `snapshot`
+    costs as much as the number of different values, not as the size
+    of the mind. Degrees count the edges of the graph, not the
+    reverse graph
+    """
+
+    def __init__(self) -> None:
+        self.n_edges = 0
+        self.weight_sum = 0
+        self.length_sum = 0
+        # Value -> number of edges or nodes with that value
+        self.weights = Counter()
+        self.lengths = Counter()
+        self.sizes = Counter()
+        self.endos = Counter()
+        # Name of the node -> degree, and degree -> number of nodes
+        self.out_degree = Counter()
+        self.in_degree = Counter()
+        self.out_degrees = Counter()
+        self.in_degrees = Counter()
+
+    def copy(self) -> GraphStatistics:
+        """
+        Returns:
+            Copy of the statistics, to update with a copy of the mind
+        """
+        statistics = GraphStatistics()
+        statistics.n_edges = self.n_edges
+        statistics.weight_sum = self.weight_sum
+        statistics.length_sum = self.length_sum
+        for name in ("weights", "lengths", "sizes", "endos", "out_degree", "in_degree", "out_degrees", "in_degrees"):
+            setattr(statistics, name, Counter(getattr(self, name)))
+        return statistics
+
+    @classmethod
+    def from_graph(cls, graph: dict) -> GraphStatistics:
+        """
+        Args:
+            graph: dictionary from each `Node` to its set of `Edge`
+        Returns:
+            Statistics of the graph
+        """
+        statistics = cls()
+        nodes = list(graph)
+        statistics.add_nodes(
+            np.array([node.name for node in nodes], dtype=np.int64),
+            np.array([node.size for node in nodes], dtype=np.int64),
+            np.array([node.endo for node in nodes], dtype=np.int64),
+        )
+        edges = [(node.name, edge.node.name, edge.weight, edge.length) for node in nodes for edge in graph[node]]
+        statistics.add_edges(*np.array(edges, dtype=np.int64).reshape(-1, 4).T)
+        return statistics
+
+    def add_nodes(self, names: np.ndarray, sizes: np.ndarray, endos: np.ndarray) -> None:
+        """
+        Add nodes without edges
+        Args:
+            names: name of each node
+            sizes: size of each node
+            endos: `endo` of each node
+        """
+        add_counts(self.sizes, sizes)
+        add_counts(self.endos, endos)
+        add_count(self.out_degrees, 0, len(names))
+        add_count(self.in_degrees, 0, len(names))
+
+    def update_node(self, old_size: int, old_endo: int, size: int, endo: int) -> None:
+        """
+        Change the size and the `endo` of a node, e.g. when it is remade
+        Args:
+            old_size: previous size of the node
+            old_endo: previous `endo` of the node
+            size: new size of the node
+            endo: new `endo` of the node
+        """
+        add_count(self.sizes, old_size, -1)
+        add_count(self.sizes, size, 1)
+        add_count(self.endos, old_endo, -1)
+        add_count(self.endos, endo, 1)
+
+    def add_edge(self, source: int, destination: int, weight: int, length: int, sign: int = 1) -> None:
+        """
+        Add an edge that was not in the graph
+        Args:
+            source: name of the source node
+            destination: name of the destination node
+            weight: weight of the edge
+            length: length of the edge
+            sign: 1 to add the edge, -1 to remove it
+        """
+        self.n_edges += sign
+        self.weight_sum += sign * weight
+        self.length_sum += sign * length
+        add_count(self.weights, weight, sign)
+        add_count(self.lengths, length, sign)
+        self._add_degree(self.out_degree, self.out_degrees, source, sign)
+        self._add_degree(self.in_degree, self.in_degrees, destination, sign)
+
+    def remove_edge(self, source: int, destination: int, weight: int, length: int) -> None:
+        """
+        Remove an edge of the graph. See `add_edge`
+        """
+        self.add_edge(source, destination, weight, length, sign=-1)
+
+    def add_edges(
+        self,
+        sources: np.ndarray,
+        destinations: np.ndarray,
+        weights: np.ndarray,
+        lengths: np.ndarray,
+        sign: int = 1,
+    ) -> None:
+        """
+        Add several edges that were not in the graph. See `add_edge`
+        """
+        self.n_edges += sign * len(sources)
+        self.weight_sum += sign * int(weights.sum())
+        self.length_sum += sign * int(lengths.sum())
+        add_counts(self.weights, weights, sign)
+        add_counts(self.lengths, lengths, sign)
+        for degree, degrees, names in (
+            (self.out_degree, self.out_degrees, sources),
+            (self.in_degree, self.in_degrees, destinations),
+        ):
+            keys, counts = np.unique(names, return_counts=True)
+            for name, n in zip(keys.tolist(), counts.tolist()):
+                self._add_degree(degree, degrees, name, sign * n)
+
+    def remove_edges(
+        self,
+        sources: np.ndarray,
+        destinations: np.ndarray,
+        weights: np.ndarray,
+        lengths: np.ndarray,
+    ) -> None:
+        """
+        Remove several edges of the graph. See `add_edge`
+        """
+        self.add_edges(sources, destinations, weights, lengths, sign=-1)
+
+    @staticmethod
+    def _add_degree(degree: Counter, degrees: Counter, name: int, n: int) -> None:
+        """
+        Change the degree of a node
+        Args:
+            degree: degree of each node
+            degrees: number of nodes with each degree
+            name: name of the node
+            n: number of edges to add, can be negative
+        """
+        old_degree = degree[name]
+        add_count(degree, name, n)
+        add_count(degrees, old_degree, -1)
+        add_count(degrees, old_degree + n, 1)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Returns:
+            Dictionary with the number of nodes and edges, the mean weight,
+            length and degree, the number of excitatory (positive weight)
+            and inhibitory (negative weight) edges, and the histograms of
+            the weights, lengths, degrees, sizes and `endo`, as dictionaries
+            from each value to the number of edges or nodes
+        """
+        n_nodes = sum(self.sizes.values())
+        n_edges = self.n_edges
+        return {
+            "n_nodes": n_nodes,
+            "n_edges": n_edges,
+            "mean_weight": self.weight_sum / n_edges if n_edges else 0.0,
+            "mean_length": self.length_sum / n_edges if n_edges else 0.0,
+            "mean_degree": n_edges / n_nodes if n_nodes else 0.0,
+            "n_excitatory": sum(n for weight, n in self.weights.items() if weight > 0),
+            "n_inhibitory": sum(n for weight, n in self.weights.items() if weight < 0),
+            "weights": dict(sorted(self.weights.items())),
+            "lengths": dict(sorted(self.lengths.items())),
+            "out_degrees": dict(sorted(self.out_degrees.items())),
+            "in_degrees": dict(sorted(self.in_degrees.items())),
+            "sizes": dict(sorted(self.sizes.items())),
+            "endos": dict(sorted(self.endos.items())),
+        }
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from typing import Any
+
+import numpy as np
+
+from .environment import MAX_BOUNCES
+
+
+class InteractionInfo:
+    """
+    Result of the interaction of a Stynker with the environment in a
+    wake cycle. See `Stynker.get_interaction_information`.
+
+    Each Stynker has a single instance that is overwritten in every
+    cycle, and the route is kept in lists of fixed capacity that only
+    grow when the Stynker bounces more times than ever before, so a
+    cycle allocates no containers. Keys can be read as in a dictionary,
+    e.g. `info["won"]`, but the values must be copied to keep them
+    after the next cycle
+    """
+
+    keys_ = (
+        "previous_position",
+        "new_position",
+        "initial_velocity_vector",
+        "final_velocity_vector",
+        "touch_border",
+        "won",
+        "lost",
+        "route",
+        "touch_stynker",
+    )
+
+    __slots__ = (
+        "previous_position",
+        "new_x",
+        "new_y",
+        "initial_velocity_vector",
+        "final_velocity_vector",
+        "touch_border",
+        "won",
+        "lost",
+        "touch_stynker",
+        "route_x",
+        "route_y",
+        "route_length",
+        "contact",
+        "route_buffer",
+    )
+
+    def __init__(self, route_capacity: int = 8) -> None:
+        """
+
+        Args:
+            route_capacity: initial number of points of the route
+        """
+        self.previous_position = (0, 0)
+        self.new_x = 0.0
+        self.new_y = 0.0
+        self.initial_velocity_vector = (0, 0)
+        self.final_velocity_vector = (0, 0)
+        self.touch_border = False
+        self.won = False
+        self.lost = False
+        self.touch_stynker = False
+        self.route_x = [0.0] * route_capacity
+        self.route_y = [0.0] * route_capacity
+        self.route_length = 0
+        # Output of `Environment.find_first_contact`
+        self.contact = [0.0] * 5
+        # Output of `kernels.interact`, with room for the longest route
+        self.route_buffer = np.zeros((MAX_BOUNCES + 2, 2))
+
+    @property
+    def new_position(self) -> tuple[float, float]:
+        return self.new_x, self.new_y
+
+    @property
+    def route(self) -> list[tuple[float, float]]:
+        """Points where the Stynker has been, as a new list"""
+        n = self.route_length
+        return list(zip(self.route_x[:n], self.route_y[:n]))
+
+    def add_to_route(self, x: float, y: float) -> None:
+        """
+        Add a point at the end of the route
+        Args:
+            x: x coordinate of the point
+            y: y coordinate of the point
+        """
+        n = self.route_length
+        if n == len(self.route_x):
+            self.route_x.extend([0.0] * n)
+            self.route_y.extend([0.0] * n)
+        self.route_x[n] = x
+        self.route_y[n] = y
+        self.route_length = n + 1
+
+    def load_batch(self, step: dict[str, list], i: int) -> None:
+        """
+        Overwrite the information with the one of a body moved by
+        `BatchPhysics.step`
+        Args:
+            step: result of `BatchPhysics.step`, with the arrays
+                converted to lists (see `BatchPhysics.to_lists`)
+            i: index of the body
+        """
+        self.previous_position = previous_position = tuple(step["previous_position"][i])
+        self.initial_velocity_vector = tuple(step["initial_velocity_vector"][i])
+        self.final_velocity_vector = tuple(step["final_velocity_vector"][i])
+        self.new_x, self.new_y = step["new_position"][i]
+        self.touch_border = step["touch_border"][i]
+        self.won = step["won"][i]
+        self.lost = step["lost"][i]
+        self.touch_stynker = False
+        self.route_length = 0
+        route = step["route"][i]
+        if route is None:
+            self.add_to_route(*previous_position)
+            self.add_to_route(self.new_x, self.new_y)
+            return
+        for j in range(step["route_length"][i]):
+            self.add_to_route(*route[j])
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.keys_:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.keys_:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def keys(self) -> tuple[str, ...]:
+        return self.keys_
+
+    def to_dict(self) -> dict[str, Any]:
+        return {key: self[key] for key in self.keys_}
@@ -0,0 +1,553 @@
+from __future__ import annotations
+import asyncio
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import time
+import traceback
+from typing import Any, Iterator
+
+from . import kernels
+from .array_mind import ArrayMind
+from .cache import EvaluationCache
+from .environment import Environment
+from .evaluation import get_setup_key
+from .memory import MemoryBudget
+from .stynker import Stynker
+
+# Keys of a run spec, besides the parameters of the Stynker
+SPEC_KEYS = ("parameters", "schedule", "seed", "engine", "backend", "progress_every")
+
+# Engines that the workers can attach to the Stynkers
+ENGINES = ("object", "array")
+
+# Parameters of the Stynker that a run spec can change
+PARAMETER_KEYS = tuple(
+    name for name in inspect.signature(Stynker).parameters if name not in ("color", "graph")
+)
+
+# State of each worker process. See `run_worker`
+_worker = dict()
+
+
+def run_job(job_id: int, spec: dict[str, Any], winning_segment: Any, events: Any) -> dict[str, Any]:
+    """
+    Run a Stynker through a schedule, as `tournament.evaluate_slot`,
+    sending its progress to the server
+    Args:
+        job_id: id of the job
+        spec: run spec, see `JobServer`
+        winning_segment: winning segment of the environment of the run,
+            drawn by the server
+        events: queue where the progress is sent
+    Returns:
+        Number of wins, losses and cycles run, duration of the run in
+        seconds, and whether the result comes from the cache
+    """
+    start = time.perf_counter()
+    parameters = {**_worker["stynker_parameters"], **spec.get("parameters", dict())}
+    if "initial_position" in parameters:
+        # Lists when they come from JSON
+        parameters["initial_position"] = tuple(parameters["initial_position"])
+    schedule = spec.get("schedule", _worker["schedule"])
+    progress_every = spec.get("progress_every", _worker["progress_every"])
+    kernels.set_backend(spec.get("backend"))
+
+    # The mind depends on the seed. The environment of every Stynker is
+    # loaded once per process (see `Environment.get_environment`), with
+    # the winning segment of the server, so the results do not depend
+    # on the worker
+    parameters["environment"] = Environment.get_environment(parameters["environment"], winning_segment)
+    seed = spec.get("seed", 0)
+    random.seed(seed)
+    stynker = Stynker(color="black", **parameters)
+    total = sum(n for _, n in schedule)
+
+    # The run only depends on the mind made from the seed, the setup and
+    # the schedule. Engines and backends give the same results
+    cache = _worker["cache"]
+    key = None
+    if cache is not None:
+        key = cache.get_key(stynker.structural_hash(), get_setup_key(stynker.environment, stynker), seed, schedule)
+        cached_result = cache.get(key)
+        if cached_result is not None:
+            wins, losses = cached_result
+            return {
+                "wins": wins,
+                "losses": losses,
+                "n_cycles": total,
+                "elapsed": time.perf_counter() - start,
+                "cached": True,
+            }
+
+    engine = spec.get("engine", "object")
+    if engine == "array":
+        stynker.attach_engine(ArrayMind.from_mind(stynker))
+
+    def send_progress(n_cycles: int, wins: int, losses: int) -> None:
+        if n_cycles % progress_every == 0 and n_cycles < total:
+            events.put({
+                "job": job_id,
+                "event": "progress",
+                "n_cycles": n_cycles,
+                "total": total,
+                "wins": wins,
+                "losses": losses,
+            })
+
+    wins, losses = stynker.run_schedule(schedule, on_cycle=send_progress if progress_every else None)
+    stynker.detach_engine()
+    if cache is not None:
+        cache.put(key, wins, losses)
+    return {
+        "wins": wins,
+        "losses": losses,
+        "n_cycles": total,
+        "elapsed": time.perf_counter() - start,
+        "cached": False,
+    }
+
+
+def run_worker(
+    k: int,
+    jobs: Any,
+    events: Any,
+    stynker_parameters: dict[str, Any],
+    schedule: list[tuple[str, int]],
+    progress_every: int,
+    cache_path: str = None,
+) -> None:
+    """
+    Loop of a worker process of a `JobServer`: run jobs until
+    it receives None
+    Args:
+        k: index of the worker
+        jobs: queue with (job id, run spec)
+        events: queue where the events of the jobs are sent
+        stynker_parameters: default parameters of the Stynkers
+        schedule: default schedule of the runs
+        progress_every: default number of cycles between progress events
+        cache_path: SQLite file of the `EvaluationCache` shared by the
+            workers. If None, every run is simulated
+    """
+    _worker["cache"] = EvaluationCache(cache_path) if cache_path is not None else None
+    _worker["stynker_parameters"] = stynker_parameters
+    _worker["schedule"] = schedule
+    _worker["progress_every"] = progress_every
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, spec, winning_segment = job
+        events.put({"job": job_id, "event": "started", "worker": k})
+        try:
+            result = run_job(job_id, spec, winning_segment, events)
+        except Exception:
+            events.put({"job": job_id, "event": "error", "message": traceback.format_exc()})
+        else:
+            events.put({"job": job_id, "event": "result", **result})
+    if _worker["cache"] is not None:
+        _worker["cache"].close()
+
+
+class JobServer:
+    """
+    Local service that runs Stynkers in a pool of worker processes.
+
+    Clients connect to a Unix socket, or to a TCP port of localhost, and
+    send requests as lines of JSON. The workers are started once, so
+    the imports, the environments and the compiled kernels are loaded
+    once for all the runs. Requests:
+        - {"command": "submit", "specs": [spec, ...], "follow": true}:
+          queue runs. The server answers with the ids of the jobs and,
+          if `follow`, streams their events until all of them finish
+        - {"command": "get", "jobs": [id, ...]}: state and result of jobs
+        - {"command": "status"}: number of jobs in each state
+        - {"command": "shutdown"}: stop the server when the queued jobs finish
+
+    A run spec is a dictionary with the following keys, all optional:
+        - parameters: parameters of the Stynker that change from the
+          defaults, as in `parameters.stynker_parameters`
+        - schedule: list of (period, number of cycles)
+        - seed: seed of the random generator. The mind is made from it
+        - engine: "object" or "array"
+        - backend: backend of the kernels, see `kernels.set_backend`
+        - progress_every: number of cycles between progress events
+
+    Events are dictionaries with the `job` id and the `event`: "queued",
+    "started", "progress", "result" or "error"
+
+    With a memory budget, each job can use its share of the budget, as
+    `n_workers` jobs run at the same time. Runs over it are refused, or
+    run with fewer nodes (see `MemoryBudget`) before they are queued.
+
+    With a cache, the results are saved by the structural hash of the
+    mind made from the seed, the setup and the schedule, so a run that
+    was already done is answered without simulating it
+    """
+
+    def __init__(
+        self,
+        stynker_parameters: dict[str, Any],
+        schedule: list[tuple[str, int]],
+        n_workers: int = None,
+        socket_path: str = None,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        progress_every: int = 100,
+        memory_budget: float = None,
+        over_budget: str = "refuse",
+        start_method: str = None,
+        cache_path: str = None,
+    ) -> None:
+        """
+
+        Args:
+            stynker_parameters: default parameters of the Stynkers
+            schedule: default schedule of the runs
+            n_workers: number of worker processes. By default, one per CPU
+            socket_path: Unix socket where the server listens. If None,
+                it listens on `host` and `port`
+            host: address where the server listens
+            port: port where the server listens
+            progress_every: default number of cycles between progress events
+            memory_budget: memory of all the jobs that run at the same time,
+                in MiB. If None, the memory of the jobs is not checked
+            over_budget: "refuse" or "downsize", see `MemoryBudget`
+            start_method: start method of the processes, see `multiprocessing`
+            cache_path: SQLite file of the results of the runs, see
+                `EvaluationCache`. If None, every run is simulated
+        """
+        self.stynker_parameters = stynker_parameters
+        self.schedule = schedule
+        self.n_workers = n_workers or os.cpu_count()
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.progress_every = progress_every
+        self.cache_path = cache_path
+        self.budget = None
+        if memory_budget is not None:
+            self.budget = MemoryBudget(int(memory_budget * 2 ** 20) // self.n_workers, over_budget)
+        self.context = multiprocessing.get_context(start_method)
+        # Information about every job, by id
+        self.jobs = dict()
+        # Queues of the clients that follow each job, by id
+        self._followers = dict()
+        self._jobs_queue = None
+        self._events_queue = None
+        self._workers = list()
+        self._stopping = None
+
+    def start_workers(self) -> None:
+        """Start the worker processes"""
+        self._jobs_queue = self.context.Queue()
+        self._events_queue = self.context.Queue()
+        self._workers = [
+            self.context.Process(
+                target=run_worker,
+                args=(
+                    k,
+                    self._jobs_queue,
+                    self._events_queue,
+                    self.stynker_parameters,
+                    self.schedule,
+                    self.progress_every,
+                    self.cache_path,
+                ),
+                daemon=True,
+            )
+            for k in range(self.n_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def stop_workers(self) -> None:
+        """Stop the workers after the jobs already queued"""
+        for _ in self._workers:
+            self._jobs_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = list()
+
+    async def serve(self) -> None:
+        """Run the server until it receives a shutdown request"""
+        self.start_workers()
+        self._stopping = asyncio.Event()
+        if self.socket_path is not None:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+            address = self.socket_path
+        else:
+            server = await asyncio.start_server(self.handle_client, host=self.host, port=self.port)
+            address = f"{self.host}:{self.port}"
+        logging.info(f"Job server listening on {address} with {self.n_workers} workers")
+        pump = asyncio.create_task(self._pump_events())
+
+        async with server:
+            await self._stopping.wait()
+            # Let the queued jobs finish, and stop reading events
+            await asyncio.get_running_loop().run_in_executor(None, self.stop_workers)
+            self._events_queue.put(None)
+            await pump
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        logging.info("Job server stopped")
+
+    @staticmethod
+    def check_spec(spec: dict[str, Any]) -> None:
+        """
+        Raise a ValueError if a run spec has unknown keys, parameters,
+        engine, backend or periods
+        Args:
+            spec: run spec, see the class docstring
+        """
+        if not isinstance(spec, dict):
+            raise ValueError("A run spec must be a dictionary")
+        unknown_keys = set(spec) - set(SPEC_KEYS)
+        if unknown_keys:
+            raise ValueError(f"Unknown keys in the run spec: {', '.join(sorted(unknown_keys))}")
+        unknown_parameters = set(spec.get("parameters", dict())) - set(PARAMETER_KEYS)
+        if unknown_parameters:
+            raise ValueError(f"Unknown parameters in the run spec: {', '.join(sorted(unknown_parameters))}")
+        if spec.get("engine", "object") not in ENGINES:
+            raise ValueError(f"Engine must be one of the following: {', '.join(ENGINES)}")
+        backend = spec.get("backend")
+        if backend is not None and backend not in kernels.BACKENDS:
+            raise ValueError(f"Backend must be one of the following: {', '.join(kernels.BACKENDS)}")
+        if backend == "numba" and kernels.numba is None:
+            raise ValueError("The numba backend requires Numba to be installed")
+        for period, n_cycles in spec.get("schedule", ()):
+            if period not in ("dream", "sleep", "wake") or not isinstance(n_cycles, int) or n_cycles < 0:
+                raise ValueError(f"Wrong period in the schedule of the run spec: {period}, {n_cycles}")
+
+    def fit_spec(self, spec: dict[str, Any]) -> dict[str, Any]:
+        """
+        Check a run spec against the memory budget
+        Args:
+            spec: run spec, see the class docstring
+        Returns:
+            Run spec, with fewer nodes if it was downsized
+        Raises:
+            MemoryError: if the run is refused
+        """
+        if self.budget is None:
+            return spec
+        parameters = {**self.stynker_parameters, **spec.get("parameters", dict())}
+        n_nodes = self.budget.fit(
+            parameters["n_nodes"],
+            parameters["n_input"],
+            parameters["n_output"],
+            engine=spec.get("engine", "object"),
+        )
+        if n_nodes == parameters["n_nodes"]:
+            return spec
+        return {**spec, "parameters": {**spec.get("parameters", dict()), "n_nodes": n_nodes}}
+
+    def prepare_spec(self, spec: dict[str, Any]) -> tuple[dict[str, Any], Any]:
+        """
+        Check a run spec, fit it to the memory budget and build its
+        environment, so the run can be queued
+        Args:
+            spec: run spec, see the class docstring
+        Returns:
+            Run spec, with fewer nodes if it was downsized, and the winning
+            segment of its environment
+        Raises:
+            ValueError: if the spec is wrong, or the server is shutting down
+            MemoryError: if the run is refused by the memory budget
+            NotImplementedError: if the environment is not supported
+        """
+        self.check_spec(spec)
+        if self._stopping is not None and self._stopping.is_set():
+            raise ValueError("The server is shutting down")
+        spec = self.fit_spec(spec)
+        # The environment is built here, once, so every worker uses its winning segment
+        parameters = {**self.stynker_parameters, **spec.get("parameters", dict())}
+        environment = Environment.get_environment(parameters["environment"])
+        return spec, environment.winning_segment
+
+    def submit(self, spec: dict[str, Any]) -> int:
+        """
+        Queue a run
+        Args:
+            spec: run spec, see the class docstring
+        Returns:
+            Id of the job
+        """
+        return self._enqueue(*self.prepare_spec(spec))
+
+    def _enqueue(self, spec: dict[str, Any], winning_segment: Any) -> int:
+        """
+        Queue a run prepared with `prepare_spec`
+        Args:
+            spec: run spec
+            winning_segment: winning segment of its environment
+        Returns:
+            Id of the job
+        """
+        job_id = len(self.jobs)
+        self.jobs[job_id] = {"job": job_id, "spec": spec, "state": "queued", "result": None}
+        self._jobs_queue.put((job_id, spec, winning_segment))
+        return job_id
+
+    def get_status(self) -> dict[str, Any]:
+        """
+        Returns:
+            Number of workers, and number of jobs in each state
+        """
+        status = {"n_workers": self.n_workers, "queued": 0, "started": 0, "result": 0, "error": 0}
+        for job in self.jobs.values():
+            status[job["state"]] += 1
+        return status
+
+    async def _pump_events(self) -> None:
+        """Read the events of the workers, and send them to the clients that follow the jobs"""
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, self._events_queue.get)
+            if event is None:
+                break
+            job = self.jobs[event["job"]]
+            job["state"] = event["event"] if event["event"] != "progress" else job["state"]
+            if event["event"] in ("result", "error"):
+                job["result"] = event
+            for queue in self._followers.get(event["job"], ()):
+                queue.put_nowait(event)
+            if event["event"] in ("result", "error"):
+                self._followers.pop(event["job"], None)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer the requests of a client, one per line
+        Args:
+            reader: stream of the requests
+            writer: stream of the answers
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    await self._handle_request(request, writer)
+                except (ValueError, KeyError, TypeError, MemoryError, NotImplementedError) as error:
+                    await self._send(writer, {"event": "error", "message": str(error)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request: dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        """
+        Answer a request. See the class docstring
+        Args:
+            request: decoded request
+            writer: stream of the answers
+        """
+        command = request["command"]
+        if command == "submit":
+            # Nothing is queued if any of the runs is refused
+            prepared = [self.prepare_spec(spec) for spec in request["specs"]]
+            follow = request.get("follow", True)
+            queue = asyncio.Queue()
+            job_ids = list()
+            for spec, winning_segment in prepared:
+                job_id = self._enqueue(spec, winning_segment)
+                job_ids.append(job_id)
+                if follow:
+                    self._followers.setdefault(job_id, list()).append(queue)
+            await self._send(writer, {"event": "queued", "jobs": job_ids})
+            n_running = len(job_ids) if follow else 0
+            while n_running:
+                event = await queue.get()
+                await self._send(writer, event)
+                if event["event"] in ("result", "error"):
+                    n_running -= 1
+        elif command == "get":
+            await self._send(writer, {"event": "jobs", "jobs": [self.jobs[job_id] for job_id in request["jobs"]]})
+        elif command == "status":
+            await self._send(writer, {"event": "status", **self.get_status()})
+        elif command == "shutdown":
+            await self._send(writer, {"event": "shutdown"})
+            self._stopping.set()
+        else:
+            raise ValueError(f"Unknown command: {command}")
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, message: dict[str, Any]) -> None:
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+
+
+class JobClient:
+    """Client of a `JobServer`"""
+
+    def __init__(self, socket_path: str = None, host: str = "127.0.0.1", port: int = 8765) -> None:
+        """
+
+        Args:
+            socket_path: Unix socket of the server. If None, `host` and `port` are used
+            host: address of the server
+            port: port of the server
+        """
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+
+    def request(self, request: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """
+        Send a request, and read the answers as they arrive
+        Args:
+            request: see `JobServer`
+        Returns:
+            Iterator over the answers, until the server stops sending them
+        """
+        if self.socket_path is not None:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(self.socket_path)
+        else:
+            connection = socket.create_connection((self.host, self.port))
+        with connection, connection.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode() + b"\n")
+            stream.flush()
+            connection.shutdown(socket.SHUT_WR)
+            for line in stream:
+                yield json.loads(line)
+
+    def submit(self, specs: list[dict[str, Any]], follow: bool = True) -> Iterator[dict[str, Any]]:
+        """
+        Queue runs
+        Args:
+            specs: run specs, see `JobServer`
+            follow: whether to receive the events of the runs until they finish
+        Returns:
+            Iterator over the events
+        """
+        return self.request({"command": "submit", "specs": specs, "follow": follow})
+
+    def get(self, job_ids: list[int]) -> list[dict[str, Any]]:
+        """
+        Args:
+            job_ids: ids of the jobs
+        Returns:
+            State and result of each job
+        """
+        return next(self.request({"command": "get", "jobs": job_ids}))["jobs"]
+
+    def status(self) -> dict[str, Any]:
+        """
+        Returns:
+            Number of workers, and number of jobs in each state
+        """
+        return next(self.request({"command": "status"}))
+
+    def shutdown(self) -> None:
+        """Stop the server when the queued jobs finish"""
+        next(self.request({"command": "shutdown"}))
@@ -0,0 +1,349 @@
+"""
+Kernels of the hot loops, written over plain arrays and scalars so they
+can be compiled with Numba. Numba is optional: when it is installed the
+kernels are compiled on first use (and cached on disk), otherwise the
+NumPy implementations of `ArrayMind` and the scalar loops of `Stynker`
+are used. Every backend gives the same results.
+
+Backends:
+    - numba: the compiled kernels. The default when Numba is installed
+    - numpy: the vectorized methods of `ArrayMind`, and the loops of
+      `Stynker`. The default otherwise
+    - python: the kernels run by the interpreter, without compiling
+      them. Slow; useful to check the kernels where Numba is missing
+"""
+from __future__ import annotations
+import math
+from typing import Callable
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKENDS = ("numba", "numpy", "python")
+_backend = "numba" if numba is not None else "numpy"
+
+# Flags returned by `interact`
+TOUCH_BORDER, WON, LOST = 1, 2, 4
+
+
+def jit(function: Callable) -> Callable:
+    """
+    Compile a function with Numba, if it is installed. The original
+    function is kept in the `py_func` attribute, as Numba does
+    """
+    if numba is None:
+        function.py_func = function
+        return function
+    return numba.njit(cache=True)(function)
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def set_backend(backend: str = None) -> None:
+    """
+    Choose the backend of the kernels
+    Args:
+        backend: one of `BACKENDS`. If None, the default one
+    """
+    global _backend
+    if backend is None:
+        backend = "numba" if numba is not None else "numpy"
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend must be one of the following: {', '.join(BACKENDS)}")
+    if backend == "numba" and numba is None:
+        raise ImportError("The numba backend requires Numba to be installed")
+    _backend = backend
+
+
+def get_kernel(kernel: Callable) -> Callable:
+    """
+    Args:
+        kernel: function decorated with `jit`
+    Returns:
+        The version of the kernel for the current backend
+    """
+    if _backend == "python":
+        return kernel.py_func
+    return kernel
+
+
+@jit
+def run_nodes(
+    n_edges_used: int,
+    source: np.ndarray,
+    destination: np.ndarray,
+    weight: np.ndarray,
+    length: np.ndarray,
+    pending: np.ndarray,
+    alive: np.ndarray,
+    rank: np.ndarray,
+    size: np.ndarray,
+    endo: np.ndarray,
+    node_type: np.ndarray,
+    level: np.ndarray,
+    damage: np.ndarray,
+    is_active: np.ndarray,
+    spilled: np.ndarray,
+    before: np.ndarray,
+    after: np.ndarray,
+    input_code: int,
+) -> None:
+    """
+    Load the nodes, and spill the ones that are full, in place.
+    Same as `ArrayMind.run_nodes` (see `deliver_trickles`,
+    `update_levels` and `spill`), in a single pass over the edges
+    and the nodes
+    Args:
+        n_edges_used: number of edge slots used
+        source, destination, weight, length, pending, alive: edge arrays
+        rank, size, endo, node_type, level, damage, is_active, spilled:
+            node arrays
+        before: buffer with one element per node
+        after: buffer with one element per node
+        input_code: code of the input nodes
+    """
+    n_nodes = len(level)
+    for n in range(n_nodes):
+        before[n] = 0
+        after[n] = 0
+
+    # Deliver the trickles
+    for e in range(n_edges_used):
+        p = pending[e]
+        if p & 1:
+            s = source[e]
+            d = destination[e]
+            if rank[s] < rank[d]:
+                before[d] += weight[e]
+            else:
+                after[d] += weight[e]
+        pending[e] = p >> 1
+
+    # Update the levels, and spill the full nodes
+    for n in range(n_nodes):
+        value = max(level[n] + before[n] + endo[n], 0)
+        if is_active[n] and node_type[n] == input_code:
+            value = max(value + size[n], 0)
+            is_active[n] = False
+        value += after[n]
+        if value >= size[n]:
+            level[n] = 0
+            damage[n] += 1
+            spilled[n] = True
+        else:
+            level[n] = value
+            spilled[n] = False
+
+    # Load the outcoming edges of the nodes that spilled
+    for e in range(n_edges_used):
+        if alive[e] and spilled[source[e]]:
+            pending[e] |= 1 << (length[e] - 1)
+
+
+@jit
+def get_time_to_point(
+    x0: float,
+    y0: float,
+    dx: float,
+    dy: float,
+    squared_length: float,
+    px: float,
+    py: float,
+    radius: float,
+) -> float:
+    """Same as `Environment.get_time_to_point`"""
+    mx = x0 - px
+    my = y0 - py
+    projection = mx * dx + my * dy
+    if projection >= 0:
+        return 2.0
+    c = mx * mx + my * my - radius * radius
+    if c <= 0:
+        return 0.0
+    discriminant = projection * projection - squared_length * c
+    if discriminant < 0:
+        return 2.0
+    return c / (-projection + math.sqrt(discriminant))
+
+
+@jit
+def find_first_contact(
+    segments: np.ndarray,
+    x0: float,
+    y0: float,
+    x1: float,
+    y1: float,
+    radius: float,
+) -> tuple[int, float, float, float, float, float]:
+    """
+    Same as `Environment.find_first_contact`
+    Args:
+        segments: array of shape (number of walls, 8) with the
+            coordinates, the general form and the norm of each wall
+            (see `Environment.segment_table`)
+        x0: x coordinate of the initial position of the center
+        y0: y coordinate of the initial position of the center
+        x1: x coordinate of the final position of the center
+        y1: y coordinate of the final position of the center
+        radius: radius of the circle
+    Returns:
+        Index of the wall touched (-1 if None), time of impact, position
+        of the center and normal of the contact
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    squared_length = dx * dx + dy * dy
+
+    first = -1
+    first_t = 1.0
+    contact_x = 0.0
+    contact_y = 0.0
+    contact_nx = 0.0
+    contact_ny = 0.0
+    for k in range(segments.shape[0]):
+        p1x = segments[k, 0]
+        p1y = segments[k, 1]
+        p2x = segments[k, 2]
+        p2y = segments[k, 3]
+        a = segments[k, 4]
+        b = segments[k, 5]
+        c = segments[k, 6]
+        norm = segments[k, 7]
+        nx = a / norm
+        ny = b / norm
+        distance = (a * x0 + b * y0 + c) / norm
+        speed = nx * dx + ny * dy
+        if distance < 0:
+            nx, ny, distance, speed = -nx, -ny, -distance, -speed
+        if distance + min(speed, 0.0) > radius:
+            continue
+        if speed < 0:
+            t = max((distance - radius) / -speed, 0.0)
+            if t < first_t:
+                cx = x0 + t * dx
+                cy = y0 + t * dy
+                u = ((cx - p1x) * b - (cy - p1y) * a) / (norm * norm)
+                if 0.0 <= u <= 1.0:
+                    first = k
+                    first_t = t
+                    contact_x = cx
+                    contact_y = cy
+                    contact_nx = nx
+                    contact_ny = ny
+        for end in range(2):
+            ex = p1x if end == 0 else p2x
+            ey = p1y if end == 0 else p2y
+            t = get_time_to_point(x0, y0, dx, dy, squared_length, ex, ey, radius)
+            if t < first_t:
+                cx = x0 + t * dx
+                cy = y0 + t * dy
+                nx = cx - ex
+                ny = cy - ey
+                d = math.sqrt(nx * nx + ny * ny)
+                if d > 0:
+                    nx, ny = nx / d, ny / d
+                else:
+                    d = math.sqrt(squared_length)
+                    nx, ny = -dx / d, -dy / d
+                first = k
+                first_t = t
+                contact_x = cx
+                contact_y = cy
+                contact_nx = nx
+                contact_ny = ny
+    return first, first_t, contact_x, contact_y, contact_nx, contact_ny
+
+
+@jit
+def interact(
+    x0: float,
+    y0: float,
+    vx: float,
+    vy: float,
+    radius: float,
+    segments: np.ndarray,
+    is_winning: np.ndarray,
+    is_losing: np.ndarray,
+    route: np.ndarray,
+    max_bounces: int,
+) -> tuple[int, int, float, float, float, float]:
+    """
+    Move a body one cycle, bouncing on the walls.
+    Same as `Stynker.get_interaction_information`
+    Args:
+        x0: x coordinate of the position
+        y0: y coordinate of the position
+        vx: x component of the velocity
+        vy: y component of the velocity
+        radius: radius of the body
+        segments: see `find_first_contact`
+        is_winning: whether each wall is the winning one
+        is_losing: whether each wall is the losing one
+        route: buffer of shape (capacity, 2) where the points of
+            the route are written
+        max_bounces: maximum number of bounces
+    Returns:
+        Number of points of the route (-1 if the buffer is too small),
+        flags (`TOUCH_BORDER`, `WON`, `LOST`), new position and final velocity
+    """
+    capacity = route.shape[0]
+    flags = 0
+    last_x = x0
+    last_y = y0
+    new_x = x0 + vx
+    new_y = y0 + vy
+    route[0, 0] = last_x
+    route[0, 1] = last_y
+    route[1, 0] = new_x
+    route[1, 1] = new_y
+    n = 2
+
+    n_bounces = 0
+    k, t, point_x, point_y, a, b = find_first_contact(segments, last_x, last_y, new_x, new_y, radius)
+    while k >= 0:
+        n -= 1
+        flags |= TOUCH_BORDER
+        if is_winning[k]:
+            flags |= WON
+        if is_losing[k]:
+            flags |= LOST
+        last_x = point_x
+        last_y = point_y
+        if n == capacity:
+            return -1, flags, new_x, new_y, vx, vy
+        route[n, 0] = last_x
+        route[n, 1] = last_y
+        n += 1
+        if flags & (WON | LOST):
+            break
+        c = -a * last_x - b * last_y
+        # `Environment.calculate_velocity_vector`
+        norm = math.sqrt(a * a + b * b)
+        nx = a / norm
+        ny = b / norm
+        dot_product = nx * vx + ny * vy
+        vx, vy = vx - 2 * dot_product * nx, vy - 2 * dot_product * ny
+        if n_bounces == max_bounces:
+            new_x = last_x
+            new_y = last_y
+            break
+        n_bounces += 1
+        # `Environment.reflect_point_over_line`
+        z = a * a + b * b
+        x = new_x * (b * b - a * a) - 2 * a * (b * new_y + c)
+        y = new_y * (a * a - b * b) - 2 * b * (a * new_x + c)
+        new_x = x / z
+        new_y = y / z
+        if n == capacity:
+            return -1, flags, new_x, new_y, vx, vy
+        route[n, 0] = new_x
+        route[n, 1] = new_y
+        n += 1
+        k, t, point_x, point_y, a, b = find_first_contact(segments, last_x, last_y, new_x, new_y, radius)
+    return n, flags, new_x, new_y, vx, vy
@@ -0,0 +1,300 @@
+from __future__ import annotations
+import os
+from random import getrandbits
+
+import numpy as np
+
+from constants import edge_constants, node_constants
+from . import kernels
+from .array_mind import EDGE_FIELDS, N_EDGES_USED, ArrayMind, get_default_edge_capacity, get_layout, get_nbytes
+from .node import INPUT, OUTPUT, REGULAR
+
+# Header of the mind files: magic string, version, number of nodes and
+# number of edge slots. The arrays follow, as in `get_layout`
+MAGIC = b"STKMINDS"
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("padding", "<u4"),
+    ("n_nodes", "<i8"),
+    ("edge_capacity", "<i8"),
+])
+VERSION = 1
+
+# Arrays written in every cycle. They are kept in memory, and written
+# to the file by `MappedMind.flush`
+HOT_FIELDS = ("level", "damage", "is_active", "spilled", "pending")
+
+# Number of edge slots read at a time in each pass over the edges
+CHUNK_SIZE = 1 << 20
+
+
+class MappedMind(ArrayMind):
+    """
+    `ArrayMind` whose arrays live in a memory-mapped file, so minds with
+    millions of nodes and tens of millions of edges do not have to fit
+    in memory.
+
+    The structure of the mind (sizes, weights, lengths, sources and
+    destinations) is read from the file by the operating system as it
+    is needed, and only the state that changes in every cycle (see
+    `HOT_FIELDS`) is kept in memory. The passes over the edges of
+    `run_nodes` and of the sleep cycles (see `ArrayMind.remake_nodes`)
+    read the file in chunks of `CHUNK_SIZE` slots, in order.
+
+    The file can be reopened with `open` without reading it. The state
+    is saved by `flush` and `close`; changes to the structure, e.g. in
+    the sleep cycles, are written to the file as they happen
+    """
+
+    def __init__(self, path: str, mapping: np.memmap, arrays: dict[str, np.ndarray], n_nodes: int) -> None:
+        """
+        Use `create`, `open`, `from_mind` or `random` instead
+
+        Args:
+            path: file of the mind
+            mapping: map of the whole file
+            arrays: arrays of the mind. The ones in `HOT_FIELDS` are copies in memory
+            n_nodes: number of nodes of the mind
+        """
+        self.path = path
+        self.mapping = mapping
+        super().__init__(arrays, n_nodes, owns_memory=True)
+
+    @classmethod
+    def create(cls, path: str, n_nodes: int, edge_capacity: int) -> MappedMind:
+        """
+        Create an empty mind file
+        Args:
+            path: file to write
+            n_nodes: number of nodes of the mind
+            edge_capacity: number of edge slots
+        Returns:
+            New instance that reads and writes the file
+        """
+        header = np.array([(MAGIC, VERSION, 0, n_nodes, edge_capacity)], dtype=HEADER_DTYPE)
+        with open(path, "wb") as f:
+            f.write(header.tobytes())
+            # The rest of the file is filled with zeros without writing them
+            f.truncate(HEADER_DTYPE.itemsize + get_nbytes(n_nodes, edge_capacity))
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: str) -> MappedMind:
+        """
+        Map a mind file written by this class
+        Args:
+            path: file to read
+        Returns:
+            New instance that reads and writes the file
+        """
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]["magic"] != MAGIC or header[0]["version"] != VERSION:
+            raise ValueError(f"{path} is not a mind file of version {VERSION}")
+        n_nodes = int(header[0]["n_nodes"])
+        edge_capacity = int(header[0]["edge_capacity"])
+        mapping = np.memmap(path, dtype=np.uint8, mode="r+")
+        arrays = dict()
+        for name, dtype, n_elements, offset in get_layout(n_nodes, edge_capacity):
+            array = np.ndarray(
+                (n_elements,),
+                dtype=dtype,
+                buffer=mapping,
+                offset=HEADER_DTYPE.itemsize + offset,
+            )
+            arrays[name] = array.copy() if name in HOT_FIELDS else array
+        return cls(path, mapping, arrays, n_nodes)
+
+    @classmethod
+    def from_mind(cls, mind, path: str, edge_capacity: int = None) -> MappedMind:
+        """
+        Write a `StynkerMind` to a mind file
+        Args:
+            mind: instance of `StynkerMind`. Its nodes must be
+                named from 0 to `n_nodes` - 1
+            path: file to write
+            edge_capacity: number of edge slots. By default, see
+                `get_default_edge_capacity`
+        Returns:
+            New instance with the same nodes, edges and state as `mind`
+        """
+        n_nodes = len(mind.graph)
+        n_edges = sum(len(edges) for edges in mind.graph.values())
+        if edge_capacity is None:
+            edge_capacity = get_default_edge_capacity(n_nodes, n_edges)
+        mapped_mind = cls.create(path, n_nodes, edge_capacity)
+        mapped_mind.load_graph(mind.graph, mind.reverse_graph)
+        mapped_mind.flush()
+        return mapped_mind
+
+    @classmethod
+    def random(
+        cls,
+        path: str,
+        n_nodes: int,
+        n_input: int,
+        n_output: int,
+        edge_capacity: int = None,
+    ) -> MappedMind:
+        """
+        Write a mind file with random nodes and edges, without creating
+        the `Node`/`Edge` objects. The nodes and edges are drawn from the
+        same ranges as `StynkerMind.make_random_graph`, one chunk of
+        nodes at a time, but the graph is not the one `StynkerMind`
+        makes for the same seed
+        Args:
+            path: file to write
+            n_nodes: number of nodes of the mind
+            n_input: number of input nodes. They are the first ones
+            n_output: number of output nodes. They come after the input nodes
+            edge_capacity: number of edge slots. By default, twice the
+                number of edges, so the sleep cycles rarely have to grow the file
+        Returns:
+            New instance with the random mind
+        """
+        rng = np.random.default_rng(getrandbits(64))
+
+        def draw(value_range: tuple[int, int], n: int) -> np.ndarray:
+            # Same values as `randint`, with both ends included
+            low, high = value_range
+            return rng.integers(low, high + 1, n)
+
+        n_edges = draw(edge_constants["n_edges_range"], n_nodes)
+        if n_nodes < 2:
+            n_edges[:] = 0
+        if edge_capacity is None:
+            edge_capacity = max(2 * int(n_edges.sum()), 1)
+        mapped_mind = cls.create(path, n_nodes, edge_capacity)
+
+        mapped_mind.size[:] = draw(node_constants["size_range"], n_nodes)
+        mapped_mind.endo[:] = draw(node_constants["endo_range"], n_nodes)
+        mapped_mind.duration[:] = draw(node_constants["duration_range"], n_nodes)
+        mapped_mind.node_type[:] = REGULAR
+        mapped_mind.node_type[:n_input] = INPUT
+        mapped_mind.node_type[n_input:n_input + n_output] = OUTPUT
+        mapped_mind.order[:] = np.arange(n_nodes)
+        mapped_mind.rank[:] = np.arange(n_nodes)
+
+        slot = 0
+        # About `CHUNK_SIZE` edges at a time
+        nodes_per_chunk = max(1, CHUNK_SIZE // edge_constants["n_edges_range"][1])
+        for lo in range(0, n_nodes if n_nodes > 1 else 0, nodes_per_chunk):
+            hi = min(lo + nodes_per_chunk, n_nodes)
+            sources = np.repeat(np.arange(lo, hi), n_edges[lo:hi])
+            # Any node except the source, as `get_random_node`
+            destinations = rng.integers(0, n_nodes - 1, len(sources))
+            destinations += destinations >= sources
+            weights = draw(edge_constants["weight_range"], len(sources))
+            lengths = draw(edge_constants["length_range"], len(sources))
+            # Only the first edge between two nodes is kept
+            _, first = np.unique(sources * n_nodes + destinations, return_index=True)
+            first.sort()
+            n = len(first)
+            if slot + n > edge_capacity:
+                raise ValueError("The random edges do not fit in the edge slots")
+            mapped_mind.source[slot:slot + n] = sources[first]
+            mapped_mind.destination[slot:slot + n] = destinations[first]
+            mapped_mind.weight[slot:slot + n] = weights[first]
+            mapped_mind.length[slot:slot + n] = lengths[first]
+            mapped_mind.tracked[slot:slot + n] = True
+            mapped_mind.alive[slot:slot + n] = True
+            slot += n
+        mapped_mind.counters[N_EDGES_USED] = slot
+        mapped_mind._structure_changed()
+        mapped_mind.flush()
+        return mapped_mind
+
+    def get_chunks(self) -> list[slice]:
+        """
+        Returns:
+            Slices of at most `CHUNK_SIZE` slots that cover the used edge slots
+        """
+        n_edges_used = self.n_edges_used
+        return [slice(lo, min(lo + CHUNK_SIZE, n_edges_used)) for lo in range(0, n_edges_used, CHUNK_SIZE)]
+
+    def run_nodes(self) -> list[int]:
+        """
+        Load the nodes, and spill the ones that are full. See `ArrayMind.run_nodes`.
+        The compiled kernels already read the edges in order, in a single pass
+        Returns:
+            Names of the nodes that spilled, in the order of the graph
+        """
+        if kernels.get_backend() != "numpy":
+            return super().run_nodes()
+
+        # The trickles are summed one chunk at a time
+        before = np.zeros(self.n_nodes, dtype=np.int64)
+        after = np.zeros(self.n_nodes, dtype=np.int64)
+        for chunk in self.get_chunks():
+            chunk_before, chunk_after = self.deliver_trickles(chunk)
+            before += chunk_before
+            after += chunk_after
+        self.update_levels(0, self.n_nodes, before, after)
+        self.spill_nodes(0, self.n_nodes)
+        for chunk in self.get_chunks():
+            self.load_edges(chunk)
+        return self.get_spilled_names()
+
+    def flush(self) -> None:
+        """Write the state in memory to the file"""
+        if self.mapping is None:
+            return
+        for name in HOT_FIELDS:
+            self._get_mapped_array(name)[:] = self.arrays[name]
+        self.mapping.flush()
+
+    def close(self) -> None:
+        """Save the state, and unmap the file. The instance cannot be used afterwards"""
+        if self.mapping is None:
+            return
+        self.flush()
+        for name in self.arrays:
+            delattr(self, name)
+        self.arrays = dict()
+        self.mapping = None
+
+    def _get_mapped_array(self, name: str) -> np.ndarray:
+        """
+        Args:
+            name: name of an array of the mind
+        Returns:
+            View of the array in the file
+        """
+        for field_name, dtype, n_elements, offset in get_layout(self.n_nodes, self.edge_capacity):
+            if field_name == name:
+                return np.ndarray(
+                    (n_elements,),
+                    dtype=dtype,
+                    buffer=self.mapping,
+                    offset=HEADER_DTYPE.itemsize + offset,
+                )
+        raise KeyError(name)
+
+    def _resize_edges(self, edge_capacity: int) -> None:
+        """
+        Replace the file by a new one with a different number of edge slots
+        Args:
+            edge_capacity: new number of edge slots
+        """
+        # Write to a temporary file first, so the mind is never lost
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        new_mind = MappedMind.create(temporary_path, self.n_nodes, edge_capacity)
+        n_edges_used = min(self.n_edges_used, edge_capacity)
+        for name, array in self.arrays.items():
+            if name in dict(EDGE_FIELDS):
+                new_mind.arrays[name][:n_edges_used] = array[:n_edges_used]
+            else:
+                new_mind.arrays[name][:] = array
+        new_mind.close()
+        self.mapping = None
+        os.replace(temporary_path, self.path)
+        reopened = MappedMind.open(self.path)
+        self.mapping = reopened.mapping
+        self.arrays = reopened.arrays
+        self._set_attributes()
+
+    def __enter__(self) -> MappedMind:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,274 @@
+from __future__ import annotations
+import hashlib
+import logging
+import math
+import os
+
+import numpy as np
+
+# Directory with the maze files, and directory with their compiled geometry
+MAZES_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mazes")
+CACHE_DIRECTORY = os.path.join(MAZES_DIRECTORY, ".cache")
+
+# Header of the compiled geometry files: magic string, version, number of
+# walls, and the uniform grid (origin, size of the cells, number of cells)
+MAGIC = b"STKMAZES"
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("n_segments", "<u4"),
+    ("origin", "<f8", (2,)),
+    ("cell_size", "<f8"),
+    ("n_cells", "<u4", (2,)),
+])
+VERSION = 2
+
+# Walls of the border, with everything that the collision tests compute
+# from them. They do not depend on the radius of the bodies
+SEGMENT_DTYPE = np.dtype([
+    ("p1", "<f8", (2,)),
+    ("p2", "<f8", (2,)),
+    ("a", "<f8"),
+    ("b", "<f8"),
+    ("c", "<f8"),
+    ("norm", "<f8"),
+    ("bounding_box", "<f8", (4,)),
+])
+
+
+def get_maze_path(env_name: str) -> str:
+    """
+    Get the file of a maze
+    Args:
+        env_name: name of a maze in `MAZES_DIRECTORY`, or path to a maze file
+    Returns:
+        Path to the maze file
+    """
+    if os.path.isfile(env_name):
+        return env_name
+    path = os.path.join(MAZES_DIRECTORY, f"{env_name}.json")
+    if not os.path.isfile(path):
+        raise NotImplementedError(f"The environment {env_name} is not supported")
+    return path
+
+
+def get_walls(border_coordinates: list[tuple[float, float]]) -> list[tuple[tuple[float, float], tuple[float, float]]]:
+    """
+    Get the segments followed when drawing the border, in order.
+    Repeated consecutive corners are ignored
+    Args:
+        border_coordinates: corners of the border
+    Returns:
+        List of (start, end) segments, closing the border
+    """
+    corners = [tuple(corner) for corner in border_coordinates]
+    corners = [corner for i, corner in enumerate(corners) if i == 0 or corner != corners[i - 1]]
+    if len(corners) > 1 and corners[-1] == corners[0]:
+        corners.pop()
+    return [(corner, corners[(i + 1) % len(corners)]) for i, corner in enumerate(corners)]
+
+
+def get_unique_walls(border_coordinates: list[tuple[float, float]]) -> list[tuple[tuple[float, float], tuple[float, float]]]:
+    """
+    Get the walls of the border, each one once: a thin wall (a segment
+    drawn forth and back) is a single wall, where the bodies bounce
+    from both sides
+    Args:
+        border_coordinates: corners of the border
+    Returns:
+        List of (start, end) segments, in the order they are drawn
+    """
+    walls = list()
+    for start, end in get_walls(border_coordinates):
+        if (start, end) not in walls and (end, start) not in walls:
+            walls.append((start, end))
+    return walls
+
+
+class MazeGeometry:
+    """
+    Geometry of a maze: the walls with their general form and bounding
+    box, and a uniform grid with the walls that touch each cell, so the
+    walls near a movement can be found without testing all of them.
+    The same geometry serves bodies of any radius.
+
+    The geometry is saved in a binary file keyed by the hash of the maze
+    file, and later loaded with `np.memmap`, so loading a large maze in
+    many processes shares the pages and computes nothing
+    """
+
+    def __init__(self, segments: np.ndarray, origin: tuple[float, float], cell_size: float,
+                 n_cells: tuple[int, int], cell_start: np.ndarray, cell_segments: np.ndarray) -> None:
+        """
+        Use `compile`, `load` or `from_file` instead of this constructor
+
+        Args:
+            segments: array of `SEGMENT_DTYPE`
+            origin: lower left corner of the grid
+            cell_size: side of the cells of the grid
+            n_cells: number of cells along each axis
+            cell_start: where the segments of each cell start in
+                `cell_segments`, with one extra element at the end
+            cell_segments: indices of the segments of every cell
+        """
+        self.segments = segments
+        self.origin = origin
+        self.cell_size = cell_size
+        self.n_cells = n_cells
+        self.cell_start = cell_start
+        self.cell_segments = cell_segments
+
+    @property
+    def walls(self) -> list[tuple[tuple[float, float], tuple[float, float]]]:
+        return [
+            (tuple(p1), tuple(p2))
+            for p1, p2 in zip(self.segments["p1"].tolist(), self.segments["p2"].tolist())
+        ]
+
+    @classmethod
+    def compile(cls, border_coordinates: list[tuple[float, float]]) -> MazeGeometry:
+        """
+        Compute the geometry of a maze
+        Args:
+            border_coordinates: corners of the border
+        Returns:
+            Geometry of the maze
+        """
+        walls = get_unique_walls(border_coordinates)
+        segments = np.zeros(len(walls), dtype=SEGMENT_DTYPE)
+        points = np.array(walls, dtype=np.float64)
+        segments["p1"] = points[:, 0]
+        segments["p2"] = points[:, 1]
+        (x1, y1), (x2, y2) = points[:, 0].T, points[:, 1].T
+        # Same operations as `Environment.get_general_form`
+        segments["a"] = y1 - y2
+        segments["b"] = x2 - x1
+        segments["c"] = -segments["a"] * x1 - segments["b"] * y1
+        segments["norm"] = np.sqrt(segments["a"] ** 2 + segments["b"] ** 2)
+        segments["bounding_box"] = np.stack([
+            np.minimum(x1, x2), np.minimum(y1, y2), np.maximum(x1, x2), np.maximum(y1, y2),
+        ], axis=1)
+
+        # Around one segment per cell
+        boxes = segments["bounding_box"]
+        origin = (float(boxes[:, 0].min()), float(boxes[:, 1].min()))
+        width = float(boxes[:, 2].max()) - origin[0]
+        height = float(boxes[:, 3].max()) - origin[1]
+        cell_size = max(width, height, 1.0) / max(1, math.ceil(math.sqrt(len(segments))))
+        n_cells = (int(width // cell_size) + 1, int(height // cell_size) + 1)
+        geometry = cls(segments, origin, cell_size, n_cells, None, None)
+
+        cells = [list() for _ in range(n_cells[0] * n_cells[1])]
+        for k, (x_min, y_min, x_max, y_max) in enumerate(boxes.tolist()):
+            for cell in geometry.get_cells(x_min, y_min, x_max, y_max):
+                cells[cell].append(k)
+        geometry.cell_start = np.cumsum([0] + [len(cell) for cell in cells], dtype=np.int64)
+        geometry.cell_segments = np.array([k for cell in cells for k in cell], dtype=np.int32)
+        # The geometry is shared, as the maps of the compiled files
+        for array in (segments, geometry.cell_start, geometry.cell_segments):
+            array.flags.writeable = False
+        return geometry
+
+    def get_cells(self, x_min: float, y_min: float, x_max: float, y_max: float) -> list[int]:
+        """
+        Get the cells of the grid that overlap a box
+        Args:
+            x_min: left side of the box
+            y_min: bottom side of the box
+            x_max: right side of the box
+            y_max: top side of the box
+        Returns:
+            Indices of the cells
+        """
+        nx, ny = self.n_cells
+        ox, oy = self.origin
+        i_min = min(max(math.floor((x_min - ox) / self.cell_size), 0), nx - 1)
+        i_max = min(max(math.floor((x_max - ox) / self.cell_size), 0), nx - 1)
+        j_min = min(max(math.floor((y_min - oy) / self.cell_size), 0), ny - 1)
+        j_max = min(max(math.floor((y_max - oy) / self.cell_size), 0), ny - 1)
+        return [i * ny + j for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)]
+
+    def get_candidate_segments(self, p: tuple[float, float], q: tuple[float, float], margin: float = 0.0) -> list[int]:
+        """
+        Get the segments that may be touched in the movement from p to q
+        Args:
+            p: initial position
+            q: final position
+            margin: radius of the body that moves
+        Returns:
+            Indices of the segments, sorted
+        """
+        candidates = set()
+        cell_start = self.cell_start
+        cell_segments = self.cell_segments
+        x_min, x_max = min(p[0], q[0]) - margin, max(p[0], q[0]) + margin
+        y_min, y_max = min(p[1], q[1]) - margin, max(p[1], q[1]) + margin
+        for cell in self.get_cells(x_min, y_min, x_max, y_max):
+            candidates.update(cell_segments[cell_start[cell]:cell_start[cell + 1]].tolist())
+        return sorted(candidates)
+
+    def save(self, path: str) -> None:
+        """
+        Write the geometry to a binary file
+        Args:
+            path: file to write
+        """
+        header = np.array(
+            [(MAGIC, VERSION, len(self.segments), self.origin, self.cell_size, self.n_cells)],
+            dtype=HEADER_DTYPE,
+        )
+        # Write to a temporary file first, so other processes never read half a file
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            for array in (header, self.segments, self.cell_start, self.cell_segments):
+                f.write(array.tobytes())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> MazeGeometry:
+        """
+        Map a binary file written by `save`
+        Args:
+            path: file to read
+        Returns:
+            Geometry whose arrays are read-only views of the file
+        """
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            raise ValueError(f"{path} is not a compiled maze of version {VERSION}")
+        n_segments = int(header["n_segments"])
+        n_cells = tuple(header["n_cells"].tolist())
+        offset = HEADER_DTYPE.itemsize
+        segments = np.memmap(path, dtype=SEGMENT_DTYPE, mode="r", offset=offset, shape=(n_segments,))
+        offset += segments.nbytes
+        cell_start = np.memmap(path, dtype=np.int64, mode="r", offset=offset, shape=(n_cells[0] * n_cells[1] + 1,))
+        offset += cell_start.nbytes
+        cell_segments = np.memmap(path, dtype=np.int32, mode="r", offset=offset, shape=(int(cell_start[-1]),))
+        return cls(segments, tuple(header["origin"].tolist()), float(header["cell_size"]), n_cells,
+                   cell_start, cell_segments)
+
+    @classmethod
+    def from_file(cls, maze_path: str, border_coordinates: list[tuple[float, float]]) -> MazeGeometry:
+        """
+        Get the geometry of a maze file, compiling it only if it is not
+        in `CACHE_DIRECTORY` yet
+        Args:
+            maze_path: maze file
+            border_coordinates: corners of the border in the file
+        Returns:
+            Geometry of the maze
+        """
+        with open(maze_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        path = os.path.join(CACHE_DIRECTORY, f"{digest[:32]}_v{VERSION}.bin")
+        if os.path.isfile(path):
+            return cls.load(path)
+
+        geometry = cls.compile(border_coordinates)
+        try:
+            os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+            geometry.save(path)
+        except OSError as e:
+            logging.warning(f"The geometry of {maze_path} can not be cached: {e}")
+            return geometry
+        return cls.load(path)
@@ -0,0 +1,294 @@
+from __future__ import annotations
+import logging
+import math
+import sys
+import tracemalloc
+import types
+from typing import Any, Callable
+
+import numpy as np
+
+from .array_mind import NODE_FIELDS, N_COUNTERS, get_default_edge_capacity
+from .edge import Edge
+from .node import Node
+from constants import edge_constants
+
+# Parts of a mind in the estimates and the measures
+COMPONENTS = ("nodes", "edges", "pending", "reverse_graph")
+
+# Number of nodes with the same parameters used to compute the cost of each
+# object, so the costs are those of the running version of Python
+SAMPLE_SIZE = 1000
+
+
+def get_deep_size(obj: Any, seen: set[int] = None) -> int:
+    """
+    Get the memory used by an object and everything it references, with
+    `sys.getsizeof`. Objects are counted once, even if they are referenced
+    several times. Arrays count the buffer they are a view of, if it is
+    a Python object (e.g. a `bytearray`), but not memory-mapped files
+    Args:
+        obj: object to measure
+        seen: ids of the objects already counted, which are skipped.
+            Updated with the objects counted
+    Returns:
+        Number of bytes
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, np.ndarray):
+            if obj.base is not None:
+                stack.append(obj.base)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return size
+
+
+def trace_peak(function: Callable[..., Any], *args, **kwargs) -> tuple[Any, int, int]:
+    """
+    Run a function while tracing the memory allocated by Python
+    Args:
+        function: function to run
+        *args: positional arguments of the function
+        **kwargs: keyword arguments of the function
+    Returns:
+        Result of the function, memory still allocated when it returns
+        and peak memory while it runs, in bytes
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    try:
+        result = function(*args, **kwargs)
+        end, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return result, end - start, peak - start
+
+
+def get_object_costs() -> dict[str, float]:
+    """
+    Get the number of bytes of each kind of object of a `StynkerMind`
+    Returns:
+        Dictionary with the bytes per node (with its entries in `graph`,
+        `reverse_graph` and `nodes_dict`), per edge, per set of outcoming
+        edges, per set of the reverse graph, per trickle on its way, and
+        per entry of a dictionary from integers to integers (e.g. the maps
+        of the nodes by name of `StynkerMind.copy_graph`)
+    """
+    low, high = edge_constants["n_edges_range"]
+    mean = (low + high) / 2
+    node = Node(name=SAMPLE_SIZE, size=450, endo=2, duration=150)
+    dict_entry_bytes = sys.getsizeof(dict.fromkeys(range(SAMPLE_SIZE))) / SAMPLE_SIZE
+    return {
+        # The name, the size and the duration are not small integers,
+        # so each node has its own objects
+        "node": sys.getsizeof(node) + 3 * sys.getsizeof(SAMPLE_SIZE) + 3 * dict_entry_bytes,
+        "edge": sys.getsizeof(Edge(node, weight=3, length=2)),
+        # The number of outcoming edges of each node is uniform, and the
+        # number of incoming ones follows a Poisson distribution with the
+        # same mean
+        "edge_set": sum(sys.getsizeof(set(range(k))) for k in range(low, high + 1)) / (high - low + 1),
+        "reverse_set": sum(
+            math.exp(k * math.log(mean) - mean - math.lgamma(k + 1)) * sys.getsizeof(set(range(k)))
+            for k in range(4 * high)
+        ),
+        "trickle": sys.getsizeof((1,)),
+        "dict_entry": dict_entry_bytes + 2 * sys.getsizeof(SAMPLE_SIZE),
+    }
+
+
+def estimate_n_edges(n_nodes: int) -> int:
+    """
+    Args:
+        n_nodes: number of nodes of a mind
+    Returns:
+        Expected number of edges of a new random mind
+    """
+    low, high = edge_constants["n_edges_range"]
+    return round(n_nodes * min((low + high) / 2, max(n_nodes - 1, 0)))
+
+
+def estimate_mind_bytes(n_nodes: int, engine: str = "object") -> dict[str, int]:
+    """
+    Estimate the memory of a new random mind, before creating it.
+    The trickles are estimated as one on the way of every edge
+    Args:
+        n_nodes: number of nodes of the mind
+        engine: "object" for the `Node`/`Edge` objects, or the engine
+            that runs the mind: "array", "partitioned" or "mapped"
+    Returns:
+        Bytes of each component (see `COMPONENTS`), and the `total`
+    """
+    n_edges = estimate_n_edges(n_nodes)
+    costs = get_object_costs()
+    if engine == "object":
+        estimate = {
+            "nodes": n_nodes * costs["node"],
+            "edges": n_edges * costs["edge"] + n_nodes * costs["edge_set"],
+            "pending": n_edges * costs["trickle"],
+            "reverse_graph": n_nodes * costs["reverse_set"],
+        }
+    else:
+        edge_capacity = get_default_edge_capacity(n_nodes, n_edges)
+        node_bytes = sum(np.dtype(dtype).itemsize for _, dtype in NODE_FIELDS)
+        estimate = {
+            # With the juice arriving to each node, see `ArrayMind.__init__`
+            "nodes": n_nodes * (node_bytes + 16) + 8 * N_COUNTERS,
+            # Source, destination, weight, length and alive
+            "edges": edge_capacity * 33,
+            "pending": edge_capacity,
+            "reverse_graph": edge_capacity,
+        }
+    estimate = {key: int(value) for key, value in estimate.items()}
+    estimate["total"] = sum(estimate.values())
+    return estimate
+
+
+def estimate_run_bytes(n_nodes: int, engine: str = "object", n_minds: int = 1) -> dict[str, int]:
+    """
+    Estimate the memory of a run of Stynkers, before creating them.
+    Stynkers with an engine also keep their `Node`/`Edge` objects.
+    Without an engine, `Stynker.clone_from` frees the objects of a mind
+    before copying the new ones, so it only needs the maps of the nodes
+    by name while it copies (see `StynkerMind.copy_graph`)
+    Args:
+        n_nodes: number of nodes of each mind
+        engine: engine of the Stynkers, see `estimate_mind_bytes`
+        n_minds: number of Stynkers
+    Returns:
+        Bytes of each component (see `COMPONENTS`) of all the minds,
+        of the transient `clone` and the `total`
+    """
+    minds = [estimate_mind_bytes(n_nodes)]
+    if engine != "object":
+        minds.append(estimate_mind_bytes(n_nodes, engine))
+    estimate = {key: n_minds * sum(mind[key] for mind in minds) for key in COMPONENTS}
+    if engine == "object":
+        estimate["clone"] = int(2 * n_nodes * get_object_costs()["dict_entry"])
+    else:
+        estimate["clone"] = 0
+    estimate["total"] = sum(estimate.values())
+    return estimate
+
+
+def measure_mind(mind: Any) -> dict[str, int]:
+    """
+    Measure the memory used by a mind
+    Args:
+        mind: `StynkerMind`. If it has an engine, its arrays are also measured
+    Returns:
+        Bytes of each component (see `COMPONENTS`), and the `total`
+    """
+    seen = set()
+    measure = {
+        "nodes": get_deep_size(mind.nodes_dict, seen) + sum(get_deep_size(node, seen) for node in mind.graph),
+        "edges": 0,
+        "pending": 0,
+        "reverse_graph": 0,
+    }
+    # The nodes are already counted, so the edges only count themselves
+    for edges in mind.graph.values():
+        for edge in edges:
+            if edge.next_steps:
+                measure["pending"] += get_deep_size(edge.next_steps, seen)
+        measure["edges"] += get_deep_size(edges, seen)
+    measure["nodes"] += sys.getsizeof(mind.graph)
+    measure["reverse_graph"] = get_deep_size(mind.reverse_graph, seen)
+
+    engine = getattr(mind.engine, "mind", mind.engine)
+    if engine is not None:
+        arrays = engine.arrays
+        measure["nodes"] += sum(arrays[name].nbytes for name, _ in NODE_FIELDS) + arrays["counters"].nbytes
+        measure["nodes"] += engine._before.nbytes + engine._after.nbytes
+        measure["edges"] += sum(arrays[name].nbytes for name in ("source", "destination", "weight", "length", "alive"))
+        if engine._edge_hashes is not None:
+            measure["edges"] += engine._edge_hashes.nbytes
+        measure["pending"] += arrays["pending"].nbytes
+        measure["reverse_graph"] += arrays["tracked"].nbytes
+    measure["total"] = sum(measure.values())
+    return measure
+
+
+class MemoryBudget:
+    """
+    Limit of the memory of a run, checked before it starts.
+
+    Runs are estimated with `estimate_run_bytes`. A run over the budget
+    is refused with a `MemoryError`, or its minds are given the largest
+    number of nodes that fits, depending on `action`
+    """
+
+    actions = ("refuse", "downsize")
+
+    def __init__(self, budget: int, action: str = "refuse") -> None:
+        """
+
+        Args:
+            budget: maximum number of bytes
+            action: "refuse" or "downsize"
+        """
+        if action not in self.actions:
+            raise ValueError(f"Action must be one of the following: {', '.join(self.actions)}")
+        self.budget = budget
+        self.action = action
+
+    def fit(self, n_nodes: int, n_input: int, n_output: int, engine: str = "object", n_minds: int = 1) -> int:
+        """
+        Check a run against the budget
+        Args:
+            n_nodes: number of nodes of each mind
+            n_input: number of input nodes of each mind
+            n_output: number of output nodes of each mind
+            engine: engine of the Stynkers, see `estimate_mind_bytes`
+            n_minds: number of Stynkers
+        Returns:
+            Number of nodes of each mind that fits in the budget
+        Raises:
+            MemoryError: if the run does not fit, and it is not
+                downsized or it does not fit with the minimum number of nodes
+        """
+        estimate = estimate_run_bytes(n_nodes, engine, n_minds)["total"]
+        if estimate <= self.budget:
+            return n_nodes
+        message = (
+            f"{n_minds} mind{'s' if n_minds > 1 else ''} of {n_nodes} nodes with the {engine} engine need about "
+            f"{estimate / 2 ** 20:.1f} MiB, over the budget of {self.budget / 2 ** 20:.1f} MiB"
+        )
+        if self.action == "refuse":
+            raise MemoryError(message)
+
+        # The estimate grows with the number of nodes
+        low = n_input + n_output
+        if estimate_run_bytes(low, engine, n_minds)["total"] > self.budget:
+            raise MemoryError(f"{message}, even with {low} nodes")
+        high = n_nodes
+        while high - low > 1:
+            middle = (low + high) // 2
+            if estimate_run_bytes(middle, engine, n_minds)["total"] <= self.budget:
+                low = middle
+            else:
+                high = middle
+        logging.warning(f"{message}. Using {low} nodes")
+        return low
@@ -5,9 +5,31 @@ from typing import Any
 
 from constants import node_constants
 
+# Types of node, identified by their index in `NODE_TYPES`
+NODE_TYPES = ("input", "output", "regular")
+INPUT, OUTPUT, REGULAR = range(len(NODE_TYPES))
+
 
 class Node:
-    """Node object that represents a neurone"""
+    """
+    Node object that represents a neurone.
+
+    The attributes are kept in `__slots__`, without a `__dict__`, and
+    the type is stored as a small integer (see `NODE_TYPES`)
+    """
+
+    __slots__ = (
+        "name",
+        "size",
+        "endo",
+        "duration",
+        "type_code",
+        "level",
+        "damage",
+        "is_active",
+        "num_sleep_cycles",
+    )
+
     def __init__(
         self,
         name: int,
@@ -31,25 +53,34 @@ class Node:
             num_sleep_cycles: number of sleep cycles the node has been
                 since it was created (when remade, it restarts)
         """
+        if node_type not in NODE_TYPES:
+            raise ValueError(
+                f"Node type should be one of the following: {', '.join(NODE_TYPES)}"
+                f", not {node_type}"
+            )
+
         self.name = name
         self.size = size
         self.endo = endo
         self.duration = duration
-        self.type = node_type
+        self.type_code = NODE_TYPES.index(node_type)
         self.level = level
         self.damage = damage
         self.is_active = is_active
         self.num_sleep_cycles = num_sleep_cycles
-        self.is_input = node_type == "input"
-        self.is_output = node_type == "output"
 
-        allowed_types = ("input", "output", "regular")
+    @property
+    def type(self) -> str:
+        """Type of the node: input | output | regular"""
+        return NODE_TYPES[self.type_code]
 
-        if node_type not in allowed_types:
-            raise ValueError(
-                f"Node type should be one of the following: {', '.join(allowed_types)}"
-                f", not {node_type}"
-            )
+    @property
+    def is_input(self) -> bool:
+        return self.type_code == INPUT
+
+    @property
+    def is_output(self) -> bool:
+        return self.type_code == OUTPUT
 
     def is_full(self) -> bool:
         """
@@ -94,7 +125,7 @@ class Node:
 
     def activate(self) -> None:
         """Mark node as active if it is input or output"""
-        if self.type not in ("input", "output"):
+        if self.type_code == REGULAR:
             raise ValueError("Attempting to activate a 'regular' node")
         self.is_active = True
 
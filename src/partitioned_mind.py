@@ -0,0 +1,214 @@
+from __future__ import annotations
+import multiprocessing
+import os
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from .array_mind import STRUCTURE_VERSION, ArrayMind, get_nbytes
+
+# Commands sent to the workers
+RUN, STOP = range(2)
+
+
+def get_shared_views(
+    buffer: Any,
+    n_nodes: int,
+    edge_capacity: int,
+    n_workers: int,
+) -> tuple[ArrayMind, np.ndarray, np.ndarray]:
+    """
+    Get the views of the shared memory used by a `PartitionedMind`
+    Args:
+        buffer: shared buffer
+        n_nodes: number of nodes of the mind
+        edge_capacity: number of edge slots of the mind
+        n_workers: number of worker processes
+    Returns:
+        The mind, the exchange array with the juice that each worker
+        sends to each node, before and after its `endo`, with shape
+        (2, `n_workers`, `n_nodes`), and the command array
+    """
+    mind_nbytes = get_nbytes(n_nodes, edge_capacity)
+    mind = ArrayMind.from_buffer(buffer, n_nodes, edge_capacity)
+    exchange = np.ndarray((2, n_workers, n_nodes), dtype=np.int64, buffer=buffer, offset=mind_nbytes)
+    command = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=mind_nbytes + exchange.nbytes)
+    return mind, exchange, command
+
+
+def run_worker(
+    shared_memory_name: str,
+    n_nodes: int,
+    edge_capacity: int,
+    n_workers: int,
+    k: int,
+    lo: int,
+    hi: int,
+    barrier: Any,
+) -> None:
+    """
+    Loop of a worker process of a `PartitionedMind`. In each cycle:
+        1. Deliver the trickles of the edges that start in the partition,
+           and publish the juice arriving to every node
+        2. Update the levels of the nodes of the partition with the
+           juice published by all the workers, and spill them
+    Args:
+        shared_memory_name: name of the shared memory
+        n_nodes: number of nodes of the mind
+        edge_capacity: number of edge slots of the mind
+        n_workers: number of worker processes
+        k: index of the worker
+        lo: first node of the partition
+        hi: node after the last one of the partition
+        barrier: barrier shared with the other workers and the coordinator
+    """
+    shared_memory = SharedMemory(name=shared_memory_name)
+    mind, exchange, command = get_shared_views(shared_memory.buf, n_nodes, edge_capacity, n_workers)
+    structure_version = None
+    edges = None
+    while True:
+        barrier.wait()
+        if command[0] == STOP:
+            break
+        # The edges only change in the sleep cycles, done by the coordinator
+        if mind.counters[STRUCTURE_VERSION] != structure_version:
+            structure_version = mind.counters[STRUCTURE_VERSION]
+            edges = mind.get_partition_edges(lo, hi)
+
+        exchange[0, k], exchange[1, k] = mind.deliver_trickles(edges)
+        barrier.wait()
+
+        mind.update_levels(
+            lo,
+            hi,
+            exchange[0, :, lo:hi].sum(axis=0),
+            exchange[1, :, lo:hi].sum(axis=0),
+        )
+        mind.spill(lo, hi, edges)
+        barrier.wait()
+
+    del mind, exchange, command
+    shared_memory.close()
+
+
+class PartitionedMind:
+    """
+    Run the nodes of an `ArrayMind` split across worker processes.
+
+    Every edge has a length of at least 1, so a spill never changes a
+    level in the same cycle, and each worker can run its range of
+    nodes (and the edges that start there) independently. The mind
+    lives in shared memory, and in each cycle the workers exchange the
+    juice sent to other partitions through it, in bulk. The result is
+    identical to running the `ArrayMind` in a single process.
+
+    The sleep cycles, and any change to the structure, are run by the
+    coordinator (the process that created the instance)
+    """
+
+    def __init__(self, mind: ArrayMind, n_workers: int = None, start_method: str = None) -> None:
+        """
+
+        Args:
+            mind: mind to run. It is copied to shared memory
+            n_workers: number of worker processes. By default, one per CPU
+            start_method: start method of the processes, see `multiprocessing`
+        """
+        n_workers = n_workers or os.cpu_count()
+        n_workers = max(1, min(n_workers, mind.n_nodes))
+        self.n_workers = n_workers
+        n_nodes = mind.n_nodes
+        edge_capacity = mind.edge_capacity
+
+        nbytes = get_nbytes(n_nodes, edge_capacity) + 8 * (2 * n_workers * n_nodes + 1)
+        self.shared_memory = SharedMemory(create=True, size=nbytes)
+        self.mind, self._exchange, self._command = get_shared_views(
+            self.shared_memory.buf,
+            n_nodes,
+            edge_capacity,
+            n_workers,
+        )
+        self.mind.copy_from(mind)
+        self._command[0] = RUN
+
+        context = multiprocessing.get_context(start_method)
+        self._barrier = context.Barrier(n_workers + 1)
+        bounds = np.linspace(0, n_nodes, n_workers + 1).astype(int).tolist()
+        self.workers = [
+            context.Process(
+                target=run_worker,
+                args=(
+                    self.shared_memory.name,
+                    n_nodes,
+                    edge_capacity,
+                    n_workers,
+                    k,
+                    bounds[k],
+                    bounds[k + 1],
+                    self._barrier,
+                ),
+                daemon=True,
+            )
+            for k in range(n_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    @property
+    def n_nodes(self) -> int:
+        return self.mind.n_nodes
+
+    def run_nodes(self) -> list[int]:
+        """
+        Load the nodes, and spill the ones that are full. See `ArrayMind.run_nodes`
+        Returns:
+            Names of the nodes that spilled, in the order of the graph
+        """
+        # Start, trickles exchanged, nodes spilled
+        for _ in range(3):
+            self._barrier.wait()
+        return self.mind.get_spilled_names()
+
+    def activate_node(self, n: int) -> None:
+        self.mind.activate_node(n)
+
+    def sleep(self, n_remakes: int, random_sleep: bool = False) -> None:
+        self.mind.sleep(n_remakes, random_sleep)
+
+    def reset_state(self) -> None:
+        self.mind.reset_state()
+
+    def copy(self) -> ArrayMind:
+        return self.mind.copy()
+
+    def copy_from(self, other: Any) -> None:
+        self.mind.copy_from(other)
+
+    def load_graph(self, graph: dict, reverse_graph: dict) -> None:
+        self.mind.load_graph(graph, reverse_graph)
+
+    def to_graph(self) -> tuple[Any, Any, Any]:
+        return self.mind.to_graph()
+
+    def get_statistics(self) -> dict[str, Any]:
+        return self.mind.get_statistics()
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory"""
+        if self.shared_memory is None:
+            return
+        self._command[0] = STOP
+        self._barrier.wait()
+        for worker in self.workers:
+            worker.join()
+        self.mind = self._exchange = self._command = None
+        self.shared_memory.close()
+        self.shared_memory.unlink()
+        self.shared_memory = None
+
+    def __enter__(self) -> PartitionedMind:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
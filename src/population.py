@@ -0,0 +1,191 @@
+from __future__ import annotations
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from .array_mind import STRUCTURE_VERSION, ArrayMind, get_nbytes
+
+# Header of the store: number of slots, number of nodes and edge slots of each mind
+HEADER_SIZE = 3
+
+
+class PopulationStore:
+    """
+    Population of minds stored in a single block of shared memory.
+
+    Every slot holds the array version of a mind (see `ArrayMind`)
+    and the state of its body (position and velocity). Any process can
+    attach to the store by its name, and read, simulate and write the
+    minds in place, so minds never need to be pickled to move between
+    processes. Cloning a mind into another slot is a copy of a slice
+    of the buffer.
+
+    The store does not lock anything: the coordinator is responsible
+    for not giving the same slot to two workers at the same time
+    """
+
+    def __init__(self, shared_memory: SharedMemory, n_slots: int, n_nodes: int, edge_capacity: int) -> None:
+        """
+        Use `create` or `attach` instead of this constructor
+
+        Args:
+            shared_memory: block of shared memory of the store
+            n_slots: number of minds in the store
+            n_nodes: number of nodes of every mind
+            edge_capacity: number of edge slots of every mind
+        """
+        self.shared_memory = shared_memory
+        self.n_slots = n_slots
+        self.n_nodes = n_nodes
+        self.edge_capacity = edge_capacity
+        self.mind_nbytes = get_nbytes(n_nodes, edge_capacity)
+
+        buffer = shared_memory.buf
+        offset = 8 * HEADER_SIZE
+        self.positions = np.ndarray((n_slots, 2), dtype=np.float64, buffer=buffer, offset=offset)
+        offset += self.positions.nbytes
+        self.velocities = np.ndarray((n_slots, 2), dtype=np.float64, buffer=buffer, offset=offset)
+        offset += self.velocities.nbytes
+        self.minds_offset = offset
+        self.minds = [
+            ArrayMind.from_buffer(buffer, n_nodes, edge_capacity, offset=self.get_offset(i))
+            for i in range(n_slots)
+        ]
+
+    @classmethod
+    def get_nbytes(cls, n_slots: int, n_nodes: int, edge_capacity: int) -> int:
+        """
+        Get the size of the shared memory of a store
+        Args:
+            n_slots: number of minds in the store
+            n_nodes: number of nodes of every mind
+            edge_capacity: number of edge slots of every mind
+        Returns:
+            Number of bytes
+        """
+        return 8 * HEADER_SIZE + 2 * 16 * n_slots + n_slots * get_nbytes(n_nodes, edge_capacity)
+
+    @classmethod
+    def create(cls, n_slots: int, n_nodes: int, edge_capacity: int, name: str = None) -> PopulationStore:
+        """
+        Create a new store
+        Args:
+            n_slots: number of minds in the store
+            n_nodes: number of nodes of every mind
+            edge_capacity: number of edge slots of every mind
+            name: name of the shared memory. Random if None
+        Returns:
+            New empty store
+        """
+        shared_memory = SharedMemory(
+            name=name,
+            create=True,
+            size=cls.get_nbytes(n_slots, n_nodes, edge_capacity),
+        )
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shared_memory.buf)
+        header[:] = (n_slots, n_nodes, edge_capacity)
+        del header
+        return cls(shared_memory, n_slots, n_nodes, edge_capacity)
+
+    @classmethod
+    def attach(cls, name: str) -> PopulationStore:
+        """
+        Attach to an existing store, e.g. from a worker process
+        Args:
+            name: name of the shared memory of the store
+        Returns:
+            Store that reads and writes the same memory
+        """
+        shared_memory = SharedMemory(name=name)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shared_memory.buf)
+        n_slots, n_nodes, edge_capacity = header.tolist()
+        del header
+        return cls(shared_memory, n_slots, n_nodes, edge_capacity)
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    def get_offset(self, i: int) -> int:
+        """
+        Args:
+            i: index of the slot
+        Returns:
+            Position of the mind of the slot in the buffer, in bytes
+        """
+        return self.minds_offset + i * self.mind_nbytes
+
+    def get_mind(self, i: int) -> ArrayMind:
+        """
+        Args:
+            i: index of the slot
+        Returns:
+            Mind of the slot. Its arrays are views of the shared memory
+        """
+        return self.minds[i]
+
+    def store(self, i: int, mind: Any) -> None:
+        """
+        Write a mind in a slot
+        Args:
+            i: index of the slot
+            mind: `ArrayMind` or `StynkerMind` with `n_nodes` nodes
+        """
+        if isinstance(mind, ArrayMind):
+            self.minds[i].copy_from(mind)
+        else:
+            mind.sync_from_engine()
+            self.minds[i].load_graph(mind.graph, mind.reverse_graph)
+        self.positions[i] = getattr(mind, "position", (0, 0))
+        self.velocities[i] = getattr(mind, "velocity_vector", (0, 0))
+
+    def clone(self, source: int, destination: int) -> None:
+        """
+        Copy the mind and the body of a slot into another one
+        Args:
+            source: index of the slot to copy
+            destination: index of the slot to overwrite
+        """
+        if source == destination:
+            return
+        destination_version = int(self.minds[destination].counters[STRUCTURE_VERSION])
+        buffer = self.shared_memory.buf
+        start = self.get_offset(source)
+        new_start = self.get_offset(destination)
+        buffer[new_start:new_start + self.mind_nbytes] = buffer[start:start + self.mind_nbytes]
+        # Use a version that the views of the destination have not seen,
+        # so they drop what they cached about its edges
+        counters = self.minds[destination].counters
+        counters[STRUCTURE_VERSION] = max(counters[STRUCTURE_VERSION], destination_version) + 1
+        self.positions[destination] = self.positions[source]
+        self.velocities[destination] = self.velocities[source]
+
+    def load_body(self, i: int, stynker: Any) -> None:
+        """
+        Move a Stynker to the position and velocity of a slot
+        Args:
+            i: index of the slot
+            stynker: instance of `Stynker`
+        """
+        stynker.position = tuple(self.positions[i].tolist())
+        stynker.velocity_vector = tuple(self.velocities[i].tolist())
+
+    def save_body(self, i: int, stynker: Any) -> None:
+        """
+        Save the position and velocity of a Stynker in a slot
+        Args:
+            i: index of the slot
+            stynker: instance of `Stynker`
+        """
+        self.positions[i] = stynker.position
+        self.velocities[i] = stynker.velocity_vector
+
+    def close(self) -> None:
+        """Detach from the shared memory. The minds can not be used after this"""
+        self.minds = self.positions = self.velocities = None
+        self.shared_memory.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory. Call it once, from the process that created the store"""
+        self.shared_memory.unlink()
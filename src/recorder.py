@@ -0,0 +1,191 @@
+from __future__ import annotations
+from typing import Iterable, Iterator
+
+import numpy as np
+
+# Header of the spike files: magic string, version and number of nodes
+MAGIC = b"STKSPIKE"
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("n_nodes", "<u4")])
+VERSION = 1
+
+PERIOD_CODES = {"wake": 0, "dream": 1, "sleep": 2}
+PERIOD_NAMES = {code: name for name, code in PERIOD_CODES.items()}
+
+
+def get_row_dtype(n_nodes: int) -> np.dtype:
+    """
+    Get the type of the rows of a spike file
+    Args:
+        n_nodes: number of nodes of the recorded mind
+    Returns:
+        Structured type with the period, the cycle and the
+        bit-packed spill mask (one bit per node)
+    """
+    return np.dtype([
+        ("period", "u1"),
+        ("cycle", "<u8"),
+        ("mask", "u1", ((n_nodes + 7) // 8,)),
+    ])
+
+
+class SpikeRecorder:
+    """
+    Record which nodes spill in each cycle.
+
+    Each cycle is stored as a row with the period, the cycle and the
+    spill mask packed with `np.packbits`, so a cycle costs
+    `n_nodes / 8` bytes (plus 9 bytes for the tags). Rows are buffered
+    in chunks of `chunk_size` cycles and appended to the file, so the
+    memory used does not grow with the length of the run
+    """
+
+    def __init__(self, path: str, n_nodes: int, chunk_size: int = 4096) -> None:
+        """
+
+        Args:
+            path: file to write. It is overwritten
+            n_nodes: number of nodes of the recorded mind. Nodes are
+                identified by their name, from 0 to `n_nodes` - 1
+            chunk_size: number of cycles to buffer before writing
+        """
+        self.path = path
+        self.n_nodes = n_nodes
+        self.row_dtype = get_row_dtype(n_nodes)
+        self._chunk = np.zeros(chunk_size, dtype=self.row_dtype)
+        self._n_buffered = 0
+        self._mask = np.zeros(n_nodes, dtype=bool)
+        self.n_rows = 0
+
+        header = np.array([(MAGIC, VERSION, n_nodes)], dtype=HEADER_DTYPE)
+        self._file = open(path, "wb")
+        self._file.write(header.tobytes())
+
+    def record(self, period: str, cycle: int, spilled_names: Iterable[int]) -> None:
+        """
+        Save the nodes that spilled in a cycle
+        Args:
+            period: name of the current period
+            cycle: number of the current cycle
+            spilled_names: names of the nodes that spilled
+        """
+        self._mask[:] = False
+        self._mask[list(spilled_names)] = True
+        row = self._chunk[self._n_buffered]
+        row["period"] = PERIOD_CODES[period]
+        row["cycle"] = cycle
+        row["mask"] = np.packbits(self._mask)
+        self._n_buffered += 1
+        self.n_rows += 1
+        if self._n_buffered == len(self._chunk):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered cycles to the file"""
+        self._file.write(self._chunk[:self._n_buffered].tobytes())
+        self._file.flush()
+        self._n_buffered = 0
+
+    def close(self) -> None:
+        """Write the buffered cycles and close the file"""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> SpikeRecorder:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class SpikeRaster:
+    """
+    Read a file written by `SpikeRecorder`.
+
+    The rows are memory-mapped, and every statistic is computed
+    streaming over chunks of rows, so the whole run is never
+    unpacked in memory
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+
+        Args:
+            path: file written by a `SpikeRecorder`
+        """
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header["magic"][0] != MAGIC:
+            raise ValueError(f"{path} is not a spike file")
+        self.path = path
+        self.n_nodes = int(header["n_nodes"][0])
+        self.rows = np.memmap(
+            path,
+            dtype=get_row_dtype(self.n_nodes),
+            mode="r",
+            offset=HEADER_DTYPE.itemsize,
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def iter_chunks(
+        self,
+        period: str = None,
+        chunk_size: int = 65536,
+    ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Iterate over the recorded cycles in chunks
+        Args:
+            period: if given, only yield the cycles of this period
+            chunk_size: number of rows to read at a time
+        Returns:
+            Iterator of (cycles, spill matrix) where the spill matrix is a
+            boolean array of shape (number of cycles, `n_nodes`)
+        """
+        for start in range(0, len(self.rows), chunk_size):
+            rows = self.rows[start:start + chunk_size]
+            if period is not None:
+                rows = rows[rows["period"] == PERIOD_CODES[period]]
+            spills = np.unpackbits(rows["mask"], axis=1, count=self.n_nodes).astype(bool)
+            yield np.asarray(rows["cycle"]), spills
+
+    def get_spills(self, i: int) -> np.ndarray:
+        """
+        Get the names of the nodes that spilled in the i-th recorded cycle
+        Args:
+            i: index of the row
+        Returns:
+            Array with the names of the nodes that spilled
+        """
+        mask = np.unpackbits(self.rows[i]["mask"], count=self.n_nodes)
+        return np.flatnonzero(mask)
+
+    def firing_rates(self, period: str = None) -> np.ndarray:
+        """
+        Get the fraction of cycles in which each node spilled
+        Args:
+            period: if given, only use the cycles of this period
+        Returns:
+            Array with one rate per node
+        """
+        counts = np.zeros(self.n_nodes, dtype=np.int64)
+        n_cycles = 0
+        for _, spills in self.iter_chunks(period):
+            counts += spills.sum(axis=0)
+            n_cycles += len(spills)
+        return counts / max(n_cycles, 1)
+
+    def coactivation(self, period: str = None) -> np.ndarray:
+        """
+        Count in how many cycles each pair of nodes spilled together
+        Args:
+            period: if given, only use the cycles of this period
+        Returns:
+            Matrix of shape (`n_nodes`, `n_nodes`). The diagonal has the
+            number of spills of each node
+        """
+        counts = np.zeros((self.n_nodes, self.n_nodes), dtype=np.int64)
+        for _, spills in self.iter_chunks(period):
+            spills = spills.astype(np.int64)
+            counts += spills.T @ spills
+        return counts
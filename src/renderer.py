@@ -0,0 +1,157 @@
+from __future__ import annotations
+import threading
+import time
+import turtle
+from typing import Iterable
+
+from .environment import Environment
+
+
+class Renderer(threading.Thread):
+    """
+    Thread that draws the environment and the Stynkers at a fixed
+    frame rate.
+
+    The simulation loop never talks to Tk: it only replaces plain
+    tuples (`Stynker.position`, `Renderer.stats`), and this thread
+    reads whatever is there when a frame is due. Frames are dropped
+    if the renderer falls behind, and positions visited between two
+    frames are not drawn
+    """
+
+    def __init__(
+        self,
+        environment: Environment,
+        stynkers: Iterable,
+        fps: float = 30,
+        width: int = 960,
+        height: int = 960,
+    ) -> None:
+        """
+
+        Args:
+            environment: environment whose borders are drawn
+            stynkers: Stynkers to draw. Only their `position`, `n_resets`,
+                `color` and `show_route` attributes are read
+            fps: number of frames per second to draw
+            width: width of the window
+            height: height of the window
+        """
+        super().__init__(name="renderer", daemon=True)
+        self.environment = environment
+        self.stynkers = list(stynkers)
+        self.frame_time = 1 / fps
+        self.width = width
+        self.height = height
+        # Latest (num_run_cycles, cnt_win, cnt_lose) published by the
+        # simulation loop. Replaced as a whole, so it is never torn
+        self.stats = (0, 0, 0)
+        self.n_frames = 0
+        self.n_dropped_frames = 0
+        self._stop_event = threading.Event()
+
+    def publish_stats(self, num_run_cycles: int, cnt_win: int, cnt_lose: int) -> None:
+        """
+        Update the numbers shown in the overlay. Safe to call from
+        the simulation thread in every cycle
+        Args:
+            num_run_cycles: number of wake cycles run so far
+            cnt_win: number of wins so far
+            cnt_lose: number of losses so far
+        """
+        self.stats = (num_run_cycles, cnt_win, cnt_lose)
+
+    def stop(self) -> None:
+        """Ask the thread to finish after the current frame"""
+        self._stop_event.set()
+
+    def run(self) -> None:
+        """Create the window and draw frames until `stop` is called"""
+        # Every Tk object is created here, so Tk is only used from this thread
+        window = turtle.Screen()
+        window.setup(self.width, self.height)
+        window.tracer(0)
+        self.environment.draw_borders()
+
+        bodies = [self._make_body(stk) for stk in self.stynkers]
+        overlay = turtle.Turtle()
+        overlay.hideturtle()
+        overlay.penup()
+        overlay.setposition(-self.width / 2 + 20, self.height / 2 - 40)
+
+        last_stats = self.stats
+        last_time = time.perf_counter()
+        cycles_per_second = 0.0
+        next_frame = last_time
+        try:
+            while not self._stop_event.is_set():
+                for stk, body in zip(self.stynkers, bodies):
+                    self._draw_body(stk, body)
+
+                now = time.perf_counter()
+                stats = self.stats
+                if now - last_time >= 1:
+                    cycles_per_second = (stats[0] - last_stats[0]) / (now - last_time)
+                    last_stats, last_time = stats, now
+                overlay.clear()
+                overlay.write(
+                    f"Cycles/sec: {cycles_per_second:.0f}  "
+                    f"Wins: {stats[1]}  Losses: {stats[2]}",
+                    font=("Arial", 14, "normal"),
+                )
+                window.update()
+                self.n_frames += 1
+
+                next_frame += self.frame_time
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Behind schedule: skip the missed frames instead of
+                    # trying to catch up
+                    self.n_dropped_frames += int(-delay / self.frame_time)
+                    next_frame = time.perf_counter()
+        except (turtle.Terminator, turtle.TK.TclError):
+            # The window was closed by the user
+            pass
+
+    @staticmethod
+    def _make_body(stk) -> list[turtle.Turtle, int]:
+        """
+        Create the turtle that represents a Stynker
+        Args:
+            stk: Stynker to represent
+        Returns:
+            The turtle, and the number of resets of `stk` already drawn
+        """
+        body = turtle.Turtle()
+        body.shape("circle")
+        body.color(stk.color)
+        body.penup()
+        body.setposition(*stk.position)
+        if stk.show_route:
+            body.pendown()
+        return [body, stk.n_resets]
+
+    @staticmethod
+    def _draw_body(stk, body: list[turtle.Turtle, int]) -> None:
+        """
+        Move the turtle of a Stynker to its latest position
+        Args:
+            stk: Stynker to draw
+            body: turtle that represents `stk` and number of resets
+                already drawn. Updated in place
+        """
+        drawer, n_resets = body
+        position = stk.position
+        current_resets = stk.n_resets
+        if current_resets != n_resets:
+            # The position may have been read just before the reset, so
+            # the pen stays up until the next frame
+            drawer.penup()
+            drawer.setposition(*position)
+            body[1] = current_resets
+        else:
+            drawer.setposition(*position)
+            if stk.show_route and not drawer.isdown():
+                drawer.pendown()
@@ -0,0 +1,461 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from random import getrandbits
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+# Header of the chunk files: magic string, version and number of rows.
+# The columns follow, one after the other, in the order of `COLUMNS`
+MAGIC = b"STKRSLTS"
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("n_rows", "<u4")])
+VERSION = 1
+
+# Columns of the store. All of them take 8 bytes per row
+COLUMNS = (
+    ("run_id", "<u8"),
+    ("parameter_hash", "<u8"),
+    ("cycle", "<u8"),
+    ("wins", "<u8"),
+    ("losses", "<u8"),
+    ("ratio", "<f8"),
+    ("throughput", "<f8"),
+)
+ROW_DTYPE = np.dtype(list(COLUMNS))
+
+# Columns computed from the stored ones. See `get_column`
+DERIVED_COLUMNS = ("win_rate",)
+
+# One record per chunk, used to skip the chunks that cannot match a scan.
+# `hash_mask` has the bit `hash % 64` set for every parameter hash in the chunk
+INDEX_DTYPE = np.dtype([
+    ("chunk", "S40"),
+    ("n_rows", "<u4"),
+    ("padding", "<u4"),
+    ("run_id_min", "<u8"),
+    ("run_id_max", "<u8"),
+    ("cycle_min", "<u8"),
+    ("cycle_max", "<u8"),
+    ("hash_mask", "<u8"),
+])
+
+
+def get_parameter_hash(parameters: dict[str, Any]) -> int:
+    """
+    Get a number that identifies a set of parameters
+    Args:
+        parameters: parameters of a run
+    Returns:
+        First 8 bytes of the SHA-256 of the parameters, as an integer
+    """
+    encoded = json.dumps(parameters, sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.sha256(encoded).digest()[:8], "little")
+
+
+def get_hash_mask(parameter_hashes: Iterable[int]) -> int:
+    """
+    Args:
+        parameter_hashes: parameter hashes
+    Returns:
+        Mask with the bit `hash % 64` set for each hash. See `INDEX_DTYPE`
+    """
+    mask = 0
+    for parameter_hash in parameter_hashes:
+        mask |= 1 << (int(parameter_hash) % 64)
+    return mask
+
+
+def append_to_file(path: str, data: bytes) -> None:
+    """
+    Append data to a file with a single write, so the writes of
+    several processes are never mixed
+    Args:
+        path: file to write
+        data: bytes to append
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+class ResultsStore:
+    """
+    Results of many runs in a single directory, stored by columns.
+
+    Rows (see `COLUMNS`) are buffered and written in chunks: one file
+    per chunk, with each column stored contiguously, and one record per
+    chunk in an append-only index with the range of runs and cycles it
+    contains. The parameters of each run are kept in `runs.jsonl`.
+    Files are only appended or created, never modified, so several
+    processes can write to the same store.
+
+    Scans read only the columns they need, from the chunks that can
+    match, so the store never has to be loaded in memory
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 65536) -> None:
+        """
+
+        Args:
+            directory: directory of the store. It is created if it does not exist
+            chunk_size: number of rows to buffer before writing a chunk
+        """
+        self.directory = directory
+        self.chunks_directory = os.path.join(directory, "chunks")
+        self.index_path = os.path.join(directory, "index.bin")
+        self.runs_path = os.path.join(directory, "runs.jsonl")
+        os.makedirs(self.chunks_directory, exist_ok=True)
+        self._chunk = np.zeros(chunk_size, dtype=ROW_DTYPE)
+        self._n_buffered = 0
+        self._n_chunks_written = 0
+        # Parameter hash of the runs started by this instance
+        self._parameter_hashes = dict()
+
+    def start_run(self, parameters: dict[str, Any], run_id: int = None) -> int:
+        """
+        Register a new run
+        Args:
+            parameters: parameters of the run. They must be JSON serializable
+            run_id: id of the run. By default, a random one
+        Returns:
+            Id of the run
+        """
+        if run_id is None:
+            run_id = getrandbits(63)
+        parameter_hash = get_parameter_hash(parameters)
+        record = {
+            "run_id": run_id,
+            "parameter_hash": parameter_hash,
+            "timestamp": time.time(),
+            "parameters": parameters,
+        }
+        append_to_file(self.runs_path, (json.dumps(record, default=str) + "\n").encode())
+        self._parameter_hashes[run_id] = parameter_hash
+        return run_id
+
+    def continue_run(self, run_id: int, parameters: dict[str, Any]) -> int:
+        """
+        Add rows to a run started before, e.g. by a process that was
+        stopped. The run is not registered again
+        Args:
+            run_id: id of the run, see `start_run`
+            parameters: parameters of the run
+        Returns:
+            Id of the run
+        """
+        self._parameter_hashes[run_id] = get_parameter_hash(parameters)
+        return run_id
+
+    def append(
+        self,
+        run_id: int,
+        cycle: int,
+        wins: int,
+        losses: int,
+        ratio: float,
+        throughput: float,
+    ) -> None:
+        """
+        Add a row
+        Args:
+            run_id: id of the run, see `start_run`
+            cycle: number of the cycle
+            wins: number of wins until the cycle
+            losses: number of losses until the cycle
+            ratio: wins / losses, or -1 if there are no losses
+            throughput: cycles per second since the previous row of the run
+        """
+        row = self._chunk[self._n_buffered]
+        row["run_id"] = run_id
+        row["parameter_hash"] = self._parameter_hashes[run_id]
+        row["cycle"] = cycle
+        row["wins"] = wins
+        row["losses"] = losses
+        row["ratio"] = ratio
+        row["throughput"] = throughput
+        self._n_buffered += 1
+        if self._n_buffered == len(self._chunk):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows as a new chunk"""
+        n_rows = self._n_buffered
+        if n_rows == 0:
+            return
+        rows = self._chunk[:n_rows]
+        name = f"{time.time_ns():x}_{os.getpid():x}_{self._n_chunks_written}.bin"
+        path = os.path.join(self.chunks_directory, name)
+        # Write to a temporary file first, so readers never see half a chunk
+        temporary_path = f"{path}.tmp"
+        header = np.array([(MAGIC, VERSION, n_rows)], dtype=HEADER_DTYPE)
+        with open(temporary_path, "wb") as f:
+            f.write(header.tobytes())
+            for column, _ in COLUMNS:
+                f.write(np.ascontiguousarray(rows[column]).tobytes())
+        os.replace(temporary_path, path)
+
+        record = np.array([(
+            name,
+            n_rows,
+            0,
+            rows["run_id"].min(),
+            rows["run_id"].max(),
+            rows["cycle"].min(),
+            rows["cycle"].max(),
+            get_hash_mask(np.unique(rows["parameter_hash"]).tolist()),
+        )], dtype=INDEX_DTYPE)
+        append_to_file(self.index_path, record.tobytes())
+        self._n_chunks_written += 1
+        self._n_buffered = 0
+
+    def close(self) -> None:
+        """Write the buffered rows"""
+        self.flush()
+
+    def __enter__(self) -> ResultsStore:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def get_index(self) -> np.ndarray:
+        """
+        Returns:
+            Records of the chunks written so far, see `INDEX_DTYPE`
+        """
+        if not os.path.isfile(self.index_path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        # Ignore a record that is still being written
+        count = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+        return np.fromfile(self.index_path, dtype=INDEX_DTYPE, count=count)
+
+    def get_runs(self, **parameters) -> list[dict[str, Any]]:
+        """
+        Get the runs with some parameters
+        Args:
+            **parameters: values that the parameters of the runs must have
+        Returns:
+            Records of the runs, with their id, parameter hash, timestamp and parameters
+        """
+        if not os.path.isfile(self.runs_path):
+            return list()
+        runs = list()
+        with open(self.runs_path) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # Still being written
+                    break
+                run = json.loads(line)
+                if all(run["parameters"].get(key) == val for key, val in parameters.items()):
+                    runs.append(run)
+        return runs
+
+    def read_chunk(self, name: str, columns: Iterable[str]) -> dict[str, np.ndarray]:
+        """
+        Map some columns of a chunk
+        Args:
+            name: name of the chunk file
+            columns: names of the columns to read
+        Returns:
+            Dictionary with a read-only array per column
+        """
+        path = os.path.join(self.chunks_directory, name)
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header["magic"][0] != MAGIC or header["version"][0] != VERSION:
+            raise ValueError(f"{path} is not a results chunk of version {VERSION}")
+        n_rows = int(header["n_rows"][0])
+        offsets = dict()
+        offset = HEADER_DTYPE.itemsize
+        for column, dtype in COLUMNS:
+            offsets[column] = (offset, dtype)
+            offset += n_rows * np.dtype(dtype).itemsize
+        return {
+            column: np.memmap(path, dtype=offsets[column][1], mode="r", offset=offsets[column][0], shape=(n_rows,))
+            for column in columns
+        }
+
+    def scan(
+        self,
+        columns: Iterable[str] = None,
+        run_ids: Iterable[int] = None,
+        cycle_range: tuple[int, int] = None,
+        **parameters,
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Iterate over the rows that match some filters, one chunk at a time
+        Args:
+            columns: columns to read, including the ones in `DERIVED_COLUMNS`.
+                By default, all the stored ones
+            run_ids: if given, only the rows of these runs
+            cycle_range: if given, only the rows with a cycle in [first, last]
+            **parameters: if given, only the rows of the runs with these parameters
+        Returns:
+            Iterator of dictionaries with an array per column
+        """
+        columns = list(columns or [column for column, _ in COLUMNS])
+        if parameters:
+            runs = self.get_runs(**parameters)
+            selected = {run["run_id"] for run in runs}
+            run_ids = selected if run_ids is None else selected & set(run_ids)
+            hash_mask = get_hash_mask(run["parameter_hash"] for run in runs)
+        else:
+            hash_mask = None
+        if run_ids is not None:
+            run_ids = np.array(sorted(run_ids), dtype=np.uint64)
+            if len(run_ids) == 0:
+                return
+
+        stored_columns = set()
+        for column in columns:
+            stored_columns.update(("wins", "losses") if column == "win_rate" else (column,))
+        if run_ids is not None:
+            stored_columns.add("run_id")
+        if cycle_range is not None:
+            stored_columns.add("cycle")
+
+        for record in self.get_index():
+            # Skip the chunks that cannot have matching rows
+            if hash_mask is not None and not int(record["hash_mask"]) & hash_mask:
+                continue
+            if run_ids is not None and (run_ids[-1] < record["run_id_min"] or run_ids[0] > record["run_id_max"]):
+                continue
+            if cycle_range is not None and (
+                cycle_range[1] < record["cycle_min"] or cycle_range[0] > record["cycle_max"]
+            ):
+                continue
+
+            arrays = self.read_chunk(record["chunk"].decode(), stored_columns)
+            selected = np.ones(int(record["n_rows"]), dtype=bool)
+            if run_ids is not None:
+                selected &= np.isin(arrays["run_id"], run_ids)
+            if cycle_range is not None:
+                cycle = arrays["cycle"]
+                selected &= (cycle >= cycle_range[0]) & (cycle <= cycle_range[1])
+            if not selected.any():
+                continue
+            yield {column: self.get_column(arrays, column)[selected] for column in columns}
+
+    @staticmethod
+    def get_column(arrays: dict[str, np.ndarray], column: str) -> np.ndarray:
+        """
+        Get a stored or a derived column
+        Args:
+            arrays: stored columns of a chunk
+            column: name of the column. `win_rate` is wins / (wins + losses),
+                or NaN if there are none
+        Returns:
+            Array with the values of the column
+        """
+        if column == "win_rate":
+            wins = arrays["wins"].astype(np.float64)
+            total = wins + arrays["losses"]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(total > 0, wins / total, np.nan)
+        return np.asarray(arrays[column])
+
+    def select(self, columns: Iterable[str] = None, **filters) -> dict[str, np.ndarray]:
+        """
+        Get all the rows that match some filters. See `scan`
+        Args:
+            columns: columns to read
+            **filters: see `scan`
+        Returns:
+            Dictionary with an array per column
+        """
+        columns = list(columns or [column for column, _ in COLUMNS])
+        chunks = list(self.scan(columns, **filters))
+        if not chunks:
+            return {column: np.zeros(0, dtype=self.get_dtype(column)) for column in columns}
+        return {column: np.concatenate([chunk[column] for chunk in chunks]) for column in columns}
+
+    @staticmethod
+    def get_dtype(column: str) -> np.dtype:
+        """
+        Args:
+            column: name of a stored or a derived column
+        Returns:
+            Type of the values of the column
+        """
+        if column in DERIVED_COLUMNS:
+            return np.dtype(np.float64)
+        return ROW_DTYPE[column]
+
+    def aggregate_by_cycle(
+        self,
+        column: str,
+        bin_size: int = 1,
+        window: int = 1,
+        **filters,
+    ) -> dict[str, np.ndarray]:
+        """
+        Get the mean of a column over all the matching runs, as a
+        function of the cycle. Computed streaming over the chunks
+        Args:
+            column: column to aggregate, e.g. `win_rate`
+            bin_size: number of cycles grouped in each bin
+            window: number of bins of the rolling mean: each bin is averaged
+                with the bins of the `window` - 1 previous bin sizes that
+                have rows. With 1, each bin is averaged alone
+            **filters: see `scan`
+        Returns:
+            Dictionary with the first cycle of each bin (`cycle`), the
+            number of rows (`count`) and the `mean` and `std` of the column.
+            Rows where the column is NaN are ignored
+        """
+        partial = list()
+        for chunk in self.scan(["cycle", column], **filters):
+            values = chunk[column].astype(np.float64)
+            valid = ~np.isnan(values)
+            values = values[valid]
+            bins, inverse = np.unique(chunk["cycle"][valid] // bin_size, return_inverse=True)
+            partial.append((
+                bins,
+                np.bincount(inverse, minlength=len(bins)),
+                np.bincount(inverse, values, minlength=len(bins)),
+                np.bincount(inverse, values * values, minlength=len(bins)),
+            ))
+        if not partial:
+            empty = np.zeros(0)
+            return {"cycle": empty.astype(np.uint64), "count": empty.astype(np.int64), "mean": empty, "std": empty}
+
+        bins, inverse = np.unique(np.concatenate([p[0] for p in partial]), return_inverse=True)
+        count, total, squares = (
+            np.bincount(inverse, np.concatenate([p[k] for p in partial]), minlength=len(bins))
+            for k in (1, 2, 3)
+        )
+        if window > 1:
+            # Add to each bin the bins in the `window` - 1 bin sizes before it.
+            # Bins without rows are missing, so they are found by value
+            first = np.searchsorted(bins, bins - np.minimum(bins, window - 1))
+            last = np.arange(1, len(bins) + 1)
+            count, total, squares = (
+                np.concatenate([[0], np.cumsum(x)]) for x in (count, total, squares)
+            )
+            count, total, squares = (x[last] - x[first] for x in (count, total, squares))
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean * mean, 0))
+        return {"cycle": bins * bin_size, "count": count.astype(np.int64), "mean": mean, "std": std}
+
+    def import_json(self, path: str, parameters: dict[str, Any] = None) -> int:
+        """
+        Add a `results_<timestamp>.json` file written by `main.py`
+        Args:
+            path: file to read
+            parameters: parameters of the run, if they are known
+        Returns:
+            Id of the new run
+        """
+        with open(path) as f:
+            results = json.load(f)
+        results.pop("stop_reasons", None)
+        run_id = self.start_run(parameters or dict())
+        for cycle, (wins, losses, ratio) in sorted((int(cycle), val) for cycle, val in results.items()):
+            # The files do not have the throughput
+            self.append(run_id, cycle, wins, losses, ratio, float("nan"))
+        self.flush()
+        return run_id
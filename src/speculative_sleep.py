@@ -0,0 +1,221 @@
+from __future__ import annotations
+import copy
+import logging
+import math
+import os
+import random
+import struct
+import traceback
+from typing import Any
+
+from .environment import Environment
+from .interaction import InteractionInfo
+
+# Result written by each forked candidate: wins, losses and closest distance
+# to the winning segment, after `RESULT_TAG`. A candidate that fails writes
+# `ERROR_TAG` and its traceback instead
+RESULT_FORMAT = "<qqd"
+RESULT_TAG = b"R"
+ERROR_TAG = b"E"
+
+
+class SpeculativeSleep:
+    """
+    Sleep cycle that tries several remakes of the mind and keeps the best.
+
+    Each candidate is the regular sleep cycle (see `Stynker.sleep`) run
+    with its own seed, so candidates remake the nodes in different ways
+    (and remake different nodes if `random_sleep`). Every candidate
+    then runs `n_cycles` wake cycles from the current position and
+    velocity, alone in the environment. Its score is the number of wins
+    minus the number of losses and, as short runs rarely win or lose,
+    then how close it gets to the winning segment. The Stynker keeps the
+    candidate with the best score, the first one on ties, by running the
+    sleep cycle again with its seed.
+
+    The seeds are drawn from a generator of their own, seeded with a
+    single value of `random`. The state of `random` is restored after
+    the sleep cycle, so each speculative sleep advances it by that value
+    alone, whatever the candidate chosen.
+
+    Candidates run in forked processes, which see the Stynker through
+    copy-on-write memory, so nothing is copied or pickled. Minds whose
+    arrays are shared with other processes or with a file (the
+    partitioned and mapped engines) are replaced in the candidate by a
+    private `ArrayMind.copy`. Without `os.fork`, with a single worker,
+    or when forking is not allowed, candidates run one after the other
+    in the process, on clones of the Stynker with a copy of its mind.
+
+    Forking a process that runs other threads (e.g. the `Renderer`)
+    can leave the children with locks that are never released, so
+    `use_fork` must be False in those processes
+    """
+
+    def __init__(self, n_candidates: int, n_cycles: int, n_workers: int = None, use_fork: bool = True) -> None:
+        """
+
+        Args:
+            n_candidates: number of remakes to try in each sleep cycle
+            n_cycles: number of wake cycles used to score each remake
+            n_workers: maximum number of candidates run at the same time.
+                By default, one per CPU
+            use_fork: whether the candidates can run in forked processes
+        """
+        if n_candidates < 1:
+            raise ValueError("There must be at least one candidate")
+        self.n_candidates = n_candidates
+        self.n_cycles = n_cycles
+        self.n_workers = n_workers or os.cpu_count()
+        self.use_fork = use_fork and hasattr(os, "fork") and self.n_workers > 1
+        # Number of sleep cycles, and number of them where the
+        # chosen remake was not the first candidate
+        self.n_sleeps = 0
+        self.n_improved = 0
+
+    def run(self, stynker: Any) -> dict[str, Any]:
+        """
+        Run a sleep cycle of a Stynker, keeping the best of several remakes
+        Args:
+            stynker: Stynker in the sleep period
+        Returns:
+            Dictionary with the `scores` of the candidates and the index
+            of the `best` one
+        """
+        generator = random.Random(random.getrandbits(64))
+        seeds = [generator.getrandbits(32) for _ in range(self.n_candidates)]
+        if self.n_candidates == 1:
+            scores = [None]
+        elif self.use_fork:
+            scores = self.evaluate_forked(stynker, seeds)
+        else:
+            scores = self.evaluate_cloned(stynker, seeds)
+
+        # Candidates that failed (or were not run) have no score
+        best = max(
+            (i for i, score in enumerate(scores) if score is not None),
+            key=lambda i: scores[i],
+            default=0,
+        )
+        random_state = random.getstate()
+        random.seed(seeds[best])
+        stynker.sleep()
+        random.setstate(random_state)
+
+        self.n_sleeps += 1
+        if best != 0:
+            self.n_improved += 1
+        logging.debug(f"Cycle {stynker.current_cycle}, scores of the remakes: {scores}, best: {best}")
+        return {"scores": scores, "best": best}
+
+    def evaluate_forked(self, stynker: Any, seeds: list[int]) -> list[tuple[int, float]]:
+        """
+        Score the candidates in forked processes
+        Args:
+            stynker: Stynker in the sleep period
+            seeds: seed of each candidate
+        Returns:
+            Score of each candidate, see `get_score`. None if its process
+            failed, whose traceback is logged
+        """
+        scores = list()
+        for start in range(0, len(seeds), self.n_workers):
+            children = list()
+            for seed in seeds[start:start + self.n_workers]:
+                read_fd, write_fd = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    # Child: never return to the caller
+                    os.close(read_fd)
+                    status = 1
+                    try:
+                        with os.fdopen(write_fd, "wb") as f:
+                            try:
+                                result = struct.pack(RESULT_FORMAT, *self.simulate(stynker, seed))
+                                f.write(RESULT_TAG + result)
+                                status = 0
+                            except BaseException:
+                                f.write(ERROR_TAG + traceback.format_exc().encode())
+                    finally:
+                        os._exit(status)
+                os.close(write_fd)
+                children.append((pid, read_fd))
+
+            for pid, read_fd in children:
+                with os.fdopen(read_fd, "rb") as f:
+                    data = f.read()
+                _, status = os.waitpid(pid, 0)
+                if data[:1] == RESULT_TAG and len(data) == 1 + struct.calcsize(RESULT_FORMAT):
+                    scores.append(self.get_score(*struct.unpack(RESULT_FORMAT, data[1:])))
+                    continue
+                if data[:1] == ERROR_TAG:
+                    logging.warning(f"The process of a candidate remake failed:\n{data[1:].decode(errors='replace')}")
+                else:
+                    logging.warning(f"The process of a candidate remake failed with status {status}")
+                scores.append(None)
+        return scores
+
+    def evaluate_cloned(self, stynker: Any, seeds: list[int]) -> list[tuple[int, float]]:
+        """
+        Score the candidates in this process, on clones of the Stynker
+        Args:
+            stynker: Stynker in the sleep period
+            seeds: seed of each candidate
+        Returns:
+            Score of each candidate, see `get_score`
+        """
+        random_state = random.getstate()
+        scores = list()
+        for seed in seeds:
+            # The body is made of immutable values, apart from the
+            # interaction information, so a shallow copy is enough
+            clone = copy.copy(stynker)
+            clone.interaction_info = InteractionInfo()
+            if stynker.engine is not None:
+                clone.engine = getattr(stynker.engine, "mind", stynker.engine).copy()
+            else:
+                clone.graph, clone.reverse_graph, clone.nodes_dict = stynker.copy_graph()
+                clone._statistics = None
+            scores.append(self.get_score(*self.simulate(clone, seed)))
+        random.setstate(random_state)
+        return scores
+
+    @staticmethod
+    def get_score(wins: int, losses: int, closest: float) -> tuple[int, float]:
+        """
+        Args:
+            wins: number of wins of a candidate
+            losses: number of losses of a candidate
+            closest: closest distance to the winning segment
+        Returns:
+            Score of the candidate, higher is better
+        """
+        return wins - losses, -closest
+
+    def simulate(self, stynker: Any, seed: int) -> tuple[int, int, float]:
+        """
+        Run a candidate: the sleep cycle with its seed, and the wake
+        cycles. The Stynker is modified, so it must be a copy
+        Args:
+            stynker: copy of the Stynker in the sleep period
+            seed: seed of the candidate
+        Returns:
+            Number of wins and losses, and closest distance from the
+            center of the Stynker to the winning segment
+        """
+        if stynker.engine is not None and not getattr(stynker.engine, "owns_memory", False):
+            # The arrays are shared with other processes or a file
+            stynker.engine = getattr(stynker.engine, "mind", stynker.engine).copy()
+        stynker.spike_recorder = None
+        stynker.speculative_sleep = None
+        random.seed(seed)
+        stynker.sleep()
+
+        winning_segment = stynker.environment.winning_segment
+        closest = math.inf
+
+        def update_closest(*_) -> None:
+            nonlocal closest
+            closest = min(closest, Environment.distance_to_segment(*stynker.position, *winning_segment))
+
+        wins, losses = stynker.run_schedule([("wake", self.n_cycles)], on_cycle=update_closest)
+        return wins, losses, closest
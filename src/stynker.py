@@ -1,17 +1,22 @@
 from __future__ import annotations
+import hashlib
 import json
 import logging
 import math
 import pickle
-import turtle
 from collections import defaultdict
-from copy import deepcopy
-from random import choice, randint, sample
+from copy import copy, deepcopy
+from random import choice, getrandbits, randint, sample
 
-from .environment import Environment
+import numpy as np
+
+from . import kernels
+from .environment import MAX_BOUNCES, Environment
+from .graph_statistics import GraphStatistics
+from .interaction import InteractionInfo
 from .node import Node
 from .edge import Edge
-from typing import Iterable, Tuple, Dict, Any, Union
+from typing import Callable, Iterable, Optional, Tuple, Dict, Any, Union
 from constants import edge_constants, node_constants
 
 
@@ -51,8 +56,6 @@ class StynkerMind:
             n_input = 0
             n_output = 0
             self.graph = defaultdict(set)
-            # Create reverse graph
-            self.create_reverse_graph()
 
             for node, edges in graph.items():
                 node = Node.from_keys(node)
@@ -72,6 +75,9 @@ class StynkerMind:
         self.random_sleep = random_sleep
         self.current_cycle = current_cycle
         self.reverse_graph: defaultdict = defaultdict(set)  # Node -> {set of Nodes}
+        if graph is not None:
+            # Create reverse graph
+            self.create_reverse_graph()
 
         # Input/output logic
         self.n_input = n_input
@@ -79,6 +85,17 @@ class StynkerMind:
         self.kick_dictionary = dict()
         self.input_points = dict()
 
+        # Optional `SpikeRecorder` to save which nodes spill in each cycle
+        self.spike_recorder = None
+
+        # Optional engine that runs the nodes instead of the `Node`/`Edge`
+        # objects, e.g. an `ArrayMind`. See `attach_engine`
+        self.engine = None
+
+        # `GraphStatistics` of the graph. Built the first time they are
+        # needed, and then updated with the graph. See `get_statistics`
+        self._statistics = None
+
         if (self.n_input + self.n_output) > self.n_nodes:
             raise ValueError(
                 "The total number of nodes must be greater or equal"
@@ -98,6 +115,7 @@ class StynkerMind:
             )
 
         # Make graph
+        node_types = list()
         for i in range(self.n_nodes):
             # Mark first `n_input` nodes as input
             if i in range(self.n_input):
@@ -127,22 +145,78 @@ class StynkerMind:
             else:
                 node_type = "regular"
 
-            # Update nodes_dict if a graph is not given
-            if graph is None:
-                node = Node(
-                    name=i,
-                    size=randint(*node_constants["size_range"]),
-                    endo=randint(*node_constants["endo_range"]),
-                    duration=randint(*node_constants["endo_range"]),
-                    node_type=node_type,
-                )
-                self.graph[node] = set()
-                self.nodes_dict[i] = node
+            node_types.append(node_type)
 
-        # Make random outcoming edges if a graph is not given
-        if graph is not None:
-            for node in self.graph.keys():
-                self.make_random_outcoming_edges(node)
+        # Make random nodes and outcoming edges if a graph is not given
+        if graph is None:
+            self.make_random_graph(node_types)
+
+    def make_random_graph(self, node_types: list[str]) -> None:
+        """
+        Create the nodes, and random outcoming edges from each one.
+        The parameters of all the nodes and edges are drawn at once
+        with NumPy, from the same ranges as `Node.remake` and
+        `make_random_outcoming_edges`. The generator is seeded from
+        the `random` module, so `random.seed` still makes it reproducible
+        Args:
+            node_types: type of each node. Nodes are named by their index
+        """
+        rng = np.random.default_rng(getrandbits(64))
+        n_nodes = len(node_types)
+
+        def draw(value_range: tuple[int, int], n: int) -> np.ndarray:
+            # Same values as `randint`, with both ends included
+            low, high = value_range
+            return rng.integers(low, high + 1, n)
+
+        sizes = draw(node_constants["size_range"], n_nodes).tolist()
+        endos = draw(node_constants["endo_range"], n_nodes).tolist()
+        durations = draw(node_constants["duration_range"], n_nodes).tolist()
+        nodes = [
+            Node(name=i, size=size, endo=endo, duration=duration, node_type=node_type)
+            for i, (size, endo, duration, node_type) in enumerate(zip(sizes, endos, durations, node_types))
+        ]
+        for node in nodes:
+            self.nodes_dict[node.name] = node
+        if n_nodes < 2:
+            for node in nodes:
+                self.graph[node] = set()
+            return
+
+        n_edges = draw(edge_constants["n_edges_range"], n_nodes)
+        sources = np.repeat(np.arange(n_nodes), n_edges)
+        # Any node except the source, as `get_random_node`
+        destinations = rng.integers(0, n_nodes - 1, len(sources))
+        destinations += destinations >= sources
+        weights = draw(edge_constants["weight_range"], len(sources))
+        lengths = draw(edge_constants["length_range"], len(sources))
+        # Adding an Edge to a node that already has one to the same
+        # destination does nothing, so only the first one is kept
+        _, first = np.unique(sources * n_nodes + destinations, return_index=True)
+        first.sort()
+        sources = sources[first]
+        destinations = destinations[first]
+
+        # Build the sets of each node at once, from the edges sorted by source
+        edges = [
+            Edge(nodes[destination], weight, length)
+            for destination, weight, length in zip(
+                destinations.tolist(),
+                weights[first].tolist(),
+                lengths[first].tolist(),
+            )
+        ]
+        bounds = np.searchsorted(sources, np.arange(n_nodes + 1)).tolist()
+        for i, node in enumerate(nodes):
+            self.graph[node] = set(edges[bounds[i]:bounds[i + 1]])
+
+        # Same for the reverse graph, sorting the edges by destination
+        order = np.argsort(destinations, kind="stable")
+        source_nodes = [nodes[source] for source in sources[order].tolist()]
+        bounds = np.searchsorted(destinations[order], np.arange(n_nodes + 1)).tolist()
+        for i, node in enumerate(nodes):
+            if bounds[i] < bounds[i + 1]:
+                self.reverse_graph[node] = set(source_nodes[bounds[i]:bounds[i + 1]])
 
     def create_reverse_graph(self):
         """From a current graph, create the reverse graph"""
@@ -183,12 +257,101 @@ class StynkerMind:
                 node.increase_level(node.size)
                 node.deactivate()
 
+    def spill_nodes(self) -> list[Node]:
+        """
+        Spill the nodes that are full, and load their outcoming
+        edges with trickles
+        Returns:
+            List with the nodes that spilled, in the order of the graph
+        """
+        spilled_nodes = list()
+        for node in self.get_nodes():
+            # Check if the node is full
+            if node.is_full():
+                # Spill full nodes
+                node.spill()
+                spilled_nodes.append(node)
+                for edge in self.graph[node]:
+                    # Load edges with trickles
+                    edge.load()
+        return spilled_nodes
+
+    def run_nodes(self) -> list[int]:
+        """
+        Load the nodes and spill the ones that are full, using
+        the engine if there is one attached
+        Returns:
+            Names of the nodes that spilled, in the order of the graph
+        """
+        if self.engine is not None:
+            spilled_names = self.engine.run_nodes()
+        else:
+            self.load_nodes()
+            spilled_names = [node.name for node in self.spill_nodes()]
+
+        if self.spike_recorder is not None:
+            self.spike_recorder.record(self.period, self.current_cycle, spilled_names)
+        return spilled_names
+
+    def attach_engine(self, engine: Any) -> None:
+        """
+        Run the nodes with an engine instead of the `Node`/`Edge` objects.
+        The engine must implement `run_nodes`, `activate_node`, `sleep`,
+        `reset_state`, `copy_from`, `to_graph` and `get_statistics`
+        (see `ArrayMind`).
+
+        While the engine is attached, `graph`, `reverse_graph` and
+        `nodes_dict` are not updated. Use `sync_from_engine` to update them
+        Args:
+            engine: engine created from this mind, e.g. `ArrayMind.from_mind(self)`
+        """
+        self.engine = engine
+
+    def detach_engine(self) -> None:
+        """
+        Update the `Node`/`Edge` objects from the engine, and stop using it.
+        Engines with resources (e.g. `PartitionedMind`) are closed
+        """
+        if self.engine is not None:
+            self.sync_from_engine()
+            if hasattr(self.engine, "close"):
+                self.engine.close()
+            self.engine = None
+
+    def sync_from_engine(self) -> None:
+        """
+        Update `graph`, `reverse_graph` and `nodes_dict` from the engine.
+        The statistics of the engine, if it keeps them, describe the same
+        structure, so they are copied instead of built again
+        """
+        if self.engine is not None:
+            self.graph, self.reverse_graph, self.nodes_dict = self.engine.to_graph()
+            statistics = getattr(getattr(self.engine, "mind", self.engine), "_statistics", None)
+            self._statistics = statistics.copy() if statistics is not None else None
+
+    def get_statistics(self) -> dict[str, Any]:
+        """
+        Get statistics of the structure of the mind. They are kept up
+        to date as the mind changes, so this is cheap even for big minds.
+        See `GraphStatistics.snapshot`
+        Returns:
+            Dictionary with the statistics
+        """
+        if self.engine is not None:
+            return self.engine.get_statistics()
+        if self._statistics is None:
+            self._statistics = GraphStatistics.from_graph(self.graph)
+        return self._statistics.snapshot()
+
     def activate_node(self, n: int) -> None:
         """
         Mark a given node as active if it is input or output
         Args:
             n: name of the node to activate
         """
+        if self.engine is not None:
+            self.engine.activate_node(n)
+            return
         node = self.nodes_dict[n]
         node.activate()
 
@@ -197,6 +360,69 @@ class StynkerMind:
         for node in self.get_nodes():
             node.damage = 0
 
+    def reset_state(self) -> None:
+        """
+        Empty the nodes and the edges: set levels and damage to 0,
+        deactivate the nodes and remove the trickles on their way
+        """
+        if self.engine is not None:
+            self.engine.reset_state()
+            return
+        for node, edges in self.graph.items():
+            node.level = 0
+            node.damage = 0
+            node.is_active = False
+            for edge in edges:
+                edge.next_steps = ()
+
+    def structural_hash(self) -> str:
+        """
+        Get a hash of the structure of the mind. Two minds have the same
+        hash if their nodes have the same `size`, `endo` and type, and
+        their edges have the same destination, `weight` and `length`,
+        independently of the order of the nodes and the edges and of
+        their dynamic state (levels, damage, trickles)
+        Returns:
+            Hexadecimal SHA-256 digest
+        """
+        self.sync_from_engine()
+        structure = sorted(
+            (
+                node.name,
+                node.size,
+                node.endo,
+                node.type,
+                sorted((edge.node.name, edge.weight, edge.length) for edge in edges),
+            )
+            for node, edges in self.graph.items()
+        )
+        return hashlib.sha256(json.dumps(structure).encode()).hexdigest()
+
+    def copy_graph(self) -> tuple[defaultdict, defaultdict, dict[int, Node]]:
+        """
+        Copy the nodes and the edges. Unlike `deepcopy`, it keeps no memo
+        with an entry per object, and nodes are matched by name, so the
+        graph, the reverse graph, `nodes_dict` and the edges of the copy
+        share the same nodes
+        Returns:
+            Copies of `graph`, `reverse_graph` and `nodes_dict`
+        """
+        # The nodes of the graph are the ones that run
+        nodes = {node.name: node for node in self.nodes_dict.values()}
+        nodes.update((node.name, node) for node in self.graph)
+        nodes = {name: copy(node) for name, node in nodes.items()}
+        graph = defaultdict(set)
+        for node, edges in self.graph.items():
+            graph[nodes[node.name]] = {
+                Edge(nodes[edge.node.name], edge.weight, edge.length, edge.next_steps)
+                for edge in edges
+            }
+        reverse_graph = defaultdict(set)
+        for node, source_nodes in self.reverse_graph.items():
+            reverse_graph[nodes[node.name]] = {nodes[source_node.name] for source_node in source_nodes}
+        nodes_dict = {name: nodes[name] for name in self.nodes_dict}
+        return graph, reverse_graph, nodes_dict
+
     def add_edge(self, node_1: Node, node_2: Node, **kwargs) -> None:
         """
         Add an edge between two existing nodes with
@@ -208,7 +434,12 @@ class StynkerMind:
             **kwargs: keywords to pass to the Edge constructor
         """
         edge = Edge(node_2, **kwargs)
-        self.graph[node_1].add(edge)
+        edges = self.graph[node_1]
+        # As in a set, nothing changes if there is already an
+        # edge between the nodes
+        if self._statistics is not None and edge not in edges:
+            self._statistics.add_edge(node_1.name, node_2.name, edge.weight, edge.length)
+        edges.add(edge)
         self.reverse_graph[node_2].add(node_1)
 
     def remake(self, nodes: Iterable[Node]) -> None:
@@ -219,7 +450,10 @@ class StynkerMind:
         """
         for node in nodes:
             # Remake node's attributes
+            old_size, old_endo = node.size, node.endo
             node.remake()
+            if self._statistics is not None:
+                self._statistics.update_node(old_size, old_endo, node.size, node.endo)
             # Remake edges
             self.remake_edges(node)
 
@@ -229,15 +463,25 @@ class StynkerMind:
         Args:
             node: instance of `Node`
         """
+        statistics = self._statistics
         # Delete existing edges from `node`
+        if statistics is not None:
+            for edge in self.graph[node]:
+                statistics.remove_edge(node.name, edge.node.name, edge.weight, edge.length)
         del self.graph[node]
+        removed_edge = Edge(node)
         for source_node in self.reverse_graph[node]:
+            edges = self.graph[source_node]
+            if statistics is not None and removed_edge in edges:
+                # The edge in the set has the weight and the length
+                edge = next(edge for edge in edges if edge == removed_edge)
+                statistics.remove_edge(source_node.name, node.name, edge.weight, edge.length)
             # If two nodes: `a`, and `b` are being remake,
             # and there is an Edge between them, then this
             # will try to remove an Edge that was already
             # removed. Skipping this error
             try:
-                self.graph[source_node].remove(Edge(node))
+                edges.remove(removed_edge)
             except KeyError:
                 pass
 
@@ -322,6 +566,7 @@ class Stynker(StynkerMind):
         n_output: int = None,
         n_remakes: int = None,
         friction_coefficient: float = 0.80,
+        rest_threshold: float = 0.0,
         radius: float = 10,
         initial_position: Tuple[int, int] = (0, 0),
         show_route: bool = False,
@@ -342,6 +587,9 @@ class Stynker(StynkerMind):
             n_remakes: number of nodes to remake in the sleep cycle
             friction_coefficient: ratio to define how much velocity
                 does the Stynker lose in each cycle
+            rest_threshold: speed under which the Stynker rests when no
+                output node spills. Resting Stynkers stop, and skip the
+                interaction with the environment. If 0, they never rest
             radius: radius of the representation of the Stynker
             initial_position: coordinate where the Stynker starts
             show_route: whether to show the path that the Stynker follows
@@ -358,31 +606,42 @@ class Stynker(StynkerMind):
             graph=graph,
         )
 
-        # Create "body" of the Stynker: turtle object
-        self.turtle = turtle.Turtle()
-        self.turtle.shape("circle")
-        self.turtle.color(color)
+        # "Body" of the Stynker. The position is kept as a tuple that is
+        # replaced (never mutated), so a `Renderer` running in another
+        # thread can read a consistent snapshot without locks
+        self.color = color
         self.show_route = show_route
-        if not self.show_route:
-            self.turtle.penup()
         self.initial_position = initial_position
-        self.turtle.setposition(*self.initial_position)
+        self.position = tuple(self.initial_position)
+        # Number of times the Stynker has been moved back to the initial
+        # position. Used by the `Renderer` to avoid drawing the jump
+        self.n_resets = 0
         self.radius = radius
+        # Reused in every wake cycle, see `get_interaction_information`
+        self.interaction_info = InteractionInfo()
         # Number of remakes per sleep cycle
         self.n_remakes = n_remakes
         # Set initial velocity vector to (0, 0)
         self.velocity_vector = (0, 0)
         # Friction coefficient
         self.friction_coefficient = friction_coefficient
+        # Resting state, see `_run_resting_cycle`. The input nodes
+        # activated at `_rest_position` are computed once
+        self.rest_threshold = rest_threshold
+        self.n_resting_cycles = 0
+        self._rest_position = None
+        self._rest_inputs = ()
+        # Optional `SpeculativeSleep` that chooses between several
+        # remakes in the sleep cycle. See `_run_sleep_cycle`
+        self.speculative_sleep = None
 
         # Set environment
         if isinstance(environment, Environment):
             self.environment = environment
         elif isinstance(environment, str):
-            # If a string is passed, get the environment
-            # and draw its borders
+            # If a string is passed, get the environment. It is shared
+            # with the other Stynkers of the process
             self.environment = Environment.get_environment(environment)
-            self.environment.draw_borders()
         else:
             raise TypeError(
                 f"The environment input should be an instance of Environment"
@@ -401,72 +660,152 @@ class Stynker(StynkerMind):
         elif self.period == "wake":
             return self._run_wake_cycle()
 
-    def _run_wake_cycle(self) -> Dict[str, Any]:
+    def run_schedule(
+        self,
+        schedule: Iterable[Tuple[str, int]],
+        on_cycle: Callable[[int, int, int], None] = None,
+    ) -> Tuple[int, int]:
+        """
+        Run the Stynker alone in the environment through a schedule of
+        periods. When it wins or loses, it goes back to the initial
+        position and stops
+        Args:
+            schedule: list of (period, number of cycles)
+            on_cycle: function called after each cycle, before going back
+                to the initial position, with the number of cycles run
+                and the number of wins and losses so far
+        Returns:
+            Number of wins and losses
+        """
+        wins = 0
+        losses = 0
+        n_cycles = 0
+        for period, period_cycles in schedule:
+            self.assign_period(period)
+            for _ in range(period_cycles):
+                info = self.run_cycle()
+                n_cycles += 1
+                finished = period == "wake" and (info["won"] or info["lost"])
+                if finished:
+                    wins += info["won"]
+                    losses += info["lost"]
+                if on_cycle is not None:
+                    on_cycle(n_cycles, wins, losses)
+                if finished:
+                    self.reset_position()
+                    self.reset_vector()
+        return wins, losses
+
+    def _run_wake_cycle(self) -> InteractionInfo:
         """Run the wake cycle"""
-        x_vector, y_vector = self.velocity_vector
-        # Load nodes
-        self.load_nodes()
+        if not self._kick():
+            return self._run_resting_cycle()
+        # Get information about the interaction with the environment
+        return self.end_wake_cycle(self.get_interaction_information())
 
-        nodes_triggered = 0
+    def begin_wake_cycle(self) -> Optional[InteractionInfo]:
+        """
+        Run a wake cycle until the interaction with the environment:
+        run the nodes and kick the Stynker. Used by `Arena` to move all
+        the Stynkers at once with `BatchPhysics`
+        Returns:
+            None if the Stynker moves, and the cycle must be finished with
+            `end_wake_cycle`. Otherwise, the Stynker rests, and the cycle
+            is over, see `_run_resting_cycle`
+        """
+        self.current_cycle += 1
+        if not self._kick():
+            return self._run_resting_cycle()
+        return None
 
-        # Check nodes
-        for node in self.get_nodes():
-            # Check if the node is full
-            if node.is_full():
-                # Mark output node as active if it spills
-                if node.is_output:
-                    logging.debug(f"Kicking node {node.name}")
-                    kick_vector = self.kick_dictionary[node.name]
-                    x_vector += kick_vector[0]
-                    y_vector += kick_vector[1]
-                # Spill full nodes
-                node.spill()
-                nodes_triggered += 1
-                for edge in self.graph[node]:
-                    # Load edges with trickles
-                    edge.load()
+    def _kick(self) -> bool:
+        """
+        Run the nodes, and kick the Stynker with the output nodes that spill
+        Returns:
+            Whether the Stynker moves in this cycle
+        """
+        x_vector, y_vector = self.velocity_vector
+        # Load nodes and spill full nodes
+        spilled_names = self.run_nodes()
+
+        kicked = False
+        for name in spilled_names:
+            # Kick the Stynker if an output node spills
+            if name in self.kick_dictionary:
+                logging.debug(f"Kicking node {name}")
+                kick_vector = self.kick_dictionary[name]
+                x_vector += kick_vector[0]
+                y_vector += kick_vector[1]
+                kicked = True
         # Updates velocity vector based on the 'kicks'
         self.velocity_vector = (x_vector, y_vector)
 
-        # Get information about the interaction with the environment
-        interaction_info = self.get_interaction_information()
+        logging.debug(
+            f"Cycle {self.current_cycle},"
+            f"{len(spilled_names)} nodes triggered"
+        )
+
+        if not kicked and math.hypot(x_vector, y_vector) < self.rest_threshold:
+            return False
+        self._rest_position = None
+        return True
 
+    def end_wake_cycle(self, interaction_info: InteractionInfo) -> InteractionInfo:
+        """
+        Finish a wake cycle with the interaction with the environment
+        Args:
+            interaction_info: result of `get_interaction_information`
+        Returns:
+            The same `interaction_info`
+        """
         # Updates the velocity vector if the Stynker interacts with a border
-        self.velocity_vector = interaction_info["final_velocity_vector"]
+        self.velocity_vector = interaction_info.final_velocity_vector
 
         # Updates the position of the Stynker
-        self.update_position(*interaction_info["new_position"])
+        self.update_position(interaction_info.new_x, interaction_info.new_y)
 
         # Handle input nodes logic
-        self.run_input_points_logic(interaction_info["route"])
+        self.run_input_points_logic(interaction_info)
 
         # Apply friction
         self.apply_friction()
 
-        logging.debug(
-            f"Cycle {self.current_cycle},"
-            f"{nodes_triggered} nodes triggered"
-        )
-
         return interaction_info
 
+    def _run_resting_cycle(self) -> InteractionInfo:
+        """
+        Run a wake cycle of a Stynker that rests: it stops where it is,
+        without interacting with the environment. The input nodes that
+        its position activates are computed in the first cycle at that
+        position, and activated again in the next ones, until a kick
+        (or a bounce with other Stynker) moves it
+        Returns:
+            The information of the Stynker, that stays in the same
+            position without touching anything
+        """
+        self.n_resting_cycles += 1
+        self.velocity_vector = (0, 0)
+        position = self.position
+        info = self.interaction_info
+        info.previous_position = position
+        info.new_x, info.new_y = position
+        info.initial_velocity_vector = info.final_velocity_vector = (0, 0)
+        info.touch_border = info.won = info.lost = info.touch_stynker = False
+        info.route_length = 0
+        info.add_to_route(*position)
+        info.add_to_route(*position)
+
+        if position != self._rest_position:
+            self._rest_position = position
+            self._rest_inputs = self.get_input_contacts(info)
+        for i in self._rest_inputs:
+            self.activate_node(i)
+        return info
+
     def _run_dream_cycle(self) -> None:
         """Run the dream cycle"""
-        # Load nodes
-        self.load_nodes()
-
-        nodes_triggered = 0
-
-        # Check nodes
-        for node in self.get_nodes():
-            # Check if the node is full
-            if node.is_full():
-                # Spill full nodes
-                node.spill()
-                nodes_triggered += 1
-                for edge in self.graph[node]:
-                    # Load edges with trickles
-                    edge.load()
+        # Load nodes and spill full nodes
+        nodes_triggered = len(self.run_nodes())
 
         logging.debug(
             f"Cycle {self.current_cycle},"
@@ -475,6 +814,21 @@ class Stynker(StynkerMind):
 
     def _run_sleep_cycle(self) -> None:
         """Run the sleep cycle"""
+        if self.speculative_sleep is not None:
+            # Try several remakes, and keep the best one
+            self.speculative_sleep.run(self)
+        else:
+            self.sleep()
+
+    def sleep(self) -> None:
+        """
+        Remake the nodes with less damage (or random ones, if
+        `random_sleep`) and the expired ones, and restart the damage
+        """
+        if self.engine is not None:
+            self.engine.sleep(self.n_remakes, self.random_sleep)
+            return
+
         expired_nodes = list()
         for node in self.get_nodes():
             node.sleep()
@@ -512,7 +866,8 @@ class Stynker(StynkerMind):
         """
         velocity_vector = velocity_vector or self.velocity_vector
         dx, dy = velocity_vector
-        self.update_position(self.turtle.xcor() + dx, self.turtle.ycor() + dy)
+        x, y = self.position
+        self.update_position(x + dx, y + dy)
 
     def update_position(self, x: float, y: float) -> None:
         """
@@ -521,17 +876,14 @@ class Stynker(StynkerMind):
             x: new x coordinate
             y: new y coordinate
         """
-        self.turtle.setx(x)
-        self.turtle.sety(y)
+        self.position = (x, y)
 
     def reset_position(self):
         """
         Move back the Stynker to the initial position without drawing
         """
-        self.turtle.penup()
-        self.turtle.setposition(self.initial_position)
-        if self.show_route:
-            self.turtle.pendown()
+        self.n_resets += 1
+        self.position = tuple(self.initial_position)
 
     def reset_vector(self):
         """
@@ -547,30 +899,52 @@ class Stynker(StynkerMind):
             y * self.friction_coefficient
         )
 
-    def run_input_points_logic(self, route: list[tuple[float, float], ...]) -> None:
+    def run_input_points_logic(self, interaction_info: InteractionInfo) -> None:
         """
         Given the route where the center of the Stynker has been,
         activates the input nodes based on a predefined logic
         Args:
-            route: list of points where the Stynker has been
-        """
-        for i, input_point in self.input_points.items():
-            # For a given input point, get the list of its
-            # positions given the center of the Stynker
-            input_route = list()
-            for point in route:
-                new_point = (
-                    point[0] + input_point[0] * self.radius,
-                    point[1] + input_point[1] * self.radius
-                )
-                input_route.append(new_point)
+            interaction_info: result of `get_interaction_information`,
+                with the points where the Stynker has been
+        """
+        for i in self.get_input_contacts(interaction_info):
+            # Activating a node more than once has no other effect
+            self.activate_node(i)
 
-            for j, point in enumerate(input_route[:-1]):
-                segment = (point, route[j + 1])
-                for border_segment in self.environment.outer_segments:
-                    # Check if the points intersect
-                    if self.environment.intersect(*segment, *border_segment):
-                        self.activate_node(i)
+    def get_input_contacts(self, interaction_info: InteractionInfo) -> list[int]:
+        """
+        Get the input nodes whose segment, from the input point to the
+        next point of the route, crosses the border of the environment
+        Args:
+            interaction_info: result of `get_interaction_information`,
+                with the points where the Stynker has been
+        Returns:
+            Names of the input nodes to activate
+        """
+        contacts = list()
+        route_x = interaction_info.route_x
+        route_y = interaction_info.route_y
+        n_segments = interaction_info.route_length - 1
+        outer_segment_values = self.environment.outer_segment_values
+        intersect_coordinates = self.environment.intersect_coordinates
+        radius = self.radius
+        for i, (input_x, input_y) in self.input_points.items():
+            # For a given input point, check the segments from its
+            # positions given the center of the Stynker to the next
+            # point of the route
+            for j in range(n_segments):
+                x0 = route_x[j] + input_x * radius
+                y0 = route_y[j] + input_y * radius
+                x1 = route_x[j + 1]
+                y1 = route_y[j + 1]
+                for q1x, q1y, q2x, q2y in outer_segment_values:
+                    if intersect_coordinates(x0, y0, x1, y1, q1x, q1y, q2x, q2y):
+                        break
+                else:
+                    continue
+                contacts.append(i)
+                break
+        return contacts
 
     def clone_from(self, stk, **kwargs) -> None:
         """
@@ -581,13 +955,22 @@ class Stynker(StynkerMind):
         """
         self.reset_position()
         self.n_nodes = stk.n_nodes
-        self.graph = deepcopy(stk.graph)
-        self.reverse_graph = deepcopy(stk.reverse_graph)
-        self.nodes_dict = deepcopy(stk.nodes_dict)
+        if self.engine is not None and stk.engine is not None:
+            # Copy the arrays of the engine instead of the objects
+            self.engine.copy_from(stk.engine)
+        else:
+            stk.sync_from_engine()
+            if stk is not self:
+                # Free the current objects before making the new ones
+                self.graph = self.reverse_graph = self.nodes_dict = None
+            self.graph, self.reverse_graph, self.nodes_dict = stk.copy_graph()
+            self._statistics = stk._statistics.copy() if stk._statistics is not None else None
+            if self.engine is not None:
+                self.engine.load_graph(self.graph, self.reverse_graph)
         self.kick_dictionary = deepcopy(stk.kick_dictionary)
         self.__dict__.update(kwargs)
 
-    def get_interaction_information(self) -> Dict[str, Any]:
+    def get_interaction_information(self) -> InteractionInfo:
         """
         After a cycle, get the new information from the Stynker after
         interacting with the environment.
@@ -601,74 +984,123 @@ class Stynker(StynkerMind):
 
         In the future, it will return:
             - Whether the Stynker is inside the environment
-            - Whether the Stynker bounces with other Stynker
 
-        Notice that the Stynker is represented by an instance
-        of a turtle, that is a point, but in this implementation
-        we are treating it as a circle
+        Whether the Stynker bounces with other Stynker is added
+        by `Arena.run_cycle`, which knows about all the Stynkers
+
+        The Stynker is a circle of radius `radius` that bounces on the
+        walls of the environment (see `Environment.find_first_contact`),
+        at most `MAX_BOUNCES` times per cycle
 
         Returns:
-            A dictionary with the information of the Stynker
-            after the interaction with the environment
+            The information of the Stynker after the interaction with
+            the environment. The same instance is overwritten in every
+            cycle, see `InteractionInfo`
         """
+        if kernels.get_backend() != "numpy" and self._interact_with_kernel():
+            return self.interaction_info
+
+        environment = self.environment
+        info = self.interaction_info
+        info.touch_border = info.won = info.lost = info.touch_stynker = False
+        info.route_length = 0
+        contact = info.contact
+        radius = self.radius
+
         # Initial position
-        initial_position = self.turtle.position()
-        last_position = initial_position
+        info.previous_position = self.position
+        last_x, last_y = self.position
         # Current velocity vector
-        velocity_vector = self.velocity_vector
+        info.initial_velocity_vector = new_velocity_vector = self.velocity_vector
         # New position
-        new_position = (
-            initial_position[0] + velocity_vector[0],
-            initial_position[1] + velocity_vector[1]
-        )
-        # New velocity vector
-        new_velocity_vector = velocity_vector
-
-        # Did the ball touch the env. border?
-        touch_border = False
-        won = False
-        lost = False
-
-        first_intersection_info = self.environment.get_first_intersection_info(last_position, new_position)
+        new_x = last_x + new_velocity_vector[0]
+        new_y = last_y + new_velocity_vector[1]
 
         # Points where the Stynker has been
-        route = [last_position, new_position]
+        info.add_to_route(last_x, last_y)
+        info.add_to_route(new_x, new_y)
 
-        while (intersection_point := first_intersection_info["intersection_point"]) is not None:
+        n_bounces = 0
+        k = environment.find_first_contact(last_x, last_y, new_x, new_y, radius, contact)
+        while k >= 0:
             # Pop the latest position of the route since it is outside the env.
-            route.pop()
-            touch_border = True
-            segment = first_intersection_info["segment"]
-            a, b, c = first_intersection_info["segment_parameters"]
-            if segment == self.environment.winning_inner_segment:
-                won = True
-            if segment == self.environment.losing_inner_segment:
-                lost = True
-            last_position = intersection_point
+            info.route_length -= 1
+            info.touch_border = True
+            if environment.is_winning[k]:
+                info.won = True
+            if environment.is_losing[k]:
+                info.lost = True
+            last_x = contact[1]
+            last_y = contact[2]
             # Save information about the points where Stynker has been
-            route.append(last_position)
+            info.add_to_route(last_x, last_y)
             # Breaking here since no further calculation is required
-            if won or lost:
+            if info.won or info.lost:
                 break
-            new_position = self.environment.reflect_point_over_line(*new_position, a, b, c)
-            new_velocity_vector = self.environment.calculate_velocity_vector(new_velocity_vector, a, b)
+            # Bounce on the line tangent to the circle at the contact
+            a = contact[3]
+            b = contact[4]
+            c = -a * last_x - b * last_y
+            new_velocity_vector = environment.calculate_velocity_vector(new_velocity_vector, a, b)
+            if n_bounces == MAX_BOUNCES:
+                # Stop at the contact
+                new_x, new_y = last_x, last_y
+                break
+            n_bounces += 1
+            new_x, new_y = environment.reflect_point_over_line(new_x, new_y, a, b, c)
             # Save information about the points where Stynker has been
-            route.append(new_position)
-            first_intersection_info = self.environment.get_first_intersection_info(
-                last_position,
-                new_position,
-            )
-        result = {
-            "previous_position": initial_position,
-            "new_position": new_position,
-            "initial_velocity_vector": velocity_vector,
-            "final_velocity_vector": new_velocity_vector,
-            "touch_border": touch_border,
-            "won": won,
-            "lost": lost,
-            "route": route,
-        }
-        return result
+            info.add_to_route(new_x, new_y)
+            k = environment.find_first_contact(last_x, last_y, new_x, new_y, radius, contact)
+
+        info.new_x = new_x
+        info.new_y = new_y
+        info.final_velocity_vector = new_velocity_vector
+        return info
+
+    def _interact_with_kernel(self) -> bool:
+        """
+        Fill `interaction_info` with `kernels.interact`.
+        See `get_interaction_information`
+        Returns:
+            False if the route did not fit in the buffer of the kernel,
+            and nothing was written
+        """
+        environment = self.environment
+        info = self.interaction_info
+        x0, y0 = self.position
+        velocity_vector = self.velocity_vector
+        n, flags, new_x, new_y, vx, vy = kernels.get_kernel(kernels.interact)(
+            x0,
+            y0,
+            velocity_vector[0],
+            velocity_vector[1],
+            self.radius,
+            environment.segment_table,
+            environment.is_winning_array,
+            environment.is_losing_array,
+            info.route_buffer,
+            MAX_BOUNCES,
+        )
+        if n < 0:
+            return False
+
+        info.previous_position = self.position
+        info.initial_velocity_vector = velocity_vector
+        info.touch_border = bool(flags & kernels.TOUCH_BORDER)
+        info.won = bool(flags & kernels.WON)
+        info.lost = bool(flags & kernels.LOST)
+        info.touch_stynker = False
+        info.route_length = 0
+        route = info.route_buffer
+        for j in range(n):
+            info.add_to_route(float(route[j, 0]), float(route[j, 1]))
+        info.new_x = float(new_x)
+        info.new_y = float(new_y)
+        if info.touch_border:
+            info.final_velocity_vector = (float(vx), float(vy))
+        else:
+            info.final_velocity_vector = velocity_vector
+        return True
 
     def to_pkl(self, pkl_path: str) -> None:
         """
@@ -711,6 +1143,7 @@ class Stynker(StynkerMind):
         return new_stynker
 
     def to_dict(self) -> dict[str, Any]:
+        self.sync_from_engine()
         graph = {
             node.to_keys(): [edge.to_keys() for edge in edges]
             for node, edges
@@ -719,7 +1152,7 @@ class Stynker(StynkerMind):
         parameters = {
             "graph": graph,
             "n_remakes": self.n_remakes,
-            "color": self.turtle.fillcolor(),
+            "color": self.color,
             "environment": self.environment.name,
             "show_route": self.show_route,
             "random_sleep": self.random_sleep
@@ -733,6 +1166,7 @@ class Stynker(StynkerMind):
         Returns:
             JSON representation of a `Stynker`
         """
+        self.sync_from_engine()
         repr_ = {
             "number_of_nodes": self.n_nodes,
             "number_of_input_nodes": self.n_input,
@@ -741,8 +1175,8 @@ class Stynker(StynkerMind):
             "random_sleep": self.random_sleep,
             "period": self.period,
             "cycle": self.current_cycle,
-            "color": self.turtle.fillcolor(),
-            "position": self.turtle.position(),
+            "color": self.color,
+            "position": self.position,
             "velocity": self.velocity_vector,
         }
         nodes_info = [
@@ -0,0 +1,277 @@
+from __future__ import annotations
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Union
+
+from .array_mind import ArrayMind
+from .environment import Environment
+from .population import PopulationStore
+from .stynker import Stynker, StynkerMind
+
+# State of each worker process of the pool. See `initialize_worker`
+_worker = dict()
+
+
+def initialize_worker(store_name: str, environment: Environment, stynker_parameters: dict[str, Any]) -> None:
+    """
+    Prepare a worker process: attach to the population and create the
+    Stynker used to run the evaluations. Done once per process
+    Args:
+        store_name: name of the shared memory of the population
+        environment: environment of the evaluations
+        stynker_parameters: keyword arguments to create the Stynker
+    """
+    store = PopulationStore.attach(store_name)
+    _worker["store"] = store
+    _worker["stynker"] = Stynker(environment=environment, color="black", **stynker_parameters)
+
+
+def evaluate_slot(i: int, schedule: list[tuple[str, int]], seed: int) -> tuple[int, int, int, int]:
+    """
+    Run the mind of a slot of the population through a schedule,
+    writing its new state in place
+    Args:
+        i: index of the slot
+        schedule: list of (period, number of cycles)
+        seed: seed of the random generator
+    Returns:
+        Index of the slot, number of wins, number of losses and
+        number of cycles run
+    """
+    store = _worker["store"]
+    stynker = _worker["stynker"]
+    stynker.attach_engine(store.get_mind(i))
+    store.load_body(i, stynker)
+    random.seed(seed)
+    wins, losses = stynker.run_schedule(schedule)
+
+    store.save_body(i, stynker)
+    # The mind belongs to the population, not to the Stynker
+    stynker.engine = None
+    return i, wins, losses, sum(n for _, n in schedule)
+
+
+class Tournament:
+    """
+    Evolve a population of minds.
+
+    In each generation, every mind runs a schedule of wake, dream and
+    sleep periods in a pool of processes, and its fitness is the number
+    of wins minus the number of losses. Then, some minds are replaced
+    by clones of others, following the selection method:
+        - pairwise: minds are paired, and the worse of each pair copies
+          the better one, as `main.py` does with two Stynkers
+        - tournament: each mind is replaced by the best of
+          `tournament_size` random minds
+        - elitist: the best `n_elites` minds are kept, and the rest are
+          replaced by copies of them, if they are fitter
+
+    The minds live in a `PopulationStore`, so they are never pickled
+    """
+
+    selection_methods = ("pairwise", "tournament", "elitist")
+
+    def __init__(
+        self,
+        population_size: int,
+        environment: Union[str, Environment],
+        schedule: list[tuple[str, int]],
+        selection: str = "tournament",
+        tournament_size: int = 3,
+        n_elites: int = 2,
+        n_workers: int = None,
+        seed: int = 0,
+        **stynker_parameters,
+    ) -> None:
+        """
+
+        Args:
+            population_size: number of minds
+            environment: Instance of Environment or string with its name
+            schedule: list of (period, number of cycles) run by every
+                mind in each generation
+            selection: selection method, see the class docstring
+            tournament_size: number of minds that compete in each tournament
+            n_elites: number of minds kept by the elitist selection
+            n_workers: number of processes. By default, one per CPU
+            seed: seed of the random generator
+            **stynker_parameters: parameters of the Stynkers, as in
+                `parameters.mind_parameters`
+        """
+        if selection not in self.selection_methods:
+            raise ValueError(f"Selection must be one of the following: {', '.join(self.selection_methods)}")
+        if isinstance(environment, str):
+            environment = Environment.get_environment(environment)
+        self.environment = environment
+        self.schedule = schedule
+        self.selection = selection
+        self.tournament_size = tournament_size
+        self.n_elites = n_elites
+        self.random = random.Random(seed)
+        self.generation = 0
+        # Statistics of each generation
+        self.history = list()
+        # Information about every mind that has been in the population
+        self.lineage = list()
+
+        mind_keys = ("n_nodes", "n_input", "n_output", "random_sleep")
+        mind_parameters = {key: val for key, val in stynker_parameters.items() if key in mind_keys}
+        minds = [ArrayMind.from_mind(StynkerMind(**mind_parameters)) for _ in range(population_size)]
+        edge_capacity = max(mind.edge_capacity for mind in minds)
+        self.store = PopulationStore.create(population_size, minds[0].n_nodes, edge_capacity)
+        # Id of the mind of each slot
+        self.ids = list()
+        for i, mind in enumerate(minds):
+            self.store.store(i, mind)
+            self.store.positions[i] = stynker_parameters.get("initial_position", (0, 0))
+            self.ids.append(self._add_to_lineage(parent=None, slot=i))
+
+        self.n_workers = n_workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=initialize_worker,
+            initargs=(self.store.name, self.environment, stynker_parameters),
+        )
+
+    @property
+    def population_size(self) -> int:
+        return self.store.n_slots
+
+    def run(self, n_generations: int) -> list[dict[str, Any]]:
+        """
+        Run several generations
+        Args:
+            n_generations: number of generations to run
+        Returns:
+            Statistics of every generation run so far
+        """
+        for _ in range(n_generations):
+            self.run_generation()
+        return self.history
+
+    def run_generation(self) -> dict[str, Any]:
+        """
+        Evaluate every mind, and replace the worse ones
+        Returns:
+            Statistics of the generation
+        """
+        start = time.perf_counter()
+        results = self.evaluate()
+        elapsed = time.perf_counter() - start
+
+        fitness = [wins - losses for wins, losses in results]
+        for i, score in enumerate(fitness):
+            self.lineage[self.ids[i]]["fitness"] = score
+        replacements = self.select(fitness)
+        # A mind that is copied is always better than the one it replaces,
+        # so copying the worse ones first never copies an overwritten mind
+        for destination in sorted(replacements, key=lambda i: fitness[i]):
+            self.store.clone(replacements[destination], destination)
+        parent_ids = list(self.ids)
+        for destination, source in replacements.items():
+            self.ids[destination] = self._add_to_lineage(parent=parent_ids[source], slot=destination)
+
+        n_cycles = len(results) * sum(n for _, n in self.schedule)
+        stats = {
+            "generation": self.generation,
+            "wins": sum(wins for wins, _ in results),
+            "losses": sum(losses for _, losses in results),
+            "best_fitness": max(fitness),
+            "mean_fitness": sum(fitness) / len(fitness),
+            "n_replaced": len(replacements),
+            "evaluations_per_second": len(results) / elapsed,
+            "cycles_per_second": n_cycles / elapsed,
+        }
+        self.history.append(stats)
+        logging.info(
+            f"Generation {self.generation} Wins: {stats['wins']} Losses: {stats['losses']} "
+            f"Best: {stats['best_fitness']} "
+            f"Evaluations/sec: {stats['evaluations_per_second']:.2f}"
+        )
+        self.generation += 1
+        return stats
+
+    def evaluate(self) -> list[tuple[int, int]]:
+        """
+        Run the schedule for every mind of the population, in parallel
+        Returns:
+            Number of wins and losses of each mind
+        """
+        seeds = [self.random.randrange(2 ** 32) for _ in range(self.population_size)]
+        futures = [
+            self.executor.submit(evaluate_slot, i, self.schedule, seed)
+            for i, seed in enumerate(seeds)
+        ]
+        results = [None] * self.population_size
+        for future in futures:
+            i, wins, losses, _ = future.result()
+            results[i] = (wins, losses)
+        return results
+
+    def select(self, fitness: list[int]) -> dict[int, int]:
+        """
+        Choose which minds are replaced, and by which
+        Args:
+            fitness: fitness of each mind
+        Returns:
+            Dictionary from the slot to replace to the slot to copy
+        """
+        slots = list(range(len(fitness)))
+        replacements = dict()
+        if self.selection == "pairwise":
+            self.random.shuffle(slots)
+            for a, b in zip(slots[::2], slots[1::2]):
+                if fitness[a] > fitness[b]:
+                    replacements[b] = a
+                elif fitness[b] > fitness[a]:
+                    replacements[a] = b
+        elif self.selection == "tournament":
+            for i in slots:
+                competitors = self.random.sample(slots, min(self.tournament_size, len(slots)))
+                winner = max(competitors, key=lambda j: fitness[j])
+                if fitness[winner] > fitness[i]:
+                    replacements[i] = winner
+        elif self.selection == "elitist":
+            # Ties are broken randomly, so equal minds keep their slots
+            self.random.shuffle(slots)
+            ranking = sorted(slots, key=lambda j: fitness[j], reverse=True)
+            elites = ranking[:self.n_elites]
+            for k, i in enumerate(ranking[self.n_elites:]):
+                # As in the other methods, only a fitter mind replaces another
+                elite = elites[k % len(elites)]
+                if fitness[elite] > fitness[i]:
+                    replacements[i] = elite
+        return replacements
+
+    def _add_to_lineage(self, parent: int, slot: int) -> int:
+        """
+        Register a new mind
+        Args:
+            parent: id of the mind it was cloned from. None for initial minds
+            slot: slot of the population where it lives
+        Returns:
+            Id of the new mind
+        """
+        self.lineage.append({
+            "id": len(self.lineage),
+            "parent": parent,
+            "generation": self.generation,
+            "slot": slot,
+            "fitness": None,
+        })
+        return len(self.lineage) - 1
+
+    def close(self) -> None:
+        """Stop the workers and release the population"""
+        self.executor.shutdown()
+        self.store.close()
+        self.store.unlink()
+
+    def __enter__(self) -> Tournament:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
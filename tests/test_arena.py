@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+
+from src import Arena, BatchPhysics, Stynker, kernels
+
+
+def make_stynkers(n_stynkers, seed=4):
+    generator = random.Random(seed)
+    return [
+        Stynker(
+            environment="simple_maze", color=f"c{i}", n_nodes=48, n_input=32, n_output=16, n_remakes=4,
+            initial_position=(generator.uniform(-200, 200), generator.uniform(-100, 200)),
+        )
+        for i in range(n_stynkers)
+    ]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request):
+    previous = kernels.get_backend()
+    kernels.set_backend(request.param)
+    yield request.param
+    kernels.set_backend(previous)
+
+
+def test_batch_step_equals_the_per_body_step(backend):
+    stynkers = make_stynkers(32)
+    generator = random.Random(1)
+    for stk in stynkers:
+        # Fast enough to bounce several times on the walls
+        stk.velocity_vector = (generator.uniform(-300, 300), generator.uniform(-300, 300))
+    physics = BatchPhysics(stynkers[0].environment)
+    step = physics.step(
+        [stk.position for stk in stynkers],
+        [stk.velocity_vector for stk in stynkers],
+        [stk.radius for stk in stynkers],
+    )
+    assert step["touch_border"].any() and (step["route_length"] > 3).any()
+    lists = physics.to_lists(step)
+    for i, stk in enumerate(stynkers):
+        expected = stk.get_interaction_information()
+        expected = (expected.new_position, expected.final_velocity_vector, expected.touch_border,
+                    expected.won, expected.lost, expected.route)
+        stk.interaction_info.load_batch(lists, i)
+        info = stk.interaction_info
+        assert (info.new_position, info.final_velocity_vector, info.touch_border,
+                info.won, info.lost, info.route) == expected
+        assert np.array_equal(step["new_position"][i], expected[0])
+
+
+def run_arena(batch_physics, n_stynkers=8):
+    random.seed(4)
+    stynkers = make_stynkers(n_stynkers)
+    arena = Arena(stynkers[0].environment, stynkers, seed=1, batch_physics=batch_physics)
+    random.seed(9)
+    trace = []
+    for period, n_cycles in [("wake", 100), ("sleep", 1), ("wake", 100)]:
+        for stk in stynkers:
+            stk.assign_period(period)
+        for _ in range(n_cycles):
+            infos = arena.run_cycle()
+            if period != "wake":
+                continue
+            trace.append([
+                (info.new_position, info.final_velocity_vector, info.won, info.lost,
+                 info.touch_border, info.route, info.touch_stynker)
+                for info in infos
+            ])
+            for stk, info in zip(stynkers, infos):
+                if info.won or info.lost:
+                    stk.reset_position()
+                    stk.reset_vector()
+    return trace
+
+
+def test_batch_arena_equals_the_per_body_arena(backend):
+    assert run_arena(batch_physics=True) == run_arena(batch_physics=False)
+
+
+def test_stynker_against_a_wall_is_not_left_overlapped():
+    stynkers = make_stynkers(2)
+    arena = Arena(stynkers[0].environment, stynkers, seed=1)
+    # The first one touches the wall at x = 360, and the second one overlaps it
+    stynkers[0].position = (360 - stynkers[0].radius, 0.0)
+    stynkers[1].position = (350 - stynkers[0].radius, 0.0)
+    assert arena.resolve_body_collisions() == {0, 1}
+    assert stynkers[0].position == (360 - stynkers[0].radius, 0.0)
+    assert stynkers[1].position == pytest.approx((360 - 3 * stynkers[0].radius, 0.0))
@@ -0,0 +1,79 @@
+import random
+
+import numpy as np
+import pytest
+
+from src import ArrayMind, MindCheckpoints, Stynker
+from src.array_mind import NODE_FIELDS
+
+
+def make_stynker(seed):
+    random.seed(seed)
+    stynker = Stynker(environment="simple_maze", color="blue", n_nodes=48, n_input=32, n_output=16, n_remakes=4)
+    stynker.attach_engine(ArrayMind.from_mind(stynker))
+    return stynker
+
+
+def run_day(stynker, seed):
+    random.seed(seed)
+    stynker.assign_period("wake")
+    for _ in range(20):
+        stynker.run_cycle()
+    stynker.assign_period("sleep")
+    stynker.run_cycle()
+
+
+def get_edges(mind):
+    slots = np.flatnonzero(mind.alive[:mind.n_edges_used])
+    return sorted(zip(*(mind.arrays[name][slots].tolist() for name in (
+        "source", "destination", "weight", "length", "tracked", "pending",
+    ))))
+
+
+def assert_same_mind(mind_1, mind_2):
+    for name, _ in NODE_FIELDS:
+        if name != "counters":
+            assert np.array_equal(mind_1.arrays[name], mind_2.arrays[name]), name
+    assert get_edges(mind_1) == get_edges(mind_2)
+
+
+@pytest.fixture
+def saved(tmp_path):
+    stynker = make_stynker(3)
+    checkpoints = MindCheckpoints(str(tmp_path / "blue"))
+    sizes = list()
+    for day in range(30):
+        run_day(stynker, day)
+        sizes.append(checkpoints.save(stynker.engine, day))
+    return stynker, checkpoints, sizes
+
+
+def test_round_trip(saved, tmp_path):
+    stynker, checkpoints, sizes = saved
+    assert checkpoints.n_deltas > 0
+    mind, cycle = MindCheckpoints(str(tmp_path / "blue")).load()
+    assert cycle == 29
+    assert_same_mind(mind, stynker.engine)
+    # The replaced edges leave no dead slots
+    assert mind.n_edges_used == int(mind.alive.sum())
+
+    # Both minds go on in the same way
+    clone = make_stynker(3)
+    clone.engine.copy_from(mind)
+    for day in range(30, 33):
+        run_day(stynker, day)
+        run_day(clone, day)
+    assert_same_mind(clone.engine, stynker.engine)
+
+
+def test_deltas_only_have_the_changed_edges(saved):
+    stynker, checkpoints, sizes = saved
+    mind = stynker.engine
+    # A base has every edge, and a delta the ones of a few remakes
+    assert np.median(sizes) < sizes[0] / 2
+    run_day(stynker, 100)
+    remade, keys = mind.pop_changes()
+    slots = np.flatnonzero(mind.alive[:mind.n_edges_used])
+    changed_sources = set((np.asarray(sorted(keys)) // mind.n_nodes).tolist())
+    n_edges_of_sources = np.isin(mind.source[slots], list(changed_sources)).sum()
+    assert 0 < len(keys) < n_edges_of_sources
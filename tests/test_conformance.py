@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src import kernels
+from src.conformance import ENGINES, ConformanceHarness
+
+BACKENDS = ["numpy", "python"] + (["numba"] if kernels.numba is not None else [])
+SCHEDULE = [("wake", 40), ("sleep", 1), ("dream", 20), ("sleep", 1), ("wake", 40)]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_conform(engine, backend):
+    harness = ConformanceHarness(engine, backend, n_nodes=40, n_input=16, n_output=8, random_sleep=True)
+    assert harness.check(SCHEDULE, seed=3) is None
+
+
+class BrokenSleepHarness(ConformanceHarness):
+    """Harness whose candidate changes the weight of an edge after every sleep cycle"""
+
+    def attach_engine(self, stynker, directory):
+        super().attach_engine(stynker, directory)
+        mind = stynker.engine
+        sleep = mind.sleep
+
+        def broken_sleep(*args, **kwargs):
+            sleep(*args, **kwargs)
+            mind.weight[np.flatnonzero(mind.alive[:mind.n_edges_used])[0]] += 1
+
+        mind.sleep = broken_sleep
+
+
+def test_divergence_is_found_and_reduced():
+    harness = BrokenSleepHarness("array", "numpy", n_nodes=40, n_input=16, n_output=8)
+    divergence = harness.check(SCHEDULE, seed=3)
+    assert divergence is not None
+    assert (divergence["cycle"], divergence["period"], divergence["field"]) == (40, "sleep", "weight")
+
+    reproducer = harness.find_reproducer(SCHEDULE, 3, divergence)
+    assert reproducer["schedule"] == [["sleep", 1]]
+    assert reproducer["divergence"]["field"] == "weight"
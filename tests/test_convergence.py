@@ -0,0 +1,34 @@
+from src import ConvergenceMonitor
+
+
+def run_monitor(monitor, win_rates, events_per_sample=100):
+    """Feed the monitor with samples of the given win rates, and return the sample where it stops"""
+    wins = losses = 0
+    for i, rate in enumerate(win_rates):
+        wins += round(events_per_sample * rate)
+        losses += events_per_sample - round(events_per_sample * rate)
+        if monitor.update(i, wins, losses):
+            return i
+    return None
+
+
+def test_converges_when_the_win_rate_is_flat():
+    monitor = ConvergenceMonitor(window=5, tolerance=0.1, min_events=100)
+    assert run_monitor(monitor, [0.5] * 20) == 10
+    assert monitor.stop_reason["reason"] == "converged"
+
+
+def test_does_not_converge_while_the_win_rate_climbs():
+    monitor = ConvergenceMonitor(window=5, tolerance=0.1, min_events=100)
+    # Each window is precise, but the rate keeps going up until it plateaus
+    climb = [i / 50 for i in range(40)]
+    assert run_monitor(monitor, climb + [0.8] * 20) >= len(climb)
+    assert monitor.stop_reason["win_rate"] == 0.8
+
+
+def test_stalls_without_events():
+    monitor = ConvergenceMonitor(window=5, stall_samples=3)
+    assert run_monitor(monitor, [0.5] * 10, events_per_sample=0) == 3
+    assert monitor.stop_reason["reason"] == "stalled"
+    monitor.reset()
+    assert len(monitor.samples) == 0 and monitor.stop_reason is None
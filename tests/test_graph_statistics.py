@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from src import ArrayMind, Stynker
+from src.graph_statistics import GraphStatistics
+
+
+def make_stynker(seed, engine=False):
+    random.seed(seed)
+    stynker = Stynker(environment="simple_maze", color="blue", n_nodes=48, n_input=32, n_output=16, n_remakes=4)
+    if engine:
+        stynker.attach_engine(ArrayMind.from_mind(stynker))
+    return stynker
+
+
+def run_days(stynker, n_days, seed=0):
+    for day in range(n_days):
+        random.seed(seed + day)
+        stynker.assign_period("wake")
+        for _ in range(20):
+            stynker.run_cycle()
+        stynker.assign_period("sleep")
+        stynker.run_cycle()
+
+
+def full_statistics(stynker):
+    stynker.sync_from_engine()
+    return GraphStatistics.from_graph(stynker.graph).snapshot()
+
+
+@pytest.mark.parametrize("engine", [False, True])
+def test_incremental_statistics_match_a_full_recompute(engine):
+    stynker = make_stynker(5, engine)
+    stynker.get_statistics()
+    for day in range(10):
+        run_days(stynker, 1, seed=day)
+        assert stynker.get_statistics() == full_statistics(stynker)
+
+
+def test_engines_agree():
+    stynker_1, stynker_2 = make_stynker(5), make_stynker(5, engine=True)
+    run_days(stynker_1, 5)
+    run_days(stynker_2, 5)
+    assert stynker_1.get_statistics() == stynker_2.get_statistics()
+
+
+@pytest.mark.parametrize("engine", [False, True])
+def test_clone_keeps_the_statistics(engine):
+    source, clone = make_stynker(1, engine), make_stynker(2, engine)
+    source.get_statistics()
+    run_days(source, 3)
+    clone.clone_from(source)
+    statistics = clone.engine._statistics if engine else clone._statistics
+    assert statistics is not None
+    assert clone.get_statistics() == source.get_statistics()
+    # The copy is updated on its own
+    run_days(clone, 3, seed=100)
+    assert clone.get_statistics() == full_statistics(clone)
+    assert source.get_statistics() == full_statistics(source)
+
+
+def test_sync_keeps_the_statistics_of_the_engine():
+    stynker = make_stynker(3, engine=True)
+    expected = stynker.get_statistics()
+    stynker.detach_engine()
+    assert stynker._statistics is not None
+    assert stynker.get_statistics() == expected == GraphStatistics.from_graph(stynker.graph).snapshot()
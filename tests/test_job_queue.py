@@ -0,0 +1,78 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from parameters import stynker_parameters
+from src import JobClient, JobServer
+
+
+def start_server(tmp_path, **kwargs):
+    socket_path = str(tmp_path / "jobs.sock")
+    server = JobServer(
+        {**stynker_parameters, "n_nodes": 64},
+        [("wake", 20), ("sleep", 1)],
+        n_workers=1,
+        socket_path=socket_path,
+        **kwargs,
+    )
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(),))
+    thread.start()
+    while not os.path.exists(socket_path):
+        time.sleep(0.01)
+    return JobClient(socket_path), thread
+
+
+@pytest.fixture
+def client(tmp_path):
+    client, thread = start_server(tmp_path)
+    yield client
+    client.shutdown()
+    thread.join()
+
+
+def test_batch_with_a_wrong_spec_is_not_queued(client):
+    specs = [{"seed": 1}, {"seed": 2}, {"parameters": {"environment": "nope"}}]
+    events = list(client.submit(specs))
+    assert [event["event"] for event in events] == ["error"]
+    assert "nope" in events[0]["message"]
+    status = client.status()
+    assert status["queued"] + status["started"] + status["result"] + status["error"] == 0
+
+
+@pytest.mark.parametrize("spec", [
+    {"engine": "mapped"},
+    {"backend": "fortran"},
+    {"parameters": {"n_legs": 4}},
+    {"schedule": [["nap", 10]]},
+])
+def test_wrong_specs_are_refused(client, spec):
+    events = list(client.submit([{"seed": 1}, spec]))
+    assert [event["event"] for event in events] == ["error"]
+    assert client.status()["result"] == 0
+
+
+def test_batch_runs_every_job(client):
+    events = list(client.submit([{"seed": 1}, {"seed": 1, "engine": "array"}]))
+    assert events[0] == {"event": "queued", "jobs": [0, 1]}
+    results = {event["job"]: event for event in events if event["event"] == "result"}
+    assert sorted(results) == [0, 1]
+    assert all(result["n_cycles"] == 21 for result in results.values())
+
+
+def test_repeated_runs_come_from_the_cache(tmp_path):
+    client, thread = start_server(tmp_path, cache_path=str(tmp_path / "cache.sqlite"))
+    try:
+        specs = [{"seed": 1, "schedule": [["wake", 200], ["sleep", 1]]}, {"seed": 2}]
+        first = [event for event in client.submit(specs) if event["event"] == "result"]
+        second = [event for event in client.submit(specs) if event["event"] == "result"]
+    finally:
+        client.shutdown()
+        thread.join()
+    first = {event["job"]: event for event in first}
+    second = {event["job"] - 2: event for event in second}
+    for job in (0, 1):
+        assert not first[job]["cached"] and second[job]["cached"]
+        assert (first[job]["wins"], first[job]["losses"]) == (second[job]["wins"], second[job]["losses"])
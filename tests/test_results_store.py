@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from src import ResultsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results"), chunk_size=4)
+    yield store
+    store.close()
+
+
+def test_select_returns_the_appended_rows(store):
+    run_1 = store.start_run({"n_nodes": 48})
+    run_2 = store.start_run({"n_nodes": 64})
+    for cycle in range(10):
+        store.append(run_1, cycle, cycle, 10 - cycle, cycle / (10 - cycle), 100.0)
+        store.append(run_2, cycle, 0, cycle, 0.0, 200.0)
+    store.flush()
+
+    rows = store.select(["cycle", "wins", "win_rate"], n_nodes=48)
+    assert rows["cycle"].tolist() == list(range(10))
+    assert rows["wins"].tolist() == list(range(10))
+    assert np.allclose(rows["win_rate"], np.arange(10) / 10)
+
+    rows = store.select(["run_id", "throughput"], cycle_range=(3, 4))
+    assert sorted(rows["run_id"].tolist()) == sorted([run_1, run_1, run_2, run_2])
+    assert sorted(rows["throughput"].tolist()) == [100.0, 100.0, 200.0, 200.0]
+
+
+def test_empty_select_keeps_the_types_of_the_columns(store):
+    run_id = store.start_run({"n_nodes": 48})
+    store.append(run_id, 1, 1, 0, -1.0, 100.0)
+    store.flush()
+    rows = store.select(["cycle", "ratio", "win_rate"], n_nodes=64)
+    assert [(len(rows[column]), rows[column].dtype) for column in rows] == [
+        (0, np.uint64), (0, np.float64), (0, np.float64),
+    ]
+
+
+def test_aggregate_by_cycle(store):
+    run_1 = store.start_run({})
+    run_2 = store.start_run({})
+    # Cycles 0, 10, 20 and 50: the bins of 30 and 40 have no rows
+    for cycle, wins_1, wins_2 in [(0, 0, 2), (10, 1, 3), (20, 2, 4), (50, 5, 5)]:
+        store.append(run_1, cycle, wins_1, 10 - wins_1, 0.0, 0.0)
+        store.append(run_2, cycle, wins_2, 10 - wins_2, 0.0, 0.0)
+    store.flush()
+
+    aggregate = store.aggregate_by_cycle("win_rate", bin_size=10)
+    assert aggregate["cycle"].tolist() == [0, 10, 20, 50]
+    assert aggregate["count"].tolist() == [2, 2, 2, 2]
+    assert np.allclose(aggregate["mean"], [0.1, 0.2, 0.3, 0.5])
+    assert np.allclose(aggregate["std"], [0.1, 0.1, 0.1, 0.0])
+
+    # The bin of 50 has no rows in its window other than its own
+    aggregate = store.aggregate_by_cycle("win_rate", bin_size=10, window=2)
+    assert aggregate["count"].tolist() == [2, 4, 4, 2]
+    assert np.allclose(aggregate["mean"], [0.1, 0.15, 0.25, 0.5])
+
+    aggregate = store.aggregate_by_cycle("win_rate", bin_size=10, window=4)
+    assert aggregate["count"].tolist() == [2, 4, 6, 4]
+    assert np.allclose(aggregate["mean"], [0.1, 0.15, 0.2, 0.4])
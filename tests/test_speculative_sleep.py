@@ -0,0 +1,63 @@
+import logging
+import os
+import random
+
+import pytest
+
+from src import ArrayMind, SpeculativeSleep, Stynker
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="os.fork is not available")
+
+
+def make_stynker(engine):
+    random.seed(7)
+    stynker = Stynker(environment="simple_maze", color="blue", n_nodes=48, n_input=32, n_output=16, n_remakes=4)
+    if engine:
+        stynker.attach_engine(ArrayMind.from_mind(stynker))
+    stynker.assign_period("wake")
+    for _ in range(50):
+        stynker.run_cycle()
+    stynker.assign_period("sleep")
+    return stynker
+
+
+def get_structure(stynker):
+    stynker.sync_from_engine()
+    return stynker.structural_hash()
+
+
+@pytest.mark.parametrize("engine", [False, True])
+def test_forked_sleep_equals_cloned_sleep(engine):
+    results = list()
+    for use_fork in (True, False):
+        stynker = make_stynker(engine)
+        sleep = SpeculativeSleep(4, 50, n_workers=2, use_fork=use_fork)
+        assert sleep.use_fork == use_fork
+        random.seed(1)
+        result = sleep.run(stynker)
+        results.append((result, get_structure(stynker), random.random()))
+    assert results[0] == results[1]
+    assert all(score is not None for score in results[0][0]["scores"])
+
+
+def test_sleep_advances_the_global_generator_by_one_value():
+    stynker = make_stynker(engine=True)
+    random.seed(1)
+    SpeculativeSleep(3, 20, use_fork=False).run(stynker)
+    value = random.random()
+    random.seed(1)
+    random.getrandbits(64)
+    assert value == random.random()
+
+
+def test_failed_candidate_reports_its_traceback(monkeypatch, caplog):
+    def simulate(stynker, seed):
+        raise RuntimeError(f"candidate {seed} failed")
+
+    stynker = make_stynker(engine=True)
+    sleep = SpeculativeSleep(2, 20, n_workers=2)
+    monkeypatch.setattr(sleep, "simulate", simulate)
+    with caplog.at_level(logging.WARNING):
+        result = sleep.run(stynker)
+    assert result == {"scores": [None, None], "best": 0}
+    assert "Traceback" in caplog.text and "RuntimeError: candidate" in caplog.text
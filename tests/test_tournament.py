@@ -0,0 +1,34 @@
+import pytest
+
+from parameters import stynker_parameters
+from src import Tournament
+
+
+@pytest.fixture
+def tournament():
+    tournament = Tournament(
+        population_size=8,
+        schedule=[("wake", 10)],
+        selection="elitist",
+        n_elites=2,
+        n_workers=1,
+        **{**stynker_parameters, "n_nodes": 64},
+    )
+    yield tournament
+    tournament.close()
+
+
+def test_elitist_selection_keeps_ties(tournament):
+    assert tournament.select([0] * 8) == dict()
+    # Only two of the best minds are elites, and the third one is not replaced
+    replacements = tournament.select([3, 3, 0, 0, 3, 0, 0, 0])
+    assert sorted(replacements) == [2, 3, 5, 6, 7]
+
+
+def test_elitist_selection_replaces_worse_minds(tournament):
+    fitness = [0, 5, 1, 4, 1, 0, 5, 1]
+    replacements = tournament.select(fitness)
+    assert set(replacements.values()) == {1, 6}
+    assert sorted(replacements) == [0, 2, 3, 4, 5, 7]
+    assert all(fitness[source] > fitness[destination] for destination, source in replacements.items())
+
@@ -0,0 +1,32 @@
+from parameters import cycles
+from utils import get_next_phase_index
+
+
+def test_next_phase_from_the_last_wake_of_a_phase():
+    # Default schedule: 40 (wake, sleep) and then 40 (dream, sleep)
+    assert cycles[78] == ("wake", 100)
+    assert get_next_phase_index(cycles, 78) == 80
+
+
+def test_next_phase_from_the_first_period_of_a_phase():
+    assert get_next_phase_index(cycles, 0) == 80
+    assert get_next_phase_index(cycles, 80) == 160
+
+
+def test_sleep_belongs_to_the_phase_before_it():
+    schedule = [("wake", 1), ("sleep", 1), ("dream", 1), ("sleep", 1)]
+    assert get_next_phase_index(schedule, 0) == 2
+    assert get_next_phase_index(schedule, 1) == 2
+    assert get_next_phase_index(cycles, 79) == 80
+
+
+def test_leading_sleeps_belong_to_the_first_phase():
+    schedule = [("sleep", 1), ("wake", 1), ("sleep", 1), ("dream", 1)]
+    assert get_next_phase_index(schedule, 0) == 3
+    assert get_next_phase_index(schedule, 2) == 3
+
+
+def test_next_phase_from_the_last_phase():
+    schedule = [("wake", 1), ("sleep", 1), ("dream", 1), ("sleep", 1)]
+    assert get_next_phase_index(schedule, 2) == len(schedule)
+    assert get_next_phase_index(schedule, 3) == len(schedule)
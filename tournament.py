@@ -0,0 +1,20 @@
+import json
+import logging
+import time
+from src import Tournament
+from parameters import stynker_parameters, tournament_parameters
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s.%(msecs)03d %(levelname)s {%(module)s} [%(funcName)s] %(message)s',
+                        datefmt='%Y-%m-%d,%H:%M:%S', level=logging.INFO)
+    logging.info(f"Running tournament with the following parameters: {tournament_parameters}")
+
+    n_generations = tournament_parameters.pop("n_generations")
+    with Tournament(**tournament_parameters, **stynker_parameters) as tournament:
+        history = tournament.run(n_generations)
+        lineage = tournament.lineage
+
+    # Saving the results with the current timestamp
+    with open(f"tournament_{int(time.time())}.json", "w") as f:
+        json.dump({"history": history, "lineage": lineage}, f)
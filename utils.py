@@ -1,6 +1,8 @@
+import json
+import os
 import time
 from argparse import Namespace, ArgumentParser
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 
 def parse_args() -> Namespace:
@@ -43,80 +45,225 @@ def parse_args() -> Namespace:
         help="Whether to show the route"
     )
 
+    parser.add_argument(
+        "-rt", "--rest_threshold", type=float,
+        required=False,
+        help="Speed under which a Stynker that is not kicked rests, skipping the interaction with the environment"
+    )
+
     parser.add_argument(
         "-rs", "--random_sleep", type=bool,
         required=False,
         help="Whether to use random sleep"
     )
 
+    parser.add_argument(
+        "-hl", "--headless", action="store_true", default=None,
+        help="Whether to run without drawing the Stynkers"
+    )
+
+    parser.add_argument(
+        "-f", "--fps", type=float,
+        required=False,
+        help="Number of frames per second to draw"
+    )
+
+    parser.add_argument(
+        "-rsp", "--record_spikes", action="store_true", default=None,
+        help="Whether to record which nodes spill in each cycle"
+    )
+
+    parser.add_argument(
+        "-rst", "--results_store", type=str,
+        required=False,
+        help="Directory of the store where the results are added"
+    )
+
+    parser.add_argument(
+        "-cd", "--checkpoint_directory", type=str,
+        required=False,
+        help="Directory of the checkpoints of the minds and of the state of the run. "
+             "If they exist, the run continues from them: same counters, point of the schedule and run id"
+    )
+
+    parser.add_argument(
+        "-cc", "--checkpoint_cycles", type=int,
+        required=False,
+        help="Number of wake cycles between checkpoints"
+    )
+
+    parser.add_argument(
+        "-es", "--early_stopping", type=str,
+        choices=("stop", "next_phase"),
+        required=False,
+        help="What to do when the win rate converges or stalls"
+    )
+
+    parser.add_argument(
+        "-eg", "--engine", type=str,
+        choices=("object", "array", "partitioned", "mapped"),
+        required=False,
+        help="Engine used to run the nodes"
+    )
+
+    parser.add_argument(
+        "-w", "--n_workers", type=int,
+        required=False,
+        help="Number of worker processes of the partitioned engine"
+    )
+
+    parser.add_argument(
+        "-md", "--mind_directory", type=str,
+        required=False,
+        help="Directory with the files of the mapped engine"
+    )
+
+    parser.add_argument(
+        "-nc", "--n_candidates", type=int,
+        required=False,
+        help="Number of remakes tried in each sleep cycle. The best one is kept"
+    )
+
+    parser.add_argument(
+        "-ccy", "--candidate_cycles", type=int,
+        required=False,
+        help="Number of wake cycles used to score each remake"
+    )
+
+    parser.add_argument(
+        "-cw", "--candidate_workers", type=int,
+        required=False,
+        help="Number of processes that score the remakes. Only used in headless runs"
+    )
+
+    parser.add_argument(
+        "-mb", "--memory_budget", type=float,
+        required=False,
+        help="Maximum memory of the minds, in MiB"
+    )
+
+    parser.add_argument(
+        "-ob", "--over_budget", type=str,
+        choices=("refuse", "downsize"),
+        required=False,
+        help="Whether to refuse a run over the memory budget, or to run it with fewer nodes"
+    )
+
+    parser.add_argument(
+        "-bk", "--backend", type=str,
+        choices=("numba", "numpy", "python"),
+        required=False,
+        help="Backend of the kernels that run the nodes and the bounces"
+    )
+
+    parser.add_argument(
+        "-nbc", "--no_body_collisions", dest="body_collisions",
+        action="store_false", default=None,
+        help="Whether the Stynkers pass through each other"
+    )
+
+    parser.add_argument(
+        "-bp", "--batch_physics", dest="batch_physics",
+        action="store_true", default=None,
+        help="Whether to move the Stynkers against the walls all at once"
+    )
+
+    parser.add_argument(
+        "-sd", "--seed", type=int,
+        required=False,
+        help="Seed of the random values of the arena"
+    )
+
     return parser.parse_args()
 
 
-def get_environment_inputs(env_name: str) -> Dict[str, Any]:
+def get_next_phase_index(cycles: List[Tuple[str, int]], index: int) -> int:
+    """
+    Get the index of the first period of the phase after the one
+    that contains `cycles[index]`.
+
+    A phase is a run of consecutive periods whose active periods
+    (wake or dream) are of the same kind. Sleep periods belong
+    to the phase where they are
+    Args:
+        cycles: schedule of (period, number of cycles)
+        index: index of a period in `cycles`
+    Returns:
+        Index of the first period of the next phase, or `len(cycles)`
+        if `cycles[index]` is in the last phase
+    """
+    # Phase of the last active period up to `index`. None if there are only sleeps
+    current_phase = None
+    for i in range(index, -1, -1):
+        period, _ = cycles[i]
+        if period != "sleep":
+            current_phase = period
+            break
+    for i in range(index + 1, len(cycles)):
+        period, _ = cycles[i]
+        if period == "sleep":
+            continue
+        if current_phase is None:
+            current_phase = period
+        elif period != current_phase:
+            return i
+    return len(cycles)
+
+
+def save_run_state(path: str, state: Dict[str, Any]) -> None:
+    """
+    Save the state of a run, e.g. its counters and its position in the
+    schedule. The file is replaced at once, so it is never half written
+    Args:
+        path: JSON file to write
+        state: JSON serializable state of the run
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(state, f)
+    os.replace(temporary_path, path)
+
+
+def load_run_state(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the state of a run saved with `save_run_state`
+    Args:
+        path: JSON file to read
+    Returns:
+        State of the run, or None if it was never saved
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def get_environment_inputs(maze_path: str) -> Dict[str, Any]:
     """
     Get the inputs of the environment to use
     Args:
-        env_name: name of the environment to get
+        maze_path: JSON file with the maze. It has the `name`, the
+            `border_coordinates`, and two `goal_segments` of the border,
+            which are randomly used as the winning and the losing segment
     Returns:
         Information about the environment
     """
-    segment_1_info = {
-        "segment": ((-120, 360), (-360, 360)),
-        "inner_segment": ((-130, 350), (-350, 350))
-    }
-
-    segment_2_info = {
-        "segment": ((120, -360), (360, -360)),
-        "inner_segment": ((130, -350), (350, -350))
-    }
+    with open(maze_path) as f:
+        maze = json.load(f)
 
-    segments_info = [segment_1_info, segment_2_info]
+    segments_info = [
+        tuple(tuple(point) for point in segment)
+        for segment in maze["goal_segments"]
+    ]
     # Randomize losing/winning segments
-    winning_info = segments_info.pop(int(time.time()) % 2)
-    losing_info = segments_info.pop()
-
-    if env_name == "simple_maze":
-        simple_maze = {
-            "border_coordinates": [
-                (360, -360),
-                (360, 360),
-                (-120, 360),
-                (-120, -180),
-                (-120, 360),
-                (-360, 360),
-                (-360, -360),
-                (120, -360),
-                (120, 180),
-                (120, -360),
-                (360, -360),
-            ],
-            # Assuming that the radius of the Stynker is 10, define
-            # the 'inner' borders where the Stynker will bounce,
-            # so it doesn't pass through the 'real' borders
-            "inner_segments": [
-                ((350, -360), (350, 350)),
-                ((350, 350), (-110, 350)),
-                ((-110, 350), (-110, -190)),
-                ((-110, -190), (-130, -190)),
-                ((-130, -190), (-130, 350)),
-                ((-130, 350), (-350, 350)),
-                ((-350, 350), (-350, -350)),
-                ((-350, -350), (110, -350)),
-                ((110, -350), (110, 190)),
-                ((110, 190), (130, 190)),
-                ((130, 190), (130, -350)),
-                ((130, -350), (350, -350)),
-            ],
-            # These are used to color the environment borders
-            "winning_segment": winning_info["segment"],
-            "losing_segment": losing_info["segment"],
-
-            # These are used to know when the Stynker win/loss.
-            # This logic assumes that the Stynker radius is 10
-            "winning_inner_segment": winning_info["inner_segment"],
-            "losing_inner_segment": losing_info["inner_segment"],
-            "name": env_name,
-        }
-        return simple_maze
-
-    raise NotImplementedError(f"The environment {env_name} is not supported")
+    winning_segment = segments_info.pop(int(time.time()) % 2)
+    losing_segment = segments_info.pop()
+
+    return {
+        "border_coordinates": [tuple(point) for point in maze["border_coordinates"]],
+        # These are used to color the environment borders, and
+        # to know when the Stynker win/loss
+        "winning_segment": winning_segment,
+        "losing_segment": losing_segment,
+        "name": maze["name"],
+    }